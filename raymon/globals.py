@@ -17,7 +17,19 @@ class DataException(Exception):
     pass
 
 
+class NoValidDataException(DataException, ValueError):
+    """Raised when stats are built from data without any valid values. Also a ValueError, for callers that caught the error numpy raised before."""
+
+    pass
+
+
+class ValidationOverflowException(Exception):
+    pass
+
+
 class Serializable(ABC):
+    __slots__ = ()
+
     def class2str(self):
         module = str(self.__class__.__module__)
         classname = str(self.__class__.__name__)
@@ -1,12 +1,28 @@
 import os, sys
+import threading
 from contextlib import nullcontext
 
 
 class NoOutput:
+    """
+    Suppresses stdout within a with block. Safe to use from multiple threads at once: stdout is redirected when the first thread enters and restored when the last one exits. Note that stdout is process wide, so output of other threads is suppressed in the meantime too.
+    """
+
+    _lock = threading.Lock()
+    _depth = 0
+    _original_stdout = None
+
     def __enter__(self):
-        self._original_stdout = sys.stdout
-        sys.stdout = open(os.devnull, "w")
+        with NoOutput._lock:
+            if NoOutput._depth == 0:
+                NoOutput._original_stdout = sys.stdout
+                sys.stdout = open(os.devnull, "w")
+            NoOutput._depth += 1
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        sys.stdout.close()
-        sys.stdout = self._original_stdout
+        with NoOutput._lock:
+            NoOutput._depth -= 1
+            if NoOutput._depth == 0:
+                sys.stdout.close()
+                sys.stdout = NoOutput._original_stdout
+                NoOutput._original_stdout = None
@@ -1,4 +1,7 @@
 from .profiles import ModelProfile
+from .plan import ValidationPlan
+from .executor import AsyncValidator
 from .components import InputComponent, OutputComponent, ActualComponent, EvalComponent, DataType
-from .stats import NumericStats, CategoricStats
+from .stats import NumericStats, CategoricStats, DecayedNumericStats, DecayedCategoricStats
 from .scores import Score, MeanScore, PrecisionScore, RecallScore
+from .monitor import DriftMonitor
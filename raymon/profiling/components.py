@@ -13,8 +13,17 @@ from raymon.globals import (
     ComponentStateException,
 )
 from raymon.profiling.stats import Stats, CategoricStats, FloatStats, IntStats, equalize_domains
-from raymon.tags import Tag, CTYPE_TAGTYPES
+from raymon.tags import Tag, CTYPE_TAGTYPES, normalize
 from raymon.profiling.extractors import Extractor, NoneExtractor, NoneEvalExtractor
+from raymon.profiling.utils import project, as_array, null_mask
+from raymon.profiling.instrumentation import (
+    timer,
+    COMPONENT_VALIDATE,
+    EXTRACTOR_BUILD,
+    EXTRACTOR_EXTRACT,
+    EXTRACTOR_EXTRACT_MULTIPLE,
+    STATS_BUILD,
+)
 
 
 class DataType:
@@ -24,6 +33,9 @@ class DataType:
 
 
 class Component(Serializable, Buildable, ABC):
+    # The tag types of the component and error tags, set by the subclasses.
+    tagtypes = None
+
     def __init__(self, name, extractor, dtype=DataType.FLOAT, stats=None, main=False):
         self.name = name
         self.extractor = extractor
@@ -119,21 +131,35 @@ class Component(Serializable, Buildable, ABC):
             raise NameError(f"Could not locate classpath {classpath}")
         return compclass.from_jcr(jcr["state"], mock_extractor=mock_extractor)
 
+    def project(self, data):
+        """Return only the columns of tabular data that the extractor uses, see `Extractor.columns`."""
+        return project(data, self.extractor.columns)
+
     def build_extractor(self, data):
-        self.extractor.build(data)
+        with timer(EXTRACTOR_BUILD, self.name):
+            self.extractor.build(self.project(data))
 
-    def build(self, data, domain=None, build_extractor=True):
+    def build(self, data, domain=None, build_extractor=True, mergeable=False):
         # Compile extractor
         if build_extractor:
             self.build_extractor(data)
         # Configure stats
-        return self.build_stats(data, domain=domain)
+        return self.build_stats(data, domain=domain, mergeable=mergeable)
 
     def is_built(self):
         return self.extractor.is_built() and self.stats.is_built()
 
-    def contrast(self, other, thresholds):
-
+    def contrast(self, other, thresholds, drift_report=None):
+        """Contrast the stats of this component with those of other.
+
+        Parameters
+        ----------
+        other : Component
+        thresholds : dict
+            The 'drift' and 'invalids' thresholds.
+        drift_report : dict, optional
+            The drift report, when it was already computed for a batch of components, see `raymon.profiling.stats.report_numeric_drift_multiple`.
+        """
         invalids_threshold = thresholds.get("invalids", 0.01)
         drift_threshold = thresholds.get("drift", 0.05)
         try:
@@ -143,7 +169,8 @@ class Component(Serializable, Buildable, ABC):
             if not other.is_built():
                 print(f"Component {other.name} in 'other' is not built.")
                 raise ComponentStateException(f"Component {other.name} in 'other' is not built.")
-            drift_report = self.stats.report_drift(other.stats, threshold=drift_threshold)
+            if drift_report is None:
+                drift_report = self.stats.report_drift(other.stats, threshold=drift_threshold)
             invalids_report = self.stats.report_invalid_diff(other.stats, threshold=invalids_threshold)
             singleton_report = self.stats.report_singleton_change(other.stats)
 
@@ -151,32 +178,87 @@ class Component(Serializable, Buildable, ABC):
         except ComponentStateException as e:
             return {}
 
+    def validate(self, data):
+        with timer(COMPONENT_VALIDATE, self.name):
+            with timer(EXTRACTOR_EXTRACT, self.name):
+                component = self.extractor.extract(data)
+            return self.check(component)
+
+    def check(self, component):
+        # Make a tag from the component
+        feat_tag = self.stats.component2tag(name=self.name, value=component, tagtype=self.tagtypes["tagtype"])
+        # Check min, max, nan or None and raise data error
+        err_tag = self.stats.check_invalid(name=self.name, value=component, tagtype=self.tagtypes["errortype"])
+        tags = [feat_tag, err_tag]
+        # Filter Nones
+        tags = [tag for tag in tags if tag is not None]
+        return tags
+
+    def validate_multiple(self, data):
+        """Validate multiple data instances at once.
+
+        Parameters
+        ----------
+        data : pd.DataFrame or np.ndarray
+            The data instances to extract the component from.
+
+        Returns
+        -------
+        dict
+            Maps the component tag name and the error tag name to an array holding the tag value for every instance. Missing tags are None or NaN.
+        """
+        with timer(EXTRACTOR_EXTRACT_MULTIPLE, self.name):
+            components = self.extractor.extract_multiple(self.project(data))
+        return self.check_multiple(components)
+
+    def check_multiple(self, components):
+        return {
+            normalize(self.name): self.stats.component2tag_multiple(components),
+            normalize(f"{self.name}-error"): self.stats.check_invalid_multiple(components),
+        }
+
     def __repr__(self):
         return str(self)
 
     @abstractmethod
-    def build_stats(self, data, domain):
+    def build_stats(self, data, domain, mergeable=False):
         pass
 
+    def update_stats(self, data, domain=None, **options):
+        """Extract the component from a chunk of data and add it to the streaming state of the stats, see `Stats.update`. The extractor should be built.
+
+        Returns
+        -------
+        list or np.ndarray
+            The extracted values that are not None or NaN.
+        """
+        with timer(EXTRACTOR_EXTRACT_MULTIPLE, self.name):
+            extracted = self.extractor.extract_multiple(self.project(data))
+        return self._update_stats_from(extracted, domain=domain, **options)
+
+    def _build_stats_from(self, extracted, domain=None, mergeable=False):
+        # The values stay in a typed array, and NaNs are detected once for the stats and the returned values.
+        values = as_array(extracted)
+        null = null_mask(values)
+        with timer(STATS_BUILD, self.name):
+            self.stats.build(values, domain=domain, null=null, mergeable=mergeable)
+        return values[~null]
+
+    def _update_stats_from(self, extracted, domain=None, **options):
+        values = as_array(extracted)
+        null = null_mask(values)
+        with timer(STATS_BUILD, self.name):
+            self.stats.update(values, domain=domain, null=null, **options)
+        return values[~null]
+
 
 class InputComponent(Component):
-    def build_stats(self, data, domain=None):
-        extracted = self.extractor.extract_multiple(data)
-        self.stats.build(extracted, domain=domain)
-        return extracted
+    tagtypes = CTYPE_TAGTYPES["input"]
 
-    def validate(self, data):
-        component = self.extractor.extract(data)
-        # Make a tag from the component
-        feat_tag = self.stats.component2tag(name=self.name, value=component, tagtype=CTYPE_TAGTYPES["input"]["tagtype"])
-        # Check min, max, nan or None and raise data error
-        err_tag = self.stats.check_invalid(
-            name=self.name, value=component, tagtype=CTYPE_TAGTYPES["input"]["errortype"]
-        )
-        tags = [feat_tag, err_tag]
-        # Filter Nones
-        tags = [tag for tag in tags if tag is not None]
-        return tags
+    def build_stats(self, data, domain=None, mergeable=False):
+        with timer(EXTRACTOR_EXTRACT_MULTIPLE, self.name):
+            extracted = self.extractor.extract_multiple(self.project(data))
+        return self._build_stats_from(extracted, domain=domain, mergeable=mergeable)
 
     @classmethod
     def from_jcr(cls, jcr, mock_extractor=False):
@@ -196,25 +278,12 @@ class InputComponent(Component):
 
 
 class OutputComponent(Component):
-    def build_stats(self, data, domain=None):
-        extracted = self.extractor.extract_multiple(data)
-        self.stats.build(extracted, domain=domain)
-        return extracted
+    tagtypes = CTYPE_TAGTYPES["output"]
 
-    def validate(self, data):
-        component = self.extractor.extract(data)
-        # Make a tag from the component
-        feat_tag = self.stats.component2tag(
-            name=self.name, value=component, tagtype=CTYPE_TAGTYPES["output"]["tagtype"]
-        )
-        # Check min, max, nan or None and raise data error
-        err_tag = self.stats.check_invalid(
-            name=self.name, value=component, tagtype=CTYPE_TAGTYPES["output"]["errortype"]
-        )
-        tags = [feat_tag, err_tag]
-        # Filter Nones
-        tags = [tag for tag in tags if tag is not None]
-        return tags
+    def build_stats(self, data, domain=None, mergeable=False):
+        with timer(EXTRACTOR_EXTRACT_MULTIPLE, self.name):
+            extracted = self.extractor.extract_multiple(self.project(data))
+        return self._build_stats_from(extracted, domain=domain, mergeable=mergeable)
 
     @classmethod
     def from_jcr(cls, jcr, mock_extractor=False):
@@ -234,25 +303,12 @@ class OutputComponent(Component):
 
 
 class ActualComponent(Component):
-    def build_stats(self, data, domain=None):
-        extracted = self.extractor.extract_multiple(data)
-        self.stats.build(extracted, domain=domain)
-        return extracted
+    tagtypes = CTYPE_TAGTYPES["actual"]
 
-    def validate(self, data):
-        component = self.extractor.extract(data)
-        # Make a tag from the component
-        feat_tag = self.stats.component2tag(
-            name=self.name, value=component, tagtype=CTYPE_TAGTYPES["actual"]["tagtype"]
-        )
-        # Check min, max, nan or None and raise data error
-        err_tag = self.stats.check_invalid(
-            name=self.name, value=component, tagtype=CTYPE_TAGTYPES["actual"]["errortype"]
-        )
-        tags = [feat_tag, err_tag]
-        # Filter Nones
-        tags = [tag for tag in tags if tag is not None]
-        return tags
+    def build_stats(self, data, domain=None, mergeable=False):
+        with timer(EXTRACTOR_EXTRACT_MULTIPLE, self.name):
+            extracted = self.extractor.extract_multiple(self.project(data))
+        return self._build_stats_from(extracted, domain=domain, mergeable=mergeable)
 
     @classmethod
     def from_jcr(cls, jcr, mock_extractor=False):
@@ -272,23 +328,32 @@ class ActualComponent(Component):
 
 
 class EvalComponent(Component):
-    def build_stats(self, data, domain=None):
+    tagtypes = CTYPE_TAGTYPES["eval"]
+
+    def build_stats(self, data, domain=None, mergeable=False):
+        output, actual = data
+        with timer(EXTRACTOR_EXTRACT_MULTIPLE, self.name):
+            extracted = self.extractor.extract_multiple(output=output, actual=actual)
+        return self._build_stats_from(extracted, domain=domain, mergeable=mergeable)
+
+    def update_stats(self, data, domain=None, **options):
         output, actual = data
-        extracted = self.extractor.extract_multiple(output=output, actual=actual)
-        self.stats.build(extracted, domain=domain)
-        return extracted
+        with timer(EXTRACTOR_EXTRACT_MULTIPLE, self.name):
+            extracted = self.extractor.extract_multiple(output=output, actual=actual)
+        return self._update_stats_from(extracted, domain=domain, **options)
 
     def validate(self, data):
         output, actual = data
-        component = self.extractor.extract(output=output, actual=actual)
-        # Make a tag from the component
-        feat_tag = self.stats.component2tag(name=self.name, value=component, tagtype=CTYPE_TAGTYPES["eval"]["tagtype"])
-        # Check min, max, nan or None and raise data error
-        err_tag = self.stats.check_invalid(name=self.name, value=component, tagtype=CTYPE_TAGTYPES["eval"]["errortype"])
-        tags = [feat_tag, err_tag]
-        # Filter Nones
-        tags = [tag for tag in tags if tag is not None]
-        return tags
+        with timer(COMPONENT_VALIDATE, self.name):
+            with timer(EXTRACTOR_EXTRACT, self.name):
+                component = self.extractor.extract(output=output, actual=actual)
+            return self.check(component)
+
+    def validate_multiple(self, data):
+        output, actual = data
+        with timer(EXTRACTOR_EXTRACT_MULTIPLE, self.name):
+            components = self.extractor.extract_multiple(output=output, actual=actual)
+        return self.check_multiple(components)
 
     @classmethod
     def from_jcr(cls, jcr, mock_extractor=False):
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from raymon.globals import ValidationOverflowException
+from raymon.tags import convert_tags
+
+logger = logging.getLogger(__name__)
+
+
+class OverflowPolicy:
+    BLOCK = "block"
+    DROP = "drop"
+    RAISE = "raise"
+
+
+VALIDATE_METHODS = ["validate_input", "validate_output", "validate_actual", "validate_eval", "validate_all"]
+
+# The plan used by process pool workers, set by _init_worker
+_worker_plan = None
+
+
+def _init_worker(profile):
+    global _worker_plan
+    _worker_plan = profile.compile()
+
+
+def _validate_in_worker(method, kwargs):
+    return getattr(_worker_plan, method)(**kwargs)
+
+
+class AsyncValidator:
+    """
+    Validates data against a profile in the background, so validation does not block the caller. Every call returns a `concurrent.futures.Future` of the tags, or an awaitable when using `submit_async`.
+
+    Parameters
+    ----------
+    profile : ModelProfile
+        The built profile to validate against. The profile is compiled once, in every worker.
+    executor : str or concurrent.futures.Executor, optional
+        'thread', 'process' or an existing executor. Use a process pool for extractors that hold the GIL. By default 'thread'.
+    workers : int, optional
+        The number of workers when creating a pool, by default 1.
+    max_pending : int, optional
+        The maximum number of records that are queued or being validated, by default 1000.
+    overflow : str, optional
+        What to do when `max_pending` records are pending: 'block' the caller until a slot frees up, 'drop' the record (the call returns None) or 'raise' a ValidationOverflowException. By default 'block'.
+    tag_format : str, optional
+        The format of the returned tags, see `raymon.tags.convert_tags`. By default 'jcr'. Records are validated to a `raymon.tags.TagBatch`, which is converted to this format for the caller and to 'jcr' for traces, so every format can be used with traces.
+    on_done : callable, optional
+        Called with the tags of every successfully validated record, in tag_format. Errors raised by this callback or while tagging a trace are logged and do not affect the returned future.
+    """
+
+    def __init__(
+        self,
+        profile,
+        executor="thread",
+        workers=1,
+        max_pending=1000,
+        overflow=OverflowPolicy.BLOCK,
+        tag_format="jcr",
+        on_done=None,
+    ):
+        if overflow not in [OverflowPolicy.BLOCK, OverflowPolicy.DROP, OverflowPolicy.RAISE]:
+            raise ValueError(f"overflow must be one of 'block', 'drop' or 'raise', not {overflow}")
+        if not (isinstance(max_pending, int) and max_pending > 0):
+            raise ValueError(f"max_pending must be an int > 0, not {max_pending}")
+        self.overflow = overflow
+        self.max_pending = max_pending
+        self.tag_format = tag_format
+        self.on_done = on_done
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._owns_executor = not isinstance(executor, Executor)
+        self._plan = None
+        if executor == "thread":
+            self._plan = profile.compile()
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="raymon-validator")
+        elif executor == "process":
+            self._executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(profile,))
+        elif isinstance(executor, ProcessPoolExecutor):
+            raise ValueError(
+                "Pass executor='process' instead of a ProcessPoolExecutor, so workers can load the profile."
+            )
+        elif isinstance(executor, Executor):
+            self._plan = profile.compile()
+            self._executor = executor
+        else:
+            raise ValueError(f"executor must be 'thread', 'process' or a concurrent.futures.Executor")
+
+    def _acquire(self):
+        if self.overflow == OverflowPolicy.BLOCK:
+            return self._slots.acquire()
+        acquired = self._slots.acquire(blocking=False)
+        if not acquired and self.overflow == OverflowPolicy.RAISE:
+            raise ValidationOverflowException(f"More than {self.max_pending} records pending validation.")
+        return acquired
+
+    def _on_done(self, future, result, trace):
+        self._slots.release()
+        if future.cancelled():
+            result.cancel()
+            return
+        if future.exception() is not None:
+            if result.set_running_or_notify_cancel():
+                result.set_exception(future.exception())
+            return
+        batch = future.result()
+        try:
+            tags = convert_tags(batch, format=self.tag_format)
+        except Exception as exc:
+            if result.set_running_or_notify_cancel():
+                result.set_exception(exc)
+            return
+        # The result may have been cancelled by the caller while the record was validated
+        if result.set_running_or_notify_cancel():
+            result.set_result(tags)
+        # The result is resolved, failures of the hooks below are only logged
+        if trace is not None:
+            try:
+                trace.tag(convert_tags(batch, format="jcr"))
+            except Exception:
+                logger.exception("Could not send the tags to trace %s", trace.trace_id)
+        if self.on_done is not None:
+            try:
+                self.on_done(tags)
+            except Exception:
+                logger.exception("The on_done callback raised")
+
+    def submit(self, method, trace=None, **kwargs):
+        """Submit a record for validation.
+
+        Parameters
+        ----------
+        method : str
+            The validation method, one of 'validate_input', 'validate_output', 'validate_actual', 'validate_eval' or 'validate_all'.
+        trace : raymon.Trace, optional
+            When given, the tags are sent to this trace as soon as they are ready.
+        **kwargs
+            The data, passed to the validation method.
+
+        Returns
+        -------
+        concurrent.futures.Future or None
+            The future of the tags, or None if the record was dropped.
+        """
+        if method not in VALIDATE_METHODS:
+            raise ValueError(f"method must be one of {VALIDATE_METHODS}")
+        if not self._acquire():
+            return None
+        kwargs["tag_format"] = "batch"
+        try:
+            if self._plan is None:
+                future = self._executor.submit(_validate_in_worker, method, kwargs)
+            else:
+                future = self._executor.submit(getattr(self._plan, method), **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        # The caller gets the tags in tag_format, the trace gets them as jcr.
+        result = Future()
+        result.add_done_callback(lambda f: future.cancel() if f.cancelled() else None)
+        future.add_done_callback(lambda f: self._on_done(f, result, trace=trace))
+        return result
+
+    def submit_async(self, method, trace=None, **kwargs):
+        """Like `submit`, but returns an awaitable for the running asyncio event loop."""
+        future = self.submit(method, trace=trace, **kwargs)
+        if future is None:
+            return None
+        return asyncio.wrap_future(future)
+
+    def validate_input(self, input, trace=None):
+        return self.submit("validate_input", trace=trace, input=input)
+
+    def validate_output(self, output, trace=None):
+        return self.submit("validate_output", trace=trace, output=output)
+
+    def validate_actual(self, actual, trace=None):
+        return self.submit("validate_actual", trace=trace, actual=actual)
+
+    def validate_eval(self, output, actual, trace=None):
+        return self.submit("validate_eval", trace=trace, output=output, actual=actual)
+
+    def validate_all(self, input, output, actual, trace=None):
+        return self.submit("validate_all", trace=trace, input=input, output=output, actual=actual)
+
+    def shutdown(self, wait=True):
+        """Stop accepting records. Shuts down the executor when it was created by this validator."""
+        if self._owns_executor:
+            self._executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown(wait=True)
@@ -19,6 +19,25 @@ class Extractor(Serializable, Buildable, ABC):
     def __repr__(self):
         return str(self)
 
+    @property
+    def columns(self):
+        """The labels of the columns of tabular data this extractor uses, or None if it may use any column. When declared, extractors are only given these columns while building a profile.
+
+        Returns
+        -------
+        list or None
+        """
+        return None
+
+    def cache_key(self):
+        """Return a hashable key identifying what this extractor extracts. Extractors with equal keys must extract equal values from the same data, which allows reusing extracted values within a record. By default, every extractor object is considered unique.
+
+        Returns
+        -------
+        key : hashable
+        """
+        return (self.class2str(), id(self))
+
     @classmethod
     def from_jcr(cls, jcr):
         classpath = jcr["class"]
@@ -42,9 +61,33 @@ class SimpleExtractor(Extractor):
         """
         raise NotImplementedError
 
+    def extract_batch(self, data):
+        """Extracts the component from multiple data instances at once. Override this with a vectorized implementation when possible, `extract_multiple` uses it when available.
+
+        Parameters
+        ----------
+        data : pd.DataFrame or np.ndarray
+            The data instances, one per row.
+
+        Returns
+        -------
+        np.ndarray or list
+            The extracted component of every instance.
+
+        Raises
+        ------
+        NotImplementedError
+            If the extractor or the type of data does not support batch extraction. `extract_multiple` then extracts the instances one by one.
+        """
+        raise NotImplementedError
+
     def extract_multiple(self, data):
         if data is None:
             raise DataException(f"Data is None")
+        try:
+            return self.extract_batch(data)
+        except NotImplementedError:
+            pass
         components = []
         if isinstance(data, pd.DataFrame):
             components = data.apply(self.extract, axis="columns", raw=False).tolist()
@@ -69,6 +112,36 @@ class EvalExtractor(Extractor):
         """
         raise NotImplementedError
 
+    def extract_context(self, context):
+        """Extract the component from the output and actual of an :class:`raymon.profiling.plan.ExtractionContext`. Override this to reuse values that were already extracted for the record.
+
+        Parameters
+        ----------
+        context : ExtractionContext
+            The extraction context of the record.
+        """
+        return self.extract(output=context.output, actual=context.actual)
+
+    def extract_batch(self, output, actual):
+        """Extracts the component from multiple pairs of output and actual at once. Override this with a vectorized implementation when possible, `extract_multiple` uses it when available.
+
+        Parameters
+        ----------
+        output : pd.Series, pd.DataFrame or np.ndarray
+        actual : pd.Series, pd.DataFrame or np.ndarray
+
+        Returns
+        -------
+        np.ndarray or list
+            The extracted component of every pair.
+
+        Raises
+        ------
+        NotImplementedError
+            If the extractor or the type of data does not support batch extraction.
+        """
+        raise NotImplementedError
+
     def extract_multiple(self, output, actual):
         if output is None:
             raise DataException("output is None")
@@ -78,6 +151,10 @@ class EvalExtractor(Extractor):
             raise DataException("output and actual not of same type")
         if len(output) != len(actual):
             raise DataException("output and actual not of same length")
+        try:
+            return self.extract_batch(output, actual)
+        except NotImplementedError:
+            pass
 
         components = []
         if isinstance(output, pd.Series) or isinstance(output, np.ndarray):
@@ -320,6 +397,12 @@ class SequenceEvalExtractor(EvalExtractor):
         print(actual_extr)
         return self.eval_extractor.extract(output=output_extr, actual=actual_extr)
 
+    def extract_context(self, context):
+        # Preprocessing steps that match the extractor of a component are not run again.
+        output_extr = context.extract_chain(self.prep_output, source="output")
+        actual_extr = context.extract_chain(self.prep_actual, source="actual")
+        return self.eval_extractor.extract(output=output_extr, actual=actual_extr)
+
     def build(self, data):
         pass  # Do not support building for now. KISS
 
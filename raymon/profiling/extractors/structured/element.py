@@ -1,4 +1,5 @@
 import numpy as np
+import pandas as pd
 
 from raymon.globals import DataException, ExtractorException
 from raymon.profiling.extractors import SimpleExtractor
@@ -25,9 +26,29 @@ class ElementExtractor(SimpleExtractor):
             raise DataException("element to extract must be int or str")
         self._element = value
 
+    @property
+    def columns(self):
+        return [self.element]
+
     def extract(self, data):
         return data[self.element]
 
+    def extract_batch(self, data):
+        # Returns the column without copying where possible.
+        if isinstance(data, pd.DataFrame):
+            if self.element in data.columns:
+                column = data[self.element]
+                if isinstance(column, pd.Series):
+                    return column.to_numpy()
+            elif isinstance(self.element, int):
+                return data.iloc[:, self.element].to_numpy()
+        elif isinstance(data, np.ndarray) and data.ndim == 2 and isinstance(self.element, int):
+            return data[:, self.element]
+        raise NotImplementedError
+
+    def cache_key(self):
+        return (self.class2str(), self.element)
+
     """Serializable interface """
 
     def to_jcr(self):
@@ -86,6 +107,20 @@ class MaxScoreElementExtractor(SimpleExtractor):
             return self.categories[idx]
         return idx
 
+    def extract_batch(self, data):
+        if isinstance(data, pd.DataFrame):
+            data = data.to_numpy()
+        if not (isinstance(data, np.ndarray) and data.ndim == 2):
+            raise NotImplementedError
+        idx = np.argmax(data, axis=1)
+        if self.categories is not None:
+            return np.asarray(self.categories, dtype=object)[idx]
+        return idx
+
+    def cache_key(self):
+        categories = None if self.categories is None else tuple(self.categories)
+        return (self.class2str(), categories)
+
     """Serializable interface """
 
     def to_jcr(self):
@@ -13,6 +13,9 @@ class ClassificationEntropyExtractor(SimpleExtractor):
         h = float(entropy(data))
         return h
 
+    def cache_key(self):
+        return (self.class2str(),)
+
     """Serializable interface """
 
     def to_jcr(self):
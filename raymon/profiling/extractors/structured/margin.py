@@ -14,6 +14,9 @@ class ClassificationMarginExtractor(SimpleExtractor):
         margin = float(1 - (asc[-1] - asc[-2])) ** 2
         return margin
 
+    def cache_key(self):
+        return (self.class2str(),)
+
     """Serializable interface """
 
     def to_jcr(self):
@@ -1,7 +1,21 @@
 # from raymon.types import load_jcr
+import numpy as np
+import pandas as pd
+
 from raymon.profiling.extractors import EvalExtractor
 
 
+def as_vectors(output, actual):
+    """Convert a batch of outputs and actuals to 1D arrays, or raise NotImplementedError if they are not 1D."""
+    if not isinstance(output, (pd.Series, np.ndarray)):
+        raise NotImplementedError
+    output = np.asarray(output)
+    actual = np.asarray(actual)
+    if output.ndim != 1 or actual.ndim != 1:
+        raise NotImplementedError
+    return output, actual
+
+
 class ClassificationErrorType(EvalExtractor):
     def __init__(self, positive=1):
         super().__init__()
@@ -18,6 +32,15 @@ class ClassificationErrorType(EvalExtractor):
             err = "TN"
         return err
 
+    def extract_batch(self, output, actual):
+        output, actual = as_vectors(output, actual)
+        out_pos = output == self.positive
+        act_pos = actual == self.positive
+        return np.select([act_pos & out_pos, act_pos, out_pos], ["TP", "FN", "FP"], default="TN").astype(object)
+
+    def cache_key(self):
+        return (self.class2str(), self.positive)
+
     """Serializable interface """
 
     def to_jcr(self):
@@ -42,6 +65,13 @@ class RegressionError(EvalExtractor):
     def extract(self, output, actual):
         return float(output - actual)
 
+    def extract_batch(self, output, actual):
+        output, actual = as_vectors(output, actual)
+        return output - actual.astype(float)
+
+    def cache_key(self):
+        return (self.class2str(),)
+
     """Serializable interface """
 
     def to_jcr(self):
@@ -65,6 +95,13 @@ class AbsoluteRegressionError(EvalExtractor):
     def extract(self, output, actual):
         return float(abs(output - actual))
 
+    def extract_batch(self, output, actual):
+        output, actual = as_vectors(output, actual)
+        return np.abs(output - actual).astype(float)
+
+    def cache_key(self):
+        return (self.class2str(),)
+
     """Serializable interface """
 
     def to_jcr(self):
@@ -88,6 +125,13 @@ class SquaredRegressionError(EvalExtractor):
     def extract(self, output, actual):
         return float(pow(output - actual, 2))
 
+    def extract_batch(self, output, actual):
+        output, actual = as_vectors(output, actual)
+        return np.square(output - actual).astype(float)
+
+    def cache_key(self):
+        return (self.class2str(),)
+
     """Serializable interface """
 
     def to_jcr(self):
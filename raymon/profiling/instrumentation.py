@@ -0,0 +1,176 @@
+"""
+Latency instrumentation for building and validating profiles.
+
+Instrumentation is disabled by default. When enabled, the wall time and call count of every `Component.validate`, `Extractor.extract`, `Extractor.extract_multiple`, `Extractor.build` and `Stats.build` call is recorded per component in a sink:
+
+    with instrumentation.instrumented() as sink:
+        profile.validate_all(input=..., output=..., actual=...)
+    sink.dump("latencies.json")
+
+When disabled, instrumented code only checks whether a sink is set.
+"""
+
+import json
+import math
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+
+COMPONENT_VALIDATE = "component.validate"
+COMPONENT_BUILD = "component.build"
+EXTRACTOR_EXTRACT = "extractor.extract"
+EXTRACTOR_EXTRACT_MULTIPLE = "extractor.extract_multiple"
+EXTRACTOR_BUILD = "extractor.build"
+STATS_BUILD = "stats.build"
+
+_sink = None
+
+
+def get_sink():
+    """Return the active sink, or None if instrumentation is disabled."""
+    return _sink
+
+
+def enable(sink=None):
+    """Enable instrumentation, recording to the given sink, or a new :class:`HistogramSink`.
+
+    Returns
+    -------
+    sink
+        The active sink.
+    """
+    global _sink
+    _sink = HistogramSink() if sink is None else sink
+    return _sink
+
+
+def disable():
+    global _sink
+    _sink = None
+
+
+@contextmanager
+def instrumented(sink=None):
+    """Enable instrumentation within a with block. Restores the previous sink afterwards."""
+    global _sink
+    previous = _sink
+    try:
+        yield enable(sink)
+    finally:
+        _sink = previous
+
+
+class _Timer:
+    __slots__ = ("sink", "event", "name", "start")
+
+    def __init__(self, sink, event, name):
+        self.sink = sink
+        self.event = event
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.sink.record(self.event, self.name, perf_counter() - self.start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return None
+
+
+NULL_TIMER = _NullTimer()
+
+
+def timer(event, name):
+    """Return a context manager that records the time spent in its block, or a no-op one if instrumentation is disabled."""
+    sink = _sink
+    if sink is None:
+        return NULL_TIMER
+    return _Timer(sink, event, name)
+
+
+class HistogramSink:
+    """
+    Keeps, per event and name, the call count, total, minimum and maximum time and a histogram of the call times with logarithmic buckets. The histogram is used to estimate percentiles.
+
+    Parameters
+    ----------
+    buckets_per_decade : int, optional
+        Resolution of the histogram, by default 10 buckets per factor 10 in time.
+    """
+
+    def __init__(self, buckets_per_decade=10):
+        self.buckets_per_decade = buckets_per_decade
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, seconds):
+        # Bucket 0 holds everything below 1 nanosecond
+        if seconds <= 1e-9:
+            return 0
+        return int(math.log10(seconds / 1e-9) * self.buckets_per_decade) + 1
+
+    def _bucket_upper(self, bucket):
+        return 1e-9 * 10 ** (bucket / self.buckets_per_decade)
+
+    def record(self, event, name, seconds):
+        bucket = self._bucket(seconds)
+        with self._lock:
+            record = self._records.get((event, name))
+            if record is None:
+                record = {"count": 0, "total": 0.0, "min": seconds, "max": seconds, "histogram": {}}
+                self._records[(event, name)] = record
+            record["count"] += 1
+            record["total"] += seconds
+            record["min"] = min(record["min"], seconds)
+            record["max"] = max(record["max"], seconds)
+            record["histogram"][bucket] = record["histogram"].get(bucket, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._records = {}
+
+    def percentile(self, event, name, q):
+        """Estimate the q-th percentile (0 - 100) of the call times, as the upper bound of the histogram bucket it falls in."""
+        record = self._records[(event, name)]
+        rank = q / 100 * record["count"]
+        seen = 0
+        for bucket in sorted(record["histogram"]):
+            seen += record["histogram"][bucket]
+            if seen >= rank:
+                return min(self._bucket_upper(bucket), record["max"])
+        return record["max"]
+
+    def summary(self):
+        """Return a dict mapping every event to a dict of the recorded names and their statistics. Times are in seconds."""
+        summary = {}
+        with self._lock:
+            keys = sorted(self._records)
+        for event, name in keys:
+            record = self._records[(event, name)]
+            summary.setdefault(event, {})[name] = {
+                "count": record["count"],
+                "total": record["total"],
+                "mean": record["total"] / record["count"],
+                "min": record["min"],
+                "max": record["max"],
+                "p50": self.percentile(event, name, 50),
+                "p90": self.percentile(event, name, 90),
+                "p99": self.percentile(event, name, 99),
+            }
+        return summary
+
+    def to_jcr(self):
+        return self.summary()
+
+    def dump(self, fpath):
+        with open(fpath, "w") as f:
+            json.dump(self.to_jcr(), f, indent=4)
@@ -0,0 +1,245 @@
+import threading
+import time
+from collections import deque
+
+from raymon.globals import DataException
+from raymon.profiling.plan import ExtractionContext
+from raymon.profiling.stats import (
+    NumericStats,
+    CategoricStats,
+    report_numeric_drift_multiple,
+    report_categoric_drift_multiple,
+)
+from raymon.profiling.utils import as_array, null_mask
+
+
+class DriftMonitor:
+    """
+    Monitors live traffic for drift against a reference profile, without building a profile per window.
+
+    Records are extracted as they come in, and their component values are summarized per sub-window with the mergeable sketches of the stats (see `NumericStats.update` and `CategoricStats.update`). A ring of sub-windows covers the window: when a sub-window expires, it is dropped. A report merges the summaries of the live sub-windows and contrasts them with the reference, with the same drift, invalids and singleton reports as `ModelProfile.contrast`. Raw records are never kept.
+
+    Values are buffered per component and added to the sketches in batches, so an update takes constant time per record, amortized.
+
+    Parameters
+    ----------
+    reference : ModelProfile
+        The built profile to contrast the traffic with.
+    window : float, optional
+        The length of the window in seconds, by default 3600.
+    subwindow : float, optional
+        The length of a sub-window in seconds, by default 60. Old data leaves the window one sub-window at a time.
+    thresholds : dict, optional
+        The 'components' thresholds and 'global_drift' threshold, as for `ModelProfile.contrast`.
+    report_every : float, optional
+        When set, a report is made every report_every seconds while records come in, and passed to on_report.
+    on_report : callable, optional
+        Called with every periodic report.
+    k : int, optional
+        The size of the quantile sketches of numeric components, by default 1024.
+    top_k : int, optional
+        Only count the top_k most frequent categories of categoric components, see `CategoricStats.update`.
+    flush_size : int, optional
+        The number of values buffered per component before they are added to the sketches, by default 512.
+    clock : callable, optional
+        Returns the current time in seconds, by default `time.time`.
+    """
+
+    def __init__(
+        self,
+        reference,
+        window=3600,
+        subwindow=60,
+        thresholds={},
+        report_every=None,
+        on_report=None,
+        k=1024,
+        top_k=None,
+        flush_size=512,
+        clock=time.time,
+    ):
+        if not (subwindow > 0 and window >= subwindow):
+            raise ValueError(f"subwindow must be > 0 and at most window, not {subwindow} and {window}")
+        self.reference = reference
+        self.plan = reference.compile()
+        self.window = window
+        self.subwindow = subwindow
+        self.thresholds = thresholds
+        self.report_every = report_every
+        self.on_report = on_report
+        self.k = k
+        self.top_k = top_k
+        self.flush_size = flush_size
+        self.clock = clock
+        self._lock = threading.Lock()
+        # Ring of (start time, {component name: stats}) of the sub-windows, oldest first
+        self._subwindows = deque()
+        self._buffers = {}
+        self._next_report = None if report_every is None else clock() + report_every
+
+    @property
+    def n_subwindows(self):
+        return int(round(self.window / self.subwindow))
+
+    """Updating"""
+
+    def update(self, input=None, output=None, actual=None):
+        """Add a record. Only the components of the given data are extracted, eval components when both output and actual are given."""
+        now = self.clock()
+        context = ExtractionContext(input=input, output=output, actual=actual)
+        values = []
+        for source, entries, data in (
+            ("input", self.plan.input, input),
+            ("output", self.plan.output, output),
+            ("actual", self.plan.actual, actual),
+        ):
+            if data is None:
+                continue
+            for entry in entries:
+                values.append((entry.component.name, context.extract(entry.extractor, source, entry.key)))
+        if output is not None and actual is not None:
+            for entry in self.plan.eval:
+                values.append((entry.component.name, context.extract_eval(entry.extractor, entry.key)))
+
+        report = None
+        with self._lock:
+            self._rotate(now)
+            for name, value in values:
+                buffer = self._buffers.setdefault(name, [])
+                buffer.append(value)
+                if len(buffer) >= self.flush_size:
+                    self._flush(name)
+            if self._next_report is not None and now >= self._next_report:
+                self._next_report = now + self.report_every
+                report = self._report(now)
+        if report is not None and self.on_report is not None:
+            self.on_report(report)
+
+    def _rotate(self, now):
+        start = now - now % self.subwindow
+        if len(self._subwindows) > 0 and self._subwindows[-1][0] == start:
+            return
+        # The buffers belong to the sub-window that ends now
+        self._flush_all()
+        self._subwindows.append((start, {}))
+        while self._subwindows[0][0] <= start - self.n_subwindows * self.subwindow:
+            self._subwindows.popleft()
+
+    def _flush(self, name):
+        buffer = self._buffers.pop(name, None)
+        if not buffer:
+            return
+        component_stats = self._subwindows[-1][1]
+        stats = component_stats.get(name)
+        if stats is None:
+            stats = self.reference.components[name].stats.empty()
+            component_stats[name] = stats
+        options = {"k": self.k} if isinstance(stats, NumericStats) else {"top_k": self.top_k}
+        values = as_array(buffer)
+        stats.update(values, null=null_mask(values), **options)
+
+    def _flush_all(self):
+        for name in list(self._buffers):
+            self._flush(name)
+
+    """Reporting"""
+
+    def window_stats(self):
+        """Return the stats of every component over the current window. Components without data in the window get stats with a samplesize of 0, components without valid data get stats with only their samplesize and invalids set."""
+        with self._lock:
+            self._rotate(self.clock())
+            self._flush_all()
+            return self._window_stats()
+
+    def _window_stats(self):
+        window_stats = {}
+        for name, component in self.reference.components.items():
+            stats = component.stats.empty()
+            for _, component_stats in self._subwindows:
+                if name in component_stats:
+                    stats.merge(component_stats[name])
+            try:
+                stats.finalize()
+            except DataException:
+                stats = self._invalid_stats(component.stats, stats.sketch)
+            window_stats[name] = stats
+        return window_stats
+
+    @staticmethod
+    def _invalid_stats(reference_stats, sketch):
+        """Stats for a window without valid data: only the sample size and the invalids are set, so the invalids can be reported but the drift can not."""
+        stats = reference_stats.empty()
+        if sketch is None or sketch.samplesize == 0:
+            stats.samplesize = 0
+        else:
+            stats.samplesize = sketch.samplesize
+            stats.invalids = (sketch.n_nans + sketch.n_invalids) / sketch.samplesize
+        return stats
+
+    def report(self):
+        """Contrast the current window with the reference.
+
+        Returns
+        -------
+        dict
+            The 'component_reports' with the 'drift', 'invalids' and 'singleton' report of every component, like `ModelProfile.contrast`, the 'global_reports' with the 'multivariate_drift', the 'alerts' as a list of (component name, report type) and the 'window' as (start, end) times.
+        """
+        with self._lock:
+            return self._report(self.clock())
+
+    def _report(self, now):
+        self._rotate(now)
+        self._flush_all()
+        window_stats = self._window_stats()
+        component_thresholds = self.thresholds.get("components", {})
+        drift_reports = {}
+        for stats_type, report_multiple in (
+            (NumericStats, report_numeric_drift_multiple),
+            (CategoricStats, report_categoric_drift_multiple),
+        ):
+            names = [
+                name for name, component in self.reference.components.items() if isinstance(component.stats, stats_type)
+            ]
+            reports = report_multiple(
+                [self.reference.components[name].stats for name in names],
+                [window_stats[name] for name in names],
+                thresholds=[component_thresholds.get(name, {}).get("drift", 0.05) for name in names],
+            )
+            drift_reports.update(zip(names, reports))
+
+        component_reports = {}
+        alerts = []
+        drifts = []
+        for name, component in self.reference.components.items():
+            if name not in drift_reports:
+                continue
+            invalids_threshold = component_thresholds.get(name, {}).get("invalids", 0.01)
+            comp_report = {
+                "drift": drift_reports[name],
+                "invalids": component.stats.report_invalid_diff(window_stats[name], threshold=invalids_threshold),
+                "singleton": component.stats.report_singleton_change(window_stats[name]),
+            }
+            component_reports[name] = comp_report
+            if comp_report["drift"]["valid"]:
+                drifts.append(comp_report["drift"]["drift"])
+            alerts.extend((name, report_type) for report_type, report in comp_report.items() if report["alert"])
+
+        global_threshold = self.thresholds.get("global_drift", 0.05)
+        if len(drifts) > 0:
+            avg_drift = sum(drifts) / len(drifts)
+            multivariate_drift = {"drift": avg_drift, "valid": True, "alert": avg_drift > global_threshold}
+        else:
+            multivariate_drift = {"drift": -1, "valid": False, "alert": False}
+        start = self._subwindows[0][0] if len(self._subwindows) > 0 else now
+        return {
+            "component_reports": component_reports,
+            "global_reports": {"multivariate_drift": multivariate_drift},
+            "alerts": alerts,
+            "window": (start, now),
+        }
+
+    def reset(self):
+        """Drop all data in the window."""
+        with self._lock:
+            self._subwindows.clear()
+            self._buffers = {}
@@ -0,0 +1,268 @@
+from collections import namedtuple
+from time import perf_counter
+
+from raymon.globals import ProfileStateException
+from raymon.profiling.components import Component, InputComponent, OutputComponent, ActualComponent, EvalComponent
+from raymon.profiling.instrumentation import get_sink, COMPONENT_VALIDATE, EXTRACTOR_EXTRACT
+from raymon.tags import TagBatch, convert_tags
+
+# Everything that is needed to validate a single component, resolved at compile time. `validate` and `check` are the
+# bound methods of components that override them, and None for components that use the default ones.
+PlanEntry = namedtuple(
+    "PlanEntry",
+    ["component", "extractor", "stats", "tagname", "errorname", "tagtype", "errortype", "key", "validate", "check"],
+)
+
+
+def overridden(component, method, default):
+    """Return the bound method of the component if its class overrides the default implementation, or None."""
+    if getattr(type(component), method) is default:
+        return None
+    return getattr(component, method)
+
+
+def compile_entries(components, ctype, source):
+    default_validate = EvalComponent.validate if ctype is EvalComponent else Component.validate
+    entries = []
+    for component in components:
+        if not isinstance(component, ctype):
+            continue
+        entry = PlanEntry(
+            component=component,
+            extractor=component.extractor,
+            stats=component.stats,
+            tagname=TagBatch.intern_name(component.name),
+            errorname=TagBatch.intern_name(f"{component.name}-error"),
+            tagtype=component.tagtypes["tagtype"],
+            errortype=component.tagtypes["errortype"],
+            key=(source, component.extractor.cache_key()),
+            validate=overridden(component, "validate", default_validate),
+            check=overridden(component, "check", Component.check),
+        )
+        entries.append(entry)
+    return tuple(entries)
+
+
+class ExtractionContext:
+    """
+    Holds the data of a single record and the values extracted from it, so every distinct extractor runs at most once per record. Extractors are considered equal when their `cache_key()` is equal.
+
+    Parameters
+    ----------
+    input : any, optional
+    output : any, optional
+    actual : any, optional
+    """
+
+    def __init__(self, input=None, output=None, actual=None):
+        self.input = input
+        self.output = output
+        self.actual = actual
+        self.cache = {}
+
+    def get_source(self, source):
+        if source == "input":
+            return self.input
+        elif source == "output":
+            return self.output
+        elif source == "actual":
+            return self.actual
+        else:
+            raise ValueError(f"Unknown source: {source}")
+
+    def extract(self, extractor, source, key=None):
+        """Extract a value from the source data of the record, or return it from the cache when an equal extractor already ran on it.
+
+        Parameters
+        ----------
+        extractor : SimpleExtractor
+        source : str
+            One of 'input', 'output' or 'actual'.
+        key : hashable, optional
+            The cache key, when it was already resolved. Should equal `(source, extractor.cache_key())`.
+        """
+        if key is None:
+            key = (source, extractor.cache_key())
+        try:
+            return self.cache[key]
+        except KeyError:
+            value = extractor.extract(self.get_source(source))
+            self.cache[key] = value
+            return value
+
+    def extract_chain(self, extractors, source):
+        """Run a sequence of extractors on the source data, every extractor receiving the output of the previous one. Every intermediate value is cached, so a chain that starts with the extractor of a component reuses that components value."""
+        key = (source,)
+        value = self.get_source(source)
+        for extractor in extractors:
+            key = key + (extractor.cache_key(),)
+            if key in self.cache:
+                value = self.cache[key]
+            else:
+                value = extractor.extract(value)
+                self.cache[key] = value
+        return value
+
+    def extract_eval(self, extractor, key=None):
+        if key is None:
+            key = ("eval", extractor.cache_key())
+        try:
+            return self.cache[key]
+        except KeyError:
+            value = extractor.extract_context(self)
+            self.cache[key] = value
+            return value
+
+
+class ValidationPlan:
+    """
+    An immutable, precompiled validation plan for a built :class:`raymon.profiling.ModelProfile`. Use `ModelProfile.compile()` to create one.
+
+    Compiling groups the components per type, checks whether they are built and resolves tag names, tag types and the profile group once. Validating data with the plan then only extracts and checks values. The plan refers to the components of the profile it was compiled from: compile again after the profile changes.
+
+    Components that override `validate` or `check` are validated with those methods. An overridden `check` still receives the shared extraction, an overridden `validate` extracts its own values from the data.
+
+    Parameters
+    ----------
+    group : str
+        The group identifier of the profile, set on every tag.
+    input : tuple of PlanEntry
+    output : tuple of PlanEntry
+    actual : tuple of PlanEntry
+    eval : tuple of PlanEntry
+    """
+
+    __slots__ = ("_group", "_input", "_output", "_actual", "_eval")
+
+    def __init__(self, group, input=(), output=(), actual=(), eval=()):
+        object.__setattr__(self, "_group", group)
+        object.__setattr__(self, "_input", tuple(input))
+        object.__setattr__(self, "_output", tuple(output))
+        object.__setattr__(self, "_actual", tuple(actual))
+        object.__setattr__(self, "_eval", tuple(eval))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    @classmethod
+    def compile(cls, profile):
+        if not profile.is_built():
+            raise ProfileStateException(f"Cannot compile an unbuilt profile. Check whether all components are built.")
+        components = list(profile.components.values())
+        return cls(
+            group=profile.group_idfr,
+            input=compile_entries(components, ctype=InputComponent, source="input"),
+            output=compile_entries(components, ctype=OutputComponent, source="output"),
+            actual=compile_entries(components, ctype=ActualComponent, source="actual"),
+            eval=compile_entries(components, ctype=EvalComponent, source="eval"),
+        )
+
+    @property
+    def group(self):
+        return self._group
+
+    @property
+    def input(self):
+        return self._input
+
+    @property
+    def output(self):
+        return self._output
+
+    @property
+    def actual(self):
+        return self._actual
+
+    @property
+    def eval(self):
+        return self._eval
+
+    """Validation"""
+
+    def _check(self, entry, value, tags):
+        if entry.check is not None:
+            self._append_tags(entry.check(value), tags)
+            return
+        tag_value = entry.stats.tag_value(value)
+        if tag_value is not None:
+            tags.append(entry.tagname, tag_value, entry.tagtype, self._group)
+        error = entry.stats.error_value(value)
+        if error is not None:
+            tags.append(entry.errorname, error, entry.errortype, self._group)
+
+    def _append_tags(self, component_tags, tags):
+        for tag in component_tags:
+            tags.append(tag.name, tag.value, tag.type, self._group)
+
+    def _validate_entry(self, entry, tags, sink, extract, *args):
+        if sink is None:
+            self._check(entry, extract(*args), tags)
+            return
+        name = entry.component.name
+        start = perf_counter()
+        value = extract(*args)
+        extracted = perf_counter()
+        self._check(entry, value, tags)
+        sink.record(EXTRACTOR_EXTRACT, name, extracted - start)
+        sink.record(COMPONENT_VALIDATE, name, perf_counter() - start)
+
+    def _validate_simple(self, data, entries, tags):
+        sink = get_sink()
+        for entry in entries:
+            if entry.validate is not None:
+                self._append_tags(entry.validate(data), tags)
+                continue
+            self._validate_entry(entry, tags, sink, entry.extractor.extract, data)
+        return tags
+
+    def _validate_eval(self, output, actual, tags):
+        sink = get_sink()
+        for entry in self._eval:
+            if entry.validate is not None:
+                self._append_tags(entry.validate((output, actual)), tags)
+                continue
+            self._validate_entry(entry, tags, sink, entry.extractor.extract, output, actual)
+        return tags
+
+    def validate_input(self, input, tag_format="jcr"):
+        tags = self._validate_simple(data=input, entries=self._input, tags=TagBatch())
+        return convert_tags(tags, format=tag_format)
+
+    def validate_output(self, output, tag_format="jcr"):
+        tags = self._validate_simple(data=output, entries=self._output, tags=TagBatch())
+        return convert_tags(tags, format=tag_format)
+
+    def validate_actual(self, actual, tag_format="jcr"):
+        tags = self._validate_simple(data=actual, entries=self._actual, tags=TagBatch())
+        return convert_tags(tags, format=tag_format)
+
+    def validate_eval(self, output, actual, tag_format="jcr"):
+        tags = self._validate_eval(output=output, actual=actual, tags=TagBatch())
+        return convert_tags(tags, format=tag_format)
+
+    def validate_all(self, input, output, actual, tag_format="jcr"):
+        """Validate a full record in a single pass. Values are extracted through an :class:`ExtractionContext`, so extractors shared between components run once, and eval extractors can reuse values extracted for the output and actual components."""
+        tags = TagBatch()
+        context = ExtractionContext(input=input, output=output, actual=actual)
+        sink = get_sink()
+        for source, entries in (("input", self._input), ("output", self._output), ("actual", self._actual)):
+            for entry in entries:
+                if entry.validate is not None:
+                    self._append_tags(entry.validate(context.get_source(source)), tags)
+                    continue
+                self._validate_entry(entry, tags, sink, context.extract, entry.extractor, source, entry.key)
+        for entry in self._eval:
+            if entry.validate is not None:
+                self._append_tags(entry.validate((output, actual)), tags)
+                continue
+            self._validate_entry(entry, tags, sink, context.extract_eval, entry.extractor, entry.key)
+        return convert_tags(tags, format=tag_format)
+
+    def __len__(self):
+        return len(self._input) + len(self._output) + len(self._actual) + len(self._eval)
+
+    def __repr__(self):
+        return (
+            f"ValidationPlan(group={self._group}, input={len(self._input)}, output={len(self._output)}, "
+            f"actual={len(self._actual)}, eval={len(self._eval)})"
+        )
@@ -5,20 +5,47 @@ import tempfile
 import shutil
 import webbrowser
 import numbers
+import itertools
+import copy
+import logging
 import math
 
 from pydoc import locate
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 import pkg_resources
+import numpy as np
+import pandas as pd
 import raymon
-from raymon.globals import Buildable, ProfileStateException, Serializable
+from raymon.globals import Buildable, DataException, ProfileStateException, Serializable
 from raymon.profiling.components import Component, InputComponent, OutputComponent, ActualComponent, EvalComponent
 from raymon.profiling.scores import Score
+from raymon.profiling.stats import (
+    NumericStats,
+    IntStats,
+    CategoricStats,
+    dkw_sample_size,
+    spawn_generators,
+    report_numeric_drift_multiple,
+    report_categoric_drift_multiple,
+)
+from raymon.profiling.plan import ValidationPlan
+from raymon.profiling.instrumentation import timer, COMPONENT_BUILD
 from raymon.out import NoOutput, nullcontext
 from raymon.version import __version__
-from raymon.profiling.utils import filter_nan
+from raymon.profiling.utils import (
+    iter_chunks,
+    chunk_length,
+    concat_chunks,
+    head,
+    drain,
+    take,
+    RowReservoir,
+)
 from raymon.tags import convert_tags
 
+logger = logging.getLogger(__name__)
+
 
 class ModelProfile(Serializable, Buildable):
 
@@ -36,6 +63,9 @@ class ModelProfile(Serializable, Buildable):
         self._version = None
         self._components = {}
         self._scores = {}
+        # The compiled plan of the validate_* methods and the key it was compiled for, see `_compiled`
+        self._plan = None
+        self._plan_key = None
 
         self.name = str(name)
         self.version = str(version)
@@ -145,30 +175,274 @@ class ModelProfile(Serializable, Buildable):
 
     """Buildable Interface"""
 
-    def build(self, input=None, output=None, actual=None, domains={}, silent=True, build_extractors=True):
+    def build(
+        self,
+        input=None,
+        output=None,
+        actual=None,
+        domains={},
+        silent=True,
+        build_extractors=True,
+        workers=1,
+        executor="thread",
+        sample_budget=None,
+        epsilon=None,
+        seed=None,
+        mergeable=False,
+    ):
+        """Build all components and scores of the profile.
+
+        Parameters
+        ----------
+        input : any, optional
+            The input data, used to build the InputComponents.
+        output : any, optional
+            The output data, used to build the OutputComponents and EvalComponents.
+        actual : any, optional
+            The actual data, used to build the ActualComponents and EvalComponents.
+        domains : dict, optional
+            Maps component names to their domain, see `Stats.build`.
+        silent : bool, optional
+            Whether to suppress stdout while building, by default True.
+        build_extractors : bool, optional
+            Whether to build the extractors of the components, by default True.
+        workers : int, optional
+            The number of components to build in parallel, by default 1.
+        executor : str or concurrent.futures.Executor, optional
+            'thread', 'process' or an existing executor, used when `workers` > 1 or an executor is given. Threads suit numpy-heavy stats, processes suit extractors that hold the GIL. Components built in a process pool are copied back into the profile. By default 'thread'.
+        sample_budget : int, optional
+            When set, build on a uniform random sample of at most this many instances. The `samplesize` of the stats is the number of instances in the data, while their confidence bounds reflect the size of the sample.
+        epsilon : float, optional
+            Alternative to `sample_budget`: build on a sample that is large enough for the percentiles to be within epsilon (in 0 - 1) of the true CDF with 95% confidence, according to the DKW inequality. For example, 0.01 needs 18445 instances.
+        seed : int, optional
+            Seed for sampling.
+        mergeable : bool, optional
+            Whether the numeric stats keep a summary of the data, so the profile can be merged with others, see `merge`. By default False.
+        """
+        self._plan = None
+        budget = _sample_budget(sample_budget=sample_budget, epsilon=epsilon)
+        n_instances = chunk_length((input, output, actual))
+        if budget is not None and n_instances > budget:
+            idx = np.sort(np.random.default_rng(seed).choice(n_instances, size=budget, replace=False))
+            input, output, actual = take(input, idx), take(output, idx), take(actual, idx)
+        else:
+            budget = None
         if silent:
             ctx_mgr = NoOutput()
         else:
             ctx_mgr = nullcontext()
+        if not (isinstance(workers, int) and workers > 0):
+            raise ValueError(f"workers must be an int > 0, not {workers}")
         # Build the schema
         with ctx_mgr:
-            component_values = {}
+            jobs = []
             for component in self.components.values():
-                print(component.name)
-                comp_domain = domains.get(component.name, None)
-                if isinstance(component, InputComponent):
-                    values = component.build(data=input, domain=comp_domain, build_extractor=build_extractors)
-                elif isinstance(component, OutputComponent):
-                    values = component.build(data=output, domain=comp_domain, build_extractor=build_extractors)
-                elif isinstance(component, ActualComponent):
-                    values = component.build(data=actual, domain=comp_domain, build_extractor=build_extractors)
-                elif isinstance(component, EvalComponent):
-                    values = component.build(data=[output, actual], build_extractor=build_extractors)
-                else:
+                if not isinstance(component, (InputComponent, OutputComponent, ActualComponent, EvalComponent)):
                     raise ProfileStateException("Unknown Component type: ", type(component))
-                component_values[component.name] = filter_nan(values)
+                data = _component_data(component, input=input, output=output, actual=actual)
+                jobs.append((component, data, domains.get(component.name, None), build_extractors, mergeable))
+
+            if isinstance(executor, Executor):
+                results = self._build_parallel(jobs, executor=executor, silent=silent)
+            elif workers == 1:
+                results = [_build_component(*job) for job in jobs]
+            elif executor == "thread":
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="raymon-build") as pool:
+                    results = self._build_parallel(jobs, executor=pool, silent=silent)
+            elif executor == "process":
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    results = self._build_parallel(jobs, executor=pool, silent=silent)
+            else:
+                raise ValueError(f"executor must be 'thread', 'process' or a concurrent.futures.Executor")
+
+            # Results are in component order, whichever order they finished in.
+            component_values = {}
+            for component, values in results:
+                self._components[component.name] = component
+                component_values[component.name] = values
             for scorer in self.scores.values():
                 scorer.build(data=component_values)
+        if budget is not None:
+            for component in self.components.values():
+                component.stats.set_population_size(n_instances)
+
+    def build_stream(
+        self,
+        chunks,
+        domains={},
+        silent=True,
+        build_extractors=True,
+        sample_size=10000,
+        chunksize=None,
+        k=1024,
+        top_k=None,
+        sample_budget=None,
+        epsilon=None,
+        seed=None,
+    ):
+        """Build the profile from a stream of data chunks, without loading all data in memory. The stats of every component are updated chunk by chunk and finalized at the end, see `NumericStats.update` and `CategoricStats.update`. Extractors are built on the first `sample_size` instances of the stream.
+
+        Alternatively, when `sample_budget` or `epsilon` is set, a uniform sample of the stream is kept using reservoir sampling, and the profile is built on that sample in memory, see `build`.
+
+        Parameters
+        ----------
+        chunks : str, Path, list of str or Path, or iterable
+            Parquet or CSV files holding input data, or an iterable of chunks: (input, output, actual) tuples, dicts with one or more of these keys, or input data. See `raymon.profiling.utils.iter_chunks`.
+        domains : dict, optional
+            Maps component names to their domain, see `Stats.build`.
+        silent : bool, optional
+            Whether to suppress stdout while building, by default True.
+        build_extractors : bool, optional
+            Whether to build the extractors, by default True.
+        sample_size : int, optional
+            The number of instances to build the extractors on, by default 10000. These are held in memory.
+        chunksize : int, optional
+            The number of rows per chunk when reading files. By default, every file is a chunk.
+        k : int, optional
+            The size of the quantile sketch of numeric stats, by default 1024.
+        top_k : int, optional
+            When set, categoric stats only keep the frequencies of the top_k most frequent categories. By default None.
+        sample_budget : int, optional
+            Build on a reservoir sample of this many instances, see `build`.
+        epsilon : float, optional
+            Build on a reservoir sample that guarantees this accuracy of the percentiles, see `build`.
+        seed : int, optional
+            Seed for sampling.
+        """
+        self._plan = None
+        budget = _sample_budget(sample_budget=sample_budget, epsilon=epsilon)
+        if budget is not None:
+            reservoir = RowReservoir(size=budget, seed=seed)
+            for chunk in iter_chunks(chunks, chunksize=chunksize):
+                reservoir.update(chunk)
+            if reservoir.sample is None:
+                raise DataException("Cannot build a profile from an empty stream.")
+            input, output, actual = reservoir.sample
+            self.build(
+                input=input,
+                output=output,
+                actual=actual,
+                domains=domains,
+                silent=silent,
+                build_extractors=build_extractors,
+            )
+            if reservoir.seen > len(reservoir):
+                for component in self.components.values():
+                    component.stats.set_population_size(reservoir.seen)
+            return
+
+        if silent:
+            ctx_mgr = NoOutput()
+        else:
+            ctx_mgr = nullcontext()
+        with ctx_mgr:
+            stream = iter_chunks(chunks, chunksize=chunksize)
+            # Buffer the head of the stream to build the extractors on.
+            buffered = []
+            n_buffered = 0
+            for chunk in stream:
+                buffered.append(chunk)
+                n_buffered += chunk_length(chunk)
+                if n_buffered >= sample_size:
+                    break
+            if len(buffered) == 0:
+                raise DataException("Cannot build a profile from an empty stream.")
+            if build_extractors:
+                sample = [head(concat_chunks(parts), sample_size) for parts in zip(*buffered)]
+                for component in self.components.values():
+                    component.build_extractor(_component_data(component, *sample))
+
+            for component in self.components.values():
+                # Start from fresh stats
+                component.stats = component.stats.empty()
+            for scorer in self.scores.values():
+                scorer.reset()
+
+            for chunk in itertools.chain(drain(buffered), stream):
+                component_values = {}
+                for component in self.components.values():
+                    data = _component_data(component, *chunk)
+                    if isinstance(component, EvalComponent):
+                        domain = None
+                    else:
+                        domain = domains.get(component.name, None)
+                    if isinstance(component.stats, NumericStats):
+                        options = {"k": k}
+                    else:
+                        options = {"top_k": top_k}
+                    values = component.update_stats(data, domain=domain, **options)
+                    component_values[component.name] = values
+                for scorer in self.scores.values():
+                    scorer.update(data=component_values)
+
+            for component in self.components.values():
+                component.stats.finalize()
+            for scorer in self.scores.values():
+                scorer.finalize()
+
+    @classmethod
+    def merge(cls, profiles):
+        """Merge profiles that were built on different parts of a dataset, for example on different workers, into a new profile. The profiles should have the same components, extractors and scores. Stats are merged using the summaries they keep when built with `mergeable=True` (see `NumericStats.merge` and `CategoricStats.merge`), so the result equals a profile built on all data, up to the error of the quantile sketches.
+
+        Profiles built without `mergeable=True` or loaded from json do not have these summaries and cannot be merged.
+
+        Parameters
+        ----------
+        profiles : list of ModelProfile
+            The built profiles to merge.
+
+        Returns
+        -------
+        ModelProfile
+            The merged profile.
+        """
+        profiles = list(profiles)
+        if len(profiles) == 0:
+            raise ValueError("Need at least one profile to merge.")
+        for profile in profiles[1:]:
+            profiles[0].check_mergeable(profile)
+        merged = copy.deepcopy(profiles[0])
+        for name, component in merged.components.items():
+            stats = component.stats.empty()
+            for profile in profiles:
+                if profile.components[name].stats.sketch is None:
+                    raise ProfileStateException(
+                        f"Component {name} of profile {profile.name} cannot be merged. Was it built with mergeable=True and not loaded from json?"
+                    )
+                stats.merge(profile.components[name].stats)
+            component.stats = stats.finalize()
+        for name, scorer in merged.scores.items():
+            scorer.reset()
+            for profile in profiles:
+                scorer.merge(profile.scores[name])
+            scorer.finalize()
+        return merged
+
+    def check_mergeable(self, other):
+        """Raise a ProfileStateException if the other profile cannot be merged with this one."""
+        if list(self.components) != list(other.components):
+            raise ProfileStateException(f"Cannot merge profiles with different components.")
+        for name, component in self.components.items():
+            other_component = other.components[name]
+            if type(component) != type(other_component) or component.dtype != other_component.dtype:
+                raise ProfileStateException(f"Cannot merge profiles: component {name} differs in type.")
+            if component.extractor.to_jcr() != other_component.extractor.to_jcr():
+                raise ProfileStateException(
+                    f"Cannot merge profiles: the extractor of component {name} differs. Build the profiles with the same extractors, using build_extractors=False."
+                )
+        if list(self.scores) != list(other.scores):
+            raise ProfileStateException(f"Cannot merge profiles with different scores.")
+        for name, scorer in self.scores.items():
+            other_scorer = other.scores[name]
+            if type(scorer) != type(other_scorer) or scorer.inputs != other_scorer.inputs:
+                raise ProfileStateException(f"Cannot merge profiles: score {name} differs.")
+
+    def _build_parallel(self, jobs, executor, silent):
+        if isinstance(executor, ProcessPoolExecutor):
+            futures = [executor.submit(_build_component_in_process, *job, silent=silent) for job in jobs]
+        else:
+            futures = [executor.submit(_build_component, *job) for job in jobs]
+        return [future.result() for future in futures]
 
     def is_built(self):
         return all(component.is_built() for component in self.components.values())
@@ -197,52 +471,141 @@ class ModelProfile(Serializable, Buildable):
                 tags_dict[tag["name"]] = tag["value"]
         return tags_dict
 
-    def _validate_simple(self, data, components, tag_format="jcr"):
-        tags = []
-        if self.is_built():
-            for component in components:
-                component_tags = component.validate(data=data)
-                self.set_group(component_tags)
-                tags.extend(component_tags)
-        else:
-            raise ProfileStateException(
-                f"Cannot check data on an unbuilt profile. Check whether all components are built."
-            )
-        return convert_tags(tags, format=tag_format)
+    def compile(self):
+        """Compile the profile into a :class:`raymon.profiling.plan.ValidationPlan`. The plan resolves everything that does not depend on the data once, so validating many records with it is cheaper than calling the `validate_*` methods of the profile.
+
+        Returns
+        -------
+        ValidationPlan
+        """
+        return ValidationPlan.compile(self)
+
+    def _compiled(self):
+        """The plan the validate_* methods use. It is compiled once, and compiled again after a build or when the group, a component, or the name, extractor or stats of a component changes. Stats that are rebuilt in place are used by the plan as is."""
+        key = (
+            self.group_idfr,
+            tuple((c.name, id(c), id(c.extractor), id(c.stats)) for c in self._components.values()),
+        )
+        if self._plan is None or key != self._plan_key:
+            if not self.is_built():
+                raise ProfileStateException(
+                    f"Cannot check data on an unbuilt profile. Check whether all components are built."
+                )
+            plan = ValidationPlan.compile(self)
+            self._plan, self._plan_key = plan, key
+        return self._plan
+
+    def __getstate__(self):
+        # The plan is not pickled, it is compiled again when needed.
+        state = self.__dict__.copy()
+        state["_plan"] = None
+        state["_plan_key"] = None
+        return state
 
     def validate_input(self, input, tag_format="jcr"):
-        components = [c for c in self.components.values() if isinstance(c, InputComponent)]
-        return self._validate_simple(data=input, components=components, tag_format=tag_format)
+        return self._compiled().validate_input(input=input, tag_format=tag_format)
 
     def validate_output(self, output, tag_format="jcr"):
-        components = [c for c in self.components.values() if isinstance(c, OutputComponent)]
-        return self._validate_simple(data=output, components=components, tag_format=tag_format)
+        return self._compiled().validate_output(output=output, tag_format=tag_format)
 
     def validate_actual(self, actual, tag_format="jcr"):
-        components = [c for c in self.components.values() if isinstance(c, ActualComponent)]
-        return self._validate_simple(data=actual, components=components, tag_format=tag_format)
+        return self._compiled().validate_actual(actual=actual, tag_format=tag_format)
 
     def validate_eval(self, output, actual, tag_format="jcr"):
-        tags = []
-        components = [c for c in self.components.values() if isinstance(c, EvalComponent)]
-        if self.is_built():
-            for component in components:
-                component_tags = component.validate(data=(output, actual))
-                self.set_group(component_tags)
-                tags.extend(component_tags)
-        else:
-            raise ProfileStateException(
-                f"Cannot check data on an unbuilt profile. Check whether all components are built."
-            )
-        return convert_tags(tags, format=tag_format)
+        return self._compiled().validate_eval(output=output, actual=actual, tag_format=tag_format)
 
     def validate_all(self, input, output, actual, tag_format="jcr"):
-        input_tags = self.validate_input(input=input, tag_format=tag_format)
-        output_tags = self.validate_output(output=output, tag_format=tag_format)
-        actual_tags = self.validate_actual(actual=actual, tag_format=tag_format)
-        eval_tags = self.validate_eval(output=output, actual=actual, tag_format=tag_format)
-
-        return input_tags + output_tags + actual_tags + eval_tags
+        return self._compiled().validate_all(input=input, output=output, actual=actual, tag_format=tag_format)
+
+    def _validate_batch(self, data, entries, index=None):
+        # Compiling checks whether the profile is built
+        components = [entry.component for entry in entries]
+        columns = {}
+        for component in components:
+            columns.update(component.validate_multiple(data=data))
+        if index is None and isinstance(data, pd.DataFrame):
+            index = data.index
+        return pd.DataFrame(columns, index=index)
+
+    def validate_input_batch(self, input):
+        """Validate a batch of inputs at once. Every component is extracted and checked for a whole column of inputs, instead of record per record.
+
+        Parameters
+        ----------
+        input : pd.DataFrame or np.ndarray
+            The inputs to validate, one row per record.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per record and one column per tag name. Tags that would not have been emitted by `validate_input` are None or NaN.
+        """
+        return self._validate_batch(data=input, entries=self._compiled().input)
+
+    def validate_output_batch(self, output):
+        return self._validate_batch(data=output, entries=self._compiled().output)
+
+    def validate_actual_batch(self, actual):
+        return self._validate_batch(data=actual, entries=self._compiled().actual)
+
+    def validate_eval_batch(self, output, actual):
+        index = output.index if isinstance(output, pd.DataFrame) else None
+        return self._validate_batch(data=(output, actual), entries=self._compiled().eval, index=index)
+
+    def validate_all_batch(self, input, output, actual):
+        input_tags = self.validate_input_batch(input=input)
+        output_tags = self.validate_output_batch(output=output)
+        actual_tags = self.validate_actual_batch(actual=actual)
+        eval_tags = self.validate_eval_batch(output=output, actual=actual)
+        # Align on position, the different data sources do not necessarily share an index.
+        batches = [input_tags, output_tags, actual_tags, eval_tags]
+        return pd.concat([b.reset_index(drop=True) for b in batches], axis="columns").set_axis(
+            input_tags.index, axis="index"
+        )
+
+    def sample(self, n, seed=None, components=None, invalids=True):
+        """Generate n synthetic records from the stats of the components. Every component is sampled independently from its distribution.
+
+        Parameters
+        ----------
+        n : int
+            The number of records.
+        seed : int or np.random.Generator, optional
+            Seed of the records.
+        components : list of str, optional
+            The names of the components to sample, by default all components.
+        invalids : bool, optional
+            Whether to make values missing (None or NaN) at the rate of invalid values of the component, by default True.
+
+        Returns
+        -------
+        pd.DataFrame
+            A frame with a column per component. Components that extract a single column of tabular data (see `Extractor.columns`) are named after that column, so the records can be validated against the profile. Other columns are named after their component.
+        """
+        samplers = self._samplers(seed=seed, components=components)
+        return _sample_records(samplers, n=n, invalids=invalids)
+
+    def sample_chunks(self, n, chunksize=100000, seed=None, components=None, invalids=True):
+        """Like `sample`, but yields the records in frames of at most chunksize records, for n too large to fit in memory. The concatenated chunks equal `sample(n, seed)` for the same seed."""
+        samplers = self._samplers(seed=seed, components=components)
+        for start in range(0, n, chunksize):
+            yield _sample_records(samplers, n=min(chunksize, n - start), invalids=invalids)
+
+    def _samplers(self, seed, components):
+        names = list(self.components) if components is None else list(components)
+        for name in names:
+            if not self.components[name].stats.is_built():
+                raise ProfileStateException(f"Cannot sample component {name}: its stats are not built.")
+        # Every component draws its values and invalids from its own generators, so chunks can be drawn one after the other.
+        rngs = spawn_generators(seed, 2 * len(names))
+        samplers = []
+        for i, name in enumerate(names):
+            columns = self.components[name].extractor.columns
+            column = columns[0] if columns is not None and len(columns) == 1 else name
+            if column in [sampler[0] for sampler in samplers]:
+                column = name
+            samplers.append((column, self.components[name].stats, rngs[2 * i], rngs[2 * i + 1]))
+        return samplers
 
     def contrast(self, other, thresholds={}):
         # if not self.is_built():
@@ -254,15 +617,16 @@ class ModelProfile(Serializable, Buildable):
         global_threshold = thresholds.get("global_drift", 0.05)
         component_reports = {}
         drifts = []
+        pairs = []
         for component in self.components.values():
             if component.name not in other.components:
                 print(f"Component {component.name} not found in other, skipping...")
                 continue
+            pairs.append((component, other.components[component.name]))
+        drift_reports = _report_drifts(pairs, component_thresholds)
+        for (component, other_component), drift_report in zip(pairs, drift_reports):
             comp_thresholds = component_thresholds.get(component.name, {})
-            comp_report = component.contrast(
-                other.components[component.name],
-                thresholds=comp_thresholds,
-            )
+            comp_report = component.contrast(other_component, thresholds=comp_thresholds, drift_report=drift_report)
             component_reports[component.name] = comp_report
             if comp_report["drift"]["valid"]:
                 drifts.append(comp_report["drift"]["drift"])
@@ -272,14 +636,7 @@ class ModelProfile(Serializable, Buildable):
         else:
             multivariate_drift = {"drift": -1, "valid": False, "alert": False}
 
-        scorer_reports = {}
-        for score in self.scores.values():
-            red_threshold = scorer_thresholds.get(score.name, 0.01)
-            if score.name not in other.scores:
-                print(f"Score {score.name} not found in other, skipping...")
-                continue
-            red_report = score.contrast(other.scores[score.name], components=self.components, threshold=red_threshold)
-            scorer_reports[score.name] = red_report
+        scorer_reports = self._contrast_scores(other, scorer_thresholds)
 
         global_reports = {
             "scores": scorer_reports,
@@ -293,6 +650,17 @@ class ModelProfile(Serializable, Buildable):
         jcr["global_reports"] = global_reports
         return jcr
 
+    def _contrast_scores(self, other, scorer_thresholds):
+        scorer_reports = {}
+        for score in self.scores.values():
+            red_threshold = scorer_thresholds.get(score.name, 0.01)
+            if score.name not in other.scores:
+                print(f"Score {score.name} not found in other, skipping...")
+                continue
+            red_report = score.contrast(other.scores[score.name], components=self.components, threshold=red_threshold)
+            scorer_reports[score.name] = red_report
+        return scorer_reports
+
     def contrast_alternatives(self, alternativeA, alternativeB, thresholds={}):
         component_thresholds = thresholds.get("components", {})
         scorer_thresholds = thresholds.get("scores", {})
@@ -301,19 +669,20 @@ class ModelProfile(Serializable, Buildable):
         report = {}
         drifts = []
 
+        pairs = []
         for component in self.components.values():
             print(component.name)
-            comp_thresholds = component_thresholds.get(component.name, {})
             if component.name not in alternativeA.components:
                 print(f"Component {component.name} not found in alternativeA, skipping...")
                 continue
             if component.name not in alternativeB.components:
                 print(f"Component {component.name} not found in alternativeB, skipping...")
                 continue
-            comp_report = alternativeA.components[component.name].contrast(
-                alternativeB.components[component.name],
-                thresholds=comp_thresholds,
-            )
+            pairs.append((alternativeA.components[component.name], alternativeB.components[component.name]))
+        drift_reports = _report_drifts(pairs, component_thresholds)
+        for (component, other_component), drift_report in zip(pairs, drift_reports):
+            comp_thresholds = component_thresholds.get(component.name, {})
+            comp_report = component.contrast(other_component, thresholds=comp_thresholds, drift_report=drift_report)
             if comp_report["drift"]["valid"]:
                 drifts.append(comp_report["drift"]["drift"])
             report[component.name] = comp_report
@@ -351,6 +720,86 @@ class ModelProfile(Serializable, Buildable):
         jcr["global_reports"] = global_reports
         return jcr
 
+    def contrast_many(self, others, thresholds={}, full_reports=False):
+        """Contrast this profile, as the reference, with many other profiles, for example one per hour of traffic.
+
+        The components of the reference are looked up once, and the drifts of all components in all other profiles are computed in one batch per stats type, see `report_numeric_drift_multiple` and `report_categoric_drift_multiple`. The confidence bounds of the reference are computed once and its categories are encoded once. Unlike `contrast`, the profiles are not serialized, unless full reports are asked for.
+
+        Parameters
+        ----------
+        others : list or dict of ModelProfile
+            The profiles to contrast with. When a dict, its keys label the rows of the results.
+        thresholds : dict, optional
+            The thresholds, as for `contrast`.
+        full_reports : bool, optional
+            Whether to also return the reports of every other profile, like `contrast`. By default False.
+
+        Returns
+        -------
+        dict
+            The 'drift' of every component (columns) in every other profile (rows) as a pd.DataFrame, NaN where no drift could be computed, whether any report of a component raised an 'alert' as a pd.DataFrame, and the 'multivariate_drift' of every other profile as a pd.Series, NaN where no drift could be computed. With full_reports, also the 'reference' as jcr and the 'reports' of every other profile, each with the 'component_reports' and 'global_reports' of `contrast`.
+        """
+        if isinstance(others, dict):
+            labels, others = list(others), list(others.values())
+        else:
+            labels, others = list(range(len(others))), list(others)
+        component_thresholds = thresholds.get("components", {})
+        global_threshold = thresholds.get("global_drift", 0.05)
+        components = list(self.components.values())
+
+        pairs = []
+        cells = []
+        for row, other in enumerate(others):
+            for col, component in enumerate(components):
+                if component.name in other.components:
+                    pairs.append((component, other.components[component.name]))
+                    cells.append((row, col))
+        drift_reports = _report_drifts(pairs, component_thresholds)
+
+        drifts = np.full((len(others), len(components)), np.nan)
+        alerts = np.zeros((len(others), len(components)), dtype=bool)
+        component_reports = [{} for _ in others]
+        for (component, other_component), (row, col), drift_report in zip(pairs, cells, drift_reports):
+            comp_thresholds = component_thresholds.get(component.name, {})
+            comp_report = component.contrast(other_component, thresholds=comp_thresholds, drift_report=drift_report)
+            if not comp_report:
+                continue
+            if comp_report["drift"]["valid"]:
+                drifts[row, col] = comp_report["drift"]["drift"]
+            alerts[row, col] = any(report["alert"] for report in comp_report.values())
+            component_reports[row][component.name] = comp_report
+
+        names = [component.name for component in components]
+        drifts = pd.DataFrame(drifts, index=labels, columns=names)
+        # Skips the NaNs, like contrast only averages the valid drifts
+        multivariate_drifts = drifts.mean(axis=1)
+        result = {
+            "drift": drifts,
+            "alerts": pd.DataFrame(alerts, index=labels, columns=names),
+            "multivariate_drift": multivariate_drifts,
+        }
+        if not full_reports:
+            return result
+
+        reports = []
+        for other, comp_reports, avg_drift in zip(others, component_reports, multivariate_drifts):
+            if np.isnan(avg_drift):
+                multivariate_drift = {"drift": -1, "valid": False, "alert": False}
+            else:
+                multivariate_drift = {
+                    "drift": float(avg_drift),
+                    "valid": True,
+                    "alert": bool(avg_drift > global_threshold),
+                }
+            global_reports = {
+                "scores": self._contrast_scores(other, thresholds.get("scores", {})),
+                "multivariate_drift": multivariate_drift,
+            }
+            reports.append({"component_reports": comp_reports, "global_reports": global_reports})
+        result["reference"] = self.to_jcr()
+        result["reports"] = reports
+        return result
+
     def view(self, poi=None, mode="external", outdir=None, silent=True):
         if silent:
             ctx_mgr = NoOutput()
@@ -430,3 +879,90 @@ class ModelProfile(Serializable, Buildable):
             webbrowser.open_new_tab("file://" + str(html_file))
 
         return html_file
+
+
+def _sample_budget(sample_budget, epsilon):
+    if sample_budget is not None and epsilon is not None:
+        raise ValueError("Set either sample_budget or epsilon, not both.")
+    if epsilon is not None:
+        if not 0 < epsilon < 1:
+            raise ValueError(f"epsilon must be in (0, 1), not {epsilon}")
+        return dkw_sample_size(epsilon)
+    if sample_budget is not None and not (isinstance(sample_budget, int) and sample_budget > 0):
+        raise ValueError(f"sample_budget must be an int > 0, not {sample_budget}")
+    return sample_budget
+
+
+def _component_data(component, input, output, actual):
+    if isinstance(component, InputComponent):
+        return component.project(input)
+    elif isinstance(component, OutputComponent):
+        return component.project(output)
+    elif isinstance(component, ActualComponent):
+        return component.project(actual)
+    else:
+        return [output, actual]
+
+
+def _sample_records(samplers, n, invalids):
+    columns = {}
+    for name, stats, values_rng, invalids_rng in samplers:
+        if isinstance(stats, IntStats):
+            values = stats.sample(n, dtype="int", seed=values_rng)
+        else:
+            values = stats.sample(n, seed=values_rng)
+        if invalids and stats.invalids:
+            missing = invalids_rng.random(n) < stats.invalids
+            if isinstance(stats, IntStats):
+                values = pd.array(values, dtype="Int64")
+                values[missing] = pd.NA
+            elif isinstance(stats, NumericStats):
+                values[missing] = np.nan
+            else:
+                values = values.astype(object)
+                values[missing] = None
+        columns[name] = values
+    return pd.DataFrame(columns, index=pd.RangeIndex(n))
+
+
+def _report_drifts(pairs, component_thresholds):
+    """Compute the drift reports of all pairs of built numeric components, and of all pairs of built categoric components, in one batch per type. Returns the report of every pair, or None when the pair has no drift report."""
+    drift_reports = [None] * len(pairs)
+    # A component can be in many pairs, for example the reference in contrast_many: check whether it is built once.
+    built = {}
+    for component in itertools.chain.from_iterable(pairs):
+        if id(component) not in built:
+            built[id(component)] = component.is_built()
+    built_pairs = [i for i, (component, other) in enumerate(pairs) if built[id(component)] and built[id(other)]]
+    for stats_type, report_multiple in (
+        (NumericStats, report_numeric_drift_multiple),
+        (CategoricStats, report_categoric_drift_multiple),
+    ):
+        batch = [
+            i
+            for i in built_pairs
+            if isinstance(pairs[i][0].stats, stats_type) and isinstance(pairs[i][1].stats, stats_type)
+        ]
+        thresholds = [component_thresholds.get(pairs[i][0].name, {}).get("drift", 0.05) for i in batch]
+        reports = report_multiple(
+            [pairs[i][0].stats for i in batch], [pairs[i][1].stats for i in batch], thresholds=thresholds
+        )
+        for i, report in zip(batch, reports):
+            drift_reports[i] = report
+    return drift_reports
+
+
+def _build_component(component, data, domain, build_extractors, mergeable):
+    logger.debug("Building component %s", component.name)
+    with timer(COMPONENT_BUILD, component.name):
+        if isinstance(component, EvalComponent):
+            values = component.build(data=data, build_extractor=build_extractors, mergeable=mergeable)
+        else:
+            values = component.build(data=data, domain=domain, build_extractor=build_extractors, mergeable=mergeable)
+    return component, values
+
+
+def _build_component_in_process(component, data, domain, build_extractors, mergeable, silent):
+    ctx_mgr = NoOutput() if silent else nullcontext()
+    with ctx_mgr:
+        return _build_component(component, data, domain, build_extractors, mergeable)
@@ -1,3 +1,4 @@
+import warnings
 from abc import abstractmethod
 from raymon.globals import Serializable, Buildable, DataException
 from pydoc import locate
@@ -28,6 +29,7 @@ class Score(Serializable, Buildable):
         self.inputs = inputs
         self.preference = preference
         self.result = result
+        self.reset()
 
     @property
     def name(self):
@@ -64,6 +66,24 @@ class Score(Serializable, Buildable):
     def build(self, data, **kwargs):
         raise NotImplementedError()
 
+    """Streaming Interface"""
+
+    def reset(self):
+        """Clear the streaming state."""
+        pass
+
+    def update(self, data):
+        """Add a chunk of component values to the streaming state. `data` maps component names to their values, like in `build`."""
+        raise NotImplementedError(f"{self.__class__.__name__} does not support streaming builds.")
+
+    def merge(self, other):
+        """Add the streaming state of another score of the same type, for example built by another worker. Call `finalize` afterwards."""
+        raise NotImplementedError(f"{self.__class__.__name__} does not support merging.")
+
+    def finalize(self):
+        """Set the result from the streaming state."""
+        raise NotImplementedError(f"{self.__class__.__name__} does not support streaming builds.")
+
     def is_built(self):
         return self.result is not None
 
@@ -124,124 +144,111 @@ class MeanScore(Score):
         super().__init__(name, inputs=inputs, preference=preference, result=result)
 
     def build(self, data):
-        tag = self.inputs[0]
-        to_reduce = data[tag]
-        obs_mean = np.mean(to_reduce)
-        self.result = obs_mean
+        self.reset()
+        self.update(data)
+        self.finalize()
+
+    def reset(self):
+        self._sum = 0.0
+        self._count = 0
+
+    def update(self, data):
+        to_reduce = data[self.inputs[0]]
+        self._sum += float(np.sum(to_reduce))
+        self._count += len(to_reduce)
+
+    def merge(self, other):
+        # Scores built on no values have a NaN result, and nothing to merge
+        if other._count == 0 and other.result is not None and not np.isnan(other.result):
+            raise DataException(f"Score {other.name} has no streaming state to merge. Was it loaded from json?")
+        self._sum += other._sum
+        self._count += other._count
+
+    def finalize(self):
+        # Like np.mean, the mean of no values is NaN
+        self.result = self._sum / self._count if self._count > 0 else float("nan")
 
     @classmethod
     def from_jcr(cls, jcr):
         return cls(**jcr)
 
 
-class PrecisionScore(Score):
-    def __init__(self, name, inputs, preference="high", result=None):
-        super().__init__(name, inputs=inputs, preference=preference, result=result)
-
-    def build(self, data):
-        tag = self.inputs[0]
-        to_reduce = data[tag]
-        counts = pd.Series(to_reduce).value_counts().to_dict()
-        reduced = self.get_precision(counts)
-        self.result = reduced
-
-    def get_precision(self, counts):
-        result = {}
-        for key in ["TP", "FP", "TN", "FN"]:
-            if key not in counts:
-                counts[key] = 0
-        try:
-            result = counts["TP"] / (counts["TP"] + counts["FP"])
-        except:
-            result = -1
-        return result
-
-    @classmethod
-    def from_jcr(cls, jcr):
-        return cls(**jcr)
+class ErrorTypeScore(Score):
+    """
+    Base class of the scores that are computed from the counts of the error types ('TP', 'FP', 'TN' and 'FN') in their first input component. The counts are the streaming state, so these scores support `update`, `merge` and `finalize`. Subclasses implement `compute`.
+    """
 
+    error_types = ["TP", "FP", "TN", "FN"]
 
-class RecallScore(Score):
     def __init__(self, name, inputs, preference="high", result=None):
         super().__init__(name, inputs=inputs, preference=preference, result=result)
 
     def build(self, data):
-        tag = self.inputs[0]
-        to_reduce = data[tag]
-        counts = pd.Series(to_reduce).value_counts().to_dict()
-        reduced = self.get_recall(counts)
-        self.result = reduced
-
-    def get_recall(self, counts):
-        result = {}
-        for key in ["TP", "FP", "TN", "FN"]:
-            if key not in counts:
-                counts[key] = 0
+        self.reset()
+        self.update(data)
+        self.finalize()
+
+    def reset(self):
+        self._counts = {}
+
+    def update(self, data):
+        counts = pd.Series(data[self.inputs[0]]).value_counts().to_dict()
+        for key, count in counts.items():
+            self._counts[key] = self._counts.get(key, 0) + count
+
+    def merge(self, other):
+        if len(other._counts) == 0 and other.result is not None:
+            raise DataException(f"Score {other.name} has no streaming state to merge. Was it loaded from json?")
+        for key, count in other._counts.items():
+            self._counts[key] = self._counts.get(key, 0) + count
+
+    def finalize(self):
+        self.result = self.score_counts(self._counts)
+
+    def score_counts(self, counts):
+        """Return the score for a dict of error type counts, in which missing error types count 0, or -1 when the score is undefined."""
+        counts = {key: counts.get(key, 0) for key in self.error_types}
         try:
-            result = counts["TP"] / (counts["TP"] + counts["FN"])
-        except:
-            result = -1
-        return result
+            return self.compute(counts)
+        except ZeroDivisionError:
+            return -1
+
+    @abstractmethod
+    def compute(self, counts):
+        """Return the score for the counts of every error type."""
+        pass
 
     @classmethod
     def from_jcr(cls, jcr):
         return cls(**jcr)
 
 
-class ClassPrecisionScore(Score):
-    def __init__(self, name, inputs, preference="high", result=None):
-        super().__init__(name, inputs=inputs, preference=preference, result=result)
-
-    def build(self, data):
-        prediction_tag = self.inputs[0]
-        actual_tag = self.inputs[1]
-        preds = data[prediction_tag]
-
-        counts = pd.Series(to_reduce).value_counts().to_dict()
-        reduced = self.get_precision(counts)
-        self.result = reduced
+class PrecisionScore(ErrorTypeScore):
+    def compute(self, counts):
+        return counts["TP"] / (counts["TP"] + counts["FP"])
 
     def get_precision(self, counts):
-        result = {}
-        for key in ["TP", "FP", "TN", "FN"]:
-            if key not in counts:
-                counts[key] = 0
-        try:
-            result = counts["TP"] / (counts["TP"] + counts["FP"])
-        except:
-            result = -1
-        return result
+        """Deprecated, use `score_counts`."""
+        warnings.warn("get_precision is deprecated, use score_counts instead.", DeprecationWarning, stacklevel=2)
+        return self.score_counts(counts)
 
-    @classmethod
-    def from_jcr(cls, jcr):
-        return cls(**jcr)
 
+class RecallScore(ErrorTypeScore):
+    def compute(self, counts):
+        return counts["TP"] / (counts["TP"] + counts["FN"])
 
-class ClassRecallScore(Score):
-    def __init__(self, name, inputs, preference="high", result=None):
-        super().__init__(name, inputs=inputs, preference=preference, result=result)
+    def get_recall(self, counts):
+        """Deprecated, use `score_counts`."""
+        warnings.warn("get_recall is deprecated, use score_counts instead.", DeprecationWarning, stacklevel=2)
+        return self.score_counts(counts)
 
-    def build(self, data):
-        tag = self.inputs[0]
-        to_reduce = data[tag]
-        counts = pd.Series(to_reduce).value_counts().to_dict()
-        reduced = self.get_recall(counts)
-        self.result = reduced
 
-    def get_recall(self, counts):
-        result = {}
-        for key in ["TP", "FP", "TN", "FN"]:
-            if key not in counts:
-                counts[key] = 0
-        try:
-            result = counts["TP"] / (counts["TP"] + counts["FN"])
-        except:
-            result = -1
-        return result
+class ClassPrecisionScore(PrecisionScore):
+    pass
 
-    @classmethod
-    def from_jcr(cls, jcr):
-        return cls(**jcr)
+
+class ClassRecallScore(RecallScore):
+    pass
 
 
 class ElementCorrelationScore(Score):
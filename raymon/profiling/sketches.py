@@ -0,0 +1,752 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from raymon.globals import DataException, Serializable
+
+
+class Moments(Serializable):
+    """
+    Streaming count, min, max, mean and variance. Chunks are combined with the parallel algorithm of Chan et al., so updating and merging are exact up to floating point error.
+
+    References:
+    - https://en.wikipedia.org/wiki/Algorithms_for_calculating_variance#Parallel_algorithm
+    """
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, min=None, max=None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = min
+        self.max = max
+
+    @property
+    def variance(self):
+        if self.count == 0:
+            return None
+        return self.m2 / self.count
+
+    @property
+    def std(self):
+        if self.count == 0:
+            return None
+        return math.sqrt(self.variance)
+
+    def _combine(self, count, mean, m2, min, max):
+        if count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self.m2, self.min, self.max = count, mean, m2, min, max
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * count / total
+        self.m2 = self.m2 + m2 + delta**2 * self.count * count / total
+        self.count = total
+        self.min = min if min < self.min else self.min
+        self.max = max if max > self.max else self.max
+
+    def update(self, values):
+        """Add a 1D array of values, which should not contain NaNs."""
+        if len(values) == 0:
+            return self
+        mean = values.mean()
+        centered = values - mean
+        self._combine(
+            count=len(values),
+            mean=float(mean),
+            m2=float(np.dot(centered, centered)),
+            min=float(values.min()),
+            max=float(values.max()),
+        )
+        return self
+
+    def merge(self, other):
+        self._combine(count=other.count, mean=other.mean, m2=other.m2, min=other.min, max=other.max)
+        return self
+
+    def to_jcr(self):
+        return {
+            "class": self.class2str(),
+            "state": {"count": self.count, "mean": self.mean, "m2": self.m2, "min": self.min, "max": self.max},
+        }
+
+    @classmethod
+    def from_jcr(cls, jcr):
+        return cls(**jcr)
+
+
+class QuantileSketch(Serializable):
+    """
+    A KLL quantile sketch. Keeps a hierarchy of compactors, where every item in level h represents 2^h items of the data. When the sketch grows over its capacity, the lowest full level is sorted and every other item, starting at a random offset, is promoted to the next level. The sketch uses O(k) memory and the rank error is in the order of 1 / k. Sketches with the same k can be merged.
+
+    As long as fewer than k items were added, no compaction happens and quantiles are exact.
+
+    References:
+    - Karnin, Lang, Liberty. Optimal Quantile Approximation in Streams. FOCS 2016.
+
+    Parameters
+    ----------
+    k : int, optional
+        The capacity of the top compactor, which controls the accuracy. By default 1024.
+    seed : int, optional
+        Seed for the compaction offsets, for reproducible sketches.
+    """
+
+    _c = 2 / 3
+
+    def __init__(self, k=1024, seed=None, levels=None, count=0):
+        if not (isinstance(k, int) and k >= 8):
+            raise DataException("k must be an int >= 8")
+        self.k = k
+        self.count = count
+        if levels is None:
+            levels = [np.empty(0, dtype=np.float64)]
+        self.levels = [np.asarray(level, dtype=np.float64) for level in levels]
+        self._rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_sorted(cls, values, k=1024, seed=None):
+        """Create a sketch of sorted values, without compacting them one level at a time: every 2^h-th value is kept at the lowest level h that fits in k items. The values that do not fill a full stride are kept at level 0.
+
+        Parameters
+        ----------
+        values : np.ndarray
+            Sorted 1D array of values, without NaNs.
+        """
+        sketch = cls(k=k, seed=seed)
+        n = len(values)
+        if n <= k:
+            sketch.levels = [np.array(values, dtype=np.float64)]
+            sketch.count = n
+            return sketch
+        height = int(math.ceil(math.log2(n / k)))
+        stride = 2**height
+        n_strided = (n // stride) * stride
+        offset = int(sketch._rng.integers(0, stride))
+        levels = [np.empty(0, dtype=np.float64) for _ in range(height + 1)]
+        levels[0] = np.array(values[n_strided:], dtype=np.float64)
+        levels[height] = np.array(values[offset:n_strided:stride], dtype=np.float64)
+        sketch.levels = levels
+        sketch.count = n
+        sketch._compress()
+        return sketch
+
+    def capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(int(math.ceil(self.k * self._c**depth)), 2)
+
+    def size(self):
+        return sum(len(level) for level in self.levels)
+
+    def _compress(self):
+        # Compact lazily: only when the sketch is over its total capacity, and then the lowest level that is full.
+        while self.size() > sum(self.capacity(level) for level in range(len(self.levels))):
+            for level, items in enumerate(self.levels):
+                if len(items) > self.capacity(level):
+                    self._compact(level)
+                    break
+
+    def _compact(self, level):
+        if level + 1 == len(self.levels):
+            self.levels.append(np.empty(0, dtype=np.float64))
+        items = np.sort(self.levels[level])
+        # Keep the last item at this level when the count is odd, so the total weight is preserved.
+        n_pairs = len(items) // 2
+        offset = self._rng.integers(0, 2)
+        promoted = items[offset : 2 * n_pairs : 2]
+        self.levels[level] = items[2 * n_pairs :]
+        self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+
+    def update(self, values):
+        """Add a 1D array of values, which should not contain NaNs."""
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return self
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.count += len(values)
+        self._compress()
+        return self
+
+    def merge(self, other):
+        if self.k != other.k:
+            raise DataException(f"Cannot merge sketches with different k: {self.k} and {other.k}")
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0, dtype=np.float64))
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def weighted_items(self):
+        """Return the sorted items of the sketch and the cumulative weight up to and including every item."""
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2**h, dtype=np.int64) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        return items[order], np.cumsum(weights[order])
+
+    def percentiles(self, q):
+        """Estimate the q-th percentiles (0 - 100), using the same rank rule as np.percentile(interpolation='higher').
+
+        Parameters
+        ----------
+        q : array-like
+            The percentiles to estimate.
+
+        Returns
+        -------
+        np.ndarray
+        """
+        if self.count == 0:
+            raise DataException("Cannot compute percentiles of an empty sketch")
+        items, cumweights = self.weighted_items()
+        total = cumweights[-1]
+        ranks = np.ceil(np.asarray(q, dtype=np.float64) / 100 * (total - 1))
+        idx = np.searchsorted(cumweights, ranks, side="right")
+        return items[np.minimum(idx, len(items) - 1)]
+
+    def to_jcr(self):
+        return {
+            "class": self.class2str(),
+            "state": {"k": self.k, "count": self.count, "levels": [level.tolist() for level in self.levels]},
+        }
+
+    @classmethod
+    def from_jcr(cls, jcr):
+        return cls(**jcr)
+
+
+class NumericSketch(Serializable):
+    """
+    The streaming state of a :class:`raymon.profiling.stats.NumericStats`: the sample size, the number of NaNs and values outside the domain, and the moments and quantile sketch of the valid values.
+
+    Parameters
+    ----------
+    domain : tuple, optional
+        (min, max) of the valid values. One or both can be None.
+    k : int, optional
+        The size of the quantile sketch, by default 1024.
+    seed : int, optional
+        Seed of the quantile sketch.
+    """
+
+    def __init__(
+        self, domain=None, k=1024, seed=None, samplesize=0, n_nans=0, n_invalids=0, moments=None, quantiles=None
+    ):
+        self.domain = tuple(domain) if domain else None
+        self.samplesize = samplesize
+        self.n_nans = n_nans
+        self.n_invalids = n_invalids
+        self.moments = Moments() if moments is None else moments
+        self.quantiles = QuantileSketch(k=k, seed=seed) if quantiles is None else quantiles
+
+    def update(self, data, null=None):
+        n = len(data)
+        if null is not None:
+            data = np.asarray(data)[~null]
+        data = np.asarray(data, dtype=np.float64)
+        values = data[~np.isnan(data)]
+        self.samplesize += n
+        self.n_nans += n - len(values)
+        if self.domain:
+            lower, upper = self.domain
+            valid = np.ones(len(values), dtype=bool)
+            if lower is not None:
+                valid &= values >= lower
+            if upper is not None:
+                valid &= values <= upper
+            self.n_invalids += len(values) - int(valid.sum())
+            values = values[valid]
+        self.moments.update(values)
+        self.quantiles.update(values)
+        return self
+
+    def merge(self, other):
+        if self.domain != other.domain:
+            raise DataException(f"Cannot merge sketches with different domains: {self.domain} and {other.domain}")
+        self.samplesize += other.samplesize
+        self.n_nans += other.n_nans
+        self.n_invalids += other.n_invalids
+        self.moments.merge(other.moments)
+        self.quantiles.merge(other.quantiles)
+        return self
+
+    def to_jcr(self):
+        return {
+            "class": self.class2str(),
+            "state": {
+                "domain": self.domain,
+                "samplesize": self.samplesize,
+                "n_nans": self.n_nans,
+                "n_invalids": self.n_invalids,
+                "moments": self.moments.to_jcr()["state"],
+                "quantiles": self.quantiles.to_jcr()["state"],
+            },
+        }
+
+    @classmethod
+    def from_jcr(cls, jcr):
+        jcr = dict(jcr)
+        moments = Moments.from_jcr(jcr.pop("moments"))
+        quantiles = QuantileSketch.from_jcr(jcr.pop("quantiles"))
+        return cls(moments=moments, quantiles=quantiles, **jcr)
+
+
+OTHER_KEY = "__other__"
+
+
+class CategoricSketch(Serializable):
+    """
+    The streaming state of a :class:`raymon.profiling.stats.CategoricStats`: the sample size, the number of NaNs and values outside the domain, and the counts of the valid values.
+
+    By default all counts are exact. When `top_k` is set, at most `top_k` categories are counted, using the mergeable version of the Space-Saving algorithm: when a category that is not counted shows up and all counters are in use, the category with the lowest count is evicted. Every count is then an upper bound, and `count - error` is a lower bound of the true count. The error of every category is at most samplesize / top_k.
+
+    References:
+    - Metwally, Agrawal, El Abbadi. Efficient Computation of Frequent and Top-k Elements in Data Streams. ICDT 2005.
+    - Agarwal et al. Mergeable Summaries. PODS 2012.
+
+    Parameters
+    ----------
+    domain : list or set, optional
+        The valid categories.
+    top_k : int, optional
+        The maximum number of categories to count. By default None, which counts all of them.
+    """
+
+    def __init__(
+        self, domain=None, top_k=None, samplesize=0, n_nans=0, n_invalids=0, counts=None, errors=None, min_count=0
+    ):
+        if top_k is not None and not (isinstance(top_k, int) and top_k > 0):
+            raise DataException("top_k must be None or an int > 0")
+        self.domain = list(dict.fromkeys(domain)) if domain else None
+        self.top_k = top_k
+        self.samplesize = samplesize
+        self.n_nans = n_nans
+        self.n_invalids = n_invalids
+        self.counts = pd.Series({} if counts is None else counts, dtype=np.int64)
+        self.errors = pd.Series({} if errors is None else errors, dtype=np.int64)
+        # Upper bound of the count of every category that is not counted.
+        self.min_count = min_count
+
+    @property
+    def is_exact(self):
+        return self.min_count == 0
+
+    def _combine(self, counts, errors, min_count):
+        keys = self.counts.index.union(counts.index, sort=False)
+        combined = self.counts.reindex(keys, fill_value=self.min_count) + counts.reindex(keys, fill_value=min_count)
+        combined_errors = self.errors.reindex(keys, fill_value=self.min_count) + errors.reindex(
+            keys, fill_value=min_count
+        )
+        new_min = self.min_count + min_count
+        if self.top_k is not None and len(combined) > self.top_k:
+            combined = combined.sort_values(ascending=False, kind="stable")
+            # Evicted categories had at most the count of the largest evicted one.
+            new_min = int(combined.iloc[self.top_k])
+            combined = combined.iloc[: self.top_k]
+            combined_errors = combined_errors.reindex(combined.index)
+        self.counts = combined.astype(np.int64)
+        self.errors = combined_errors.astype(np.int64)
+        self.min_count = new_min
+
+    def update(self, data, null=None):
+        data = pd.Series(data, dtype=object) if not isinstance(data, pd.Series) else data
+        nan = pd.isna(data) if null is None else null
+        values = data[~nan]
+        self.samplesize += len(data)
+        self.n_nans += int(nan.sum())
+        if self.domain:
+            valid = values.isin(self.domain)
+            self.n_invalids += len(values) - int(valid.sum())
+            values = values[valid]
+        counts = values.value_counts(sort=False)
+        self._combine(counts, errors=pd.Series(0, index=counts.index, dtype=np.int64), min_count=0)
+        return self
+
+    def merge(self, other):
+        if self.domain != other.domain:
+            raise DataException(f"Cannot merge sketches with different domains: {self.domain} and {other.domain}")
+        if self.top_k != other.top_k:
+            raise DataException(f"Cannot merge sketches with different top_k: {self.top_k} and {other.top_k}")
+        self.samplesize += other.samplesize
+        self.n_nans += other.n_nans
+        self.n_invalids += other.n_invalids
+        self._combine(other.counts, errors=other.errors, min_count=other.min_count)
+        return self
+
+    def guaranteed_counts(self):
+        """The lower bounds of the counts, sorted from high to low. Equal to the counts when the sketch is exact."""
+        return (self.counts - self.errors).sort_values(ascending=False, kind="stable")
+
+    def to_jcr(self):
+        return {
+            "class": self.class2str(),
+            "state": {
+                "domain": self.domain,
+                "top_k": self.top_k,
+                "samplesize": self.samplesize,
+                "n_nans": self.n_nans,
+                "n_invalids": self.n_invalids,
+                "counts": {key: int(value) for key, value in self.counts.items()},
+                "errors": {key: int(value) for key, value in self.errors.items()},
+                "min_count": self.min_count,
+            },
+        }
+
+    @classmethod
+    def from_jcr(cls, jcr):
+        return cls(**jcr)
+
+
+def decay_factor(halflife):
+    """The factor the weight of every observation is multiplied with per new observation, so weights halve every halflife observations."""
+    if not halflife > 0:
+        raise DataException(f"halflife must be > 0, not {halflife}")
+    return 0.5 ** (1 / halflife)
+
+
+class DecayedWeights(Serializable):
+    """
+    Exponentially decayed weights of a stream of observations: the latest observation has weight 1, and every weight is multiplied by `decay` for every new observation. Keeps the total weight, the weight of the valid observations and the sum of the squared weights.
+
+    Parameters
+    ----------
+    decay : float
+        The decay factor per observation, between 0 and 1. See `decay_factor`.
+    """
+
+    def __init__(self, decay, weight=0.0, weight_sq=0.0, valid_weight=0.0):
+        self.decay = decay
+        self.weight = weight
+        self.weight_sq = weight_sq
+        self.valid_weight = valid_weight
+
+    @property
+    def effective_count(self):
+        """Kish's effective sample size of the weighted observations: (sum of weights)^2 / sum of squared weights."""
+        if self.weight_sq == 0:
+            return 0.0
+        return self.weight**2 / self.weight_sq
+
+    def update(self, valid):
+        """Add a chunk of observations, given as a boolean array of the observations that are valid.
+
+        Returns
+        -------
+        np.ndarray
+            The weights of the observations at the end of the chunk.
+        float
+            The factor the weights of all previous observations were multiplied with.
+        """
+        n = len(valid)
+        weights = self.decay ** np.arange(n - 1, -1, -1, dtype=np.float64)
+        shrink = self.decay**n
+        self.weight = self.weight * shrink + float(weights.sum())
+        self.weight_sq = self.weight_sq * shrink**2 + float(np.dot(weights, weights))
+        self.valid_weight = self.valid_weight * shrink + float(weights[valid].sum())
+        return weights, shrink
+
+    def to_jcr(self):
+        return {
+            "class": self.class2str(),
+            "state": {
+                "decay": self.decay,
+                "weight": self.weight,
+                "weight_sq": self.weight_sq,
+                "valid_weight": self.valid_weight,
+            },
+        }
+
+    @classmethod
+    def from_jcr(cls, jcr):
+        return cls(**jcr)
+
+
+class DecayedMoments(Serializable):
+    """
+    Exponentially weighted mean and variance. Chunks of weighted values are combined with the weighted version of the parallel algorithm of Chan et al., see :class:`Moments`.
+    """
+
+    def __init__(self, weight=0.0, mean=0.0, m2=0.0):
+        self.weight = weight
+        self.mean = mean
+        self.m2 = m2
+
+    @property
+    def variance(self):
+        if self.weight == 0:
+            return None
+        return self.m2 / self.weight
+
+    @property
+    def std(self):
+        if self.weight == 0:
+            return None
+        return math.sqrt(self.variance)
+
+    def update(self, values, weights, shrink):
+        """Add a 1D array of values without NaNs and their weights, after multiplying the weights of all previous values by shrink."""
+        self.weight *= shrink
+        self.m2 *= shrink
+        weight = float(weights.sum())
+        if weight == 0:
+            return self
+        mean = float(np.dot(weights, values)) / weight
+        centered = values - mean
+        m2 = float(np.dot(weights, centered * centered))
+        total = self.weight + weight
+        delta = mean - self.mean
+        self.mean = self.mean + delta * weight / total
+        self.m2 = self.m2 + m2 + delta**2 * self.weight * weight / total
+        self.weight = total
+        return self
+
+    def to_jcr(self):
+        return {"class": self.class2str(), "state": {"weight": self.weight, "mean": self.mean, "m2": self.m2}}
+
+    @classmethod
+    def from_jcr(cls, jcr):
+        return cls(**jcr)
+
+
+class DecayedReservoir(Serializable):
+    """
+    A fixed size sample of a stream in which the probability that a value is still present decays exponentially with its age. Every new value is inserted with probability `size * (1 - decay)`. While the reservoir is not full, an inserted value replaces a random value with a probability equal to the fill fraction and is appended otherwise; once full it always replaces a random value. Every value then survives a new value with probability `decay`, so the reservoir is a sample of the exponentially weighted distribution of the values, in constant time per value.
+
+    References:
+    - Aggarwal. On Biased Reservoir Sampling in the Presence of Stream Evolution. VLDB 2006.
+
+    Parameters
+    ----------
+    decay : float
+        The decay factor per value, between 0 and 1. See `decay_factor`.
+    size : int, optional
+        The maximal number of values in the reservoir, by default 256. Capped at 1 / (1 - decay), when every value is inserted.
+    seed : int, optional
+        Seed of the insertions and replacements.
+    rng_state : dict, optional
+        The state of the random generator, as serialized by `to_jcr`. When given, the reservoir continues the random stream of the reservoir it was serialized from, instead of starting from the seed.
+    """
+
+    def __init__(self, decay, size=256, seed=None, values=None, rng_state=None):
+        if not (isinstance(size, int) and size > 0):
+            raise DataException("size must be an int > 0")
+        self.decay = decay
+        self.size = max(1, min(size, int(1 / (1 - decay))))
+        self.insert_probability = min(1.0, self.size * (1 - decay))
+        self._buffer = np.empty(self.size, dtype=np.float64)
+        self.count = 0
+        if values is not None:
+            self.count = len(values)
+            self._buffer[: self.count] = values
+        self.seed = seed
+        self._rng = np.random.default_rng(seed)
+        if rng_state is not None:
+            self._rng.bit_generator.state = rng_state
+
+    @property
+    def values(self):
+        return self._buffer[: self.count]
+
+    def update(self, values):
+        """Add a 1D array of values, which should not contain NaNs."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[self._rng.random(len(values)) < self.insert_probability]
+        i = 0
+        while i < len(values) and self.count < self.size:
+            if self._rng.random() < self.count / self.size:
+                self._buffer[self._rng.integers(self.count)] = values[i]
+            else:
+                self._buffer[self.count] = values[i]
+                self.count += 1
+            i += 1
+        rest = values[i:]
+        if len(rest) > 0:
+            positions = self._rng.integers(self.size, size=len(rest))
+            # When several values replace the same position, the latest one is kept.
+            positions, latest = np.unique(positions[::-1], return_index=True)
+            self._buffer[positions] = rest[::-1][latest]
+        return self
+
+    def to_jcr(self):
+        return {
+            "class": self.class2str(),
+            "state": {
+                "decay": self.decay,
+                "size": self.size,
+                "seed": self.seed,
+                "values": self.values.tolist(),
+                "rng_state": self._rng.bit_generator.state,
+            },
+        }
+
+    @classmethod
+    def from_jcr(cls, jcr):
+        return cls(**jcr)
+
+
+class DecayedNumericSketch(Serializable):
+    """
+    The streaming state of a :class:`raymon.profiling.stats.DecayedNumericStats`: the number of observations, the decayed weights of all and of the valid observations, and the decayed moments and reservoir of the valid values. Takes constant time per observation and O(reservoir_size) memory.
+
+    Parameters
+    ----------
+    halflife : float
+        The number of observations after which the weight of an observation has halved.
+    domain : tuple, optional
+        (min, max) of the valid values. One or both can be None.
+    reservoir_size : int, optional
+        The size of the reservoir the percentiles are estimated from, by default 256.
+    seed : int, optional
+        Seed of the reservoir.
+    """
+
+    def __init__(
+        self,
+        halflife,
+        domain=None,
+        reservoir_size=256,
+        seed=None,
+        samplesize=0,
+        weights=None,
+        moments=None,
+        reservoir=None,
+    ):
+        decay = decay_factor(halflife)
+        self.halflife = halflife
+        self.domain = tuple(domain) if domain else None
+        self.samplesize = samplesize
+        self.weights = DecayedWeights(decay=decay) if weights is None else weights
+        self.moments = DecayedMoments() if moments is None else moments
+        self.reservoir = (
+            DecayedReservoir(decay=decay, size=reservoir_size, seed=seed) if reservoir is None else reservoir
+        )
+
+    def update(self, data, null=None):
+        data = np.asarray(data)
+        if null is not None and null.any():
+            data = np.where(null, np.nan, data)
+        data = np.asarray(data, dtype=np.float64)
+        valid = ~np.isnan(data)
+        if self.domain:
+            lower, upper = self.domain
+            with np.errstate(invalid="ignore"):
+                if lower is not None:
+                    valid &= data >= lower
+                if upper is not None:
+                    valid &= data <= upper
+        self.samplesize += len(data)
+        weights, shrink = self.weights.update(valid)
+        values = data[valid]
+        self.moments.update(values, weights[valid], shrink)
+        self.reservoir.update(values)
+        return self
+
+    def to_jcr(self):
+        return {
+            "class": self.class2str(),
+            "state": {
+                "halflife": self.halflife,
+                "domain": self.domain,
+                "samplesize": self.samplesize,
+                "weights": self.weights.to_jcr()["state"],
+                "moments": self.moments.to_jcr()["state"],
+                "reservoir": self.reservoir.to_jcr()["state"],
+            },
+        }
+
+    @classmethod
+    def from_jcr(cls, jcr):
+        jcr = dict(jcr)
+        weights = DecayedWeights.from_jcr(jcr.pop("weights"))
+        moments = DecayedMoments.from_jcr(jcr.pop("moments"))
+        reservoir = DecayedReservoir.from_jcr(jcr.pop("reservoir"))
+        return cls(weights=weights, moments=moments, reservoir=reservoir, **jcr)
+
+
+class DecayedCategoricSketch(Serializable):
+    """
+    The streaming state of a :class:`raymon.profiling.stats.DecayedCategoricStats`: the number of observations, the decayed weights of all and of the valid observations, and the decayed count of every category.
+
+    Decaying every count for every observation would take time linear in the number of categories. Instead, counts are kept relative to a `scale` that shrinks with the decay: the weight of a category is `counts[category] * scale`, and a new observation adds `1 / scale` to its count. When the scale gets very small, the counts are rescaled and categories without weight left are dropped. When `top_k` is set, at most 2 * top_k categories are kept: when there are more, only the top_k heaviest are kept, and the weight of the others is added to the `OTHER_KEY` category.
+
+    Parameters
+    ----------
+    halflife : float
+        The number of observations after which the weight of an observation has halved.
+    domain : list or set, optional
+        The valid categories.
+    top_k : int, optional
+        The number of categories to keep, by default None, which keeps all of them.
+    """
+
+    _min_scale = 1e-150
+
+    def __init__(
+        self, halflife, domain=None, top_k=None, samplesize=0, weights=None, counts=None, other=0.0, scale=1.0
+    ):
+        if top_k is not None and not (isinstance(top_k, int) and top_k > 0):
+            raise DataException("top_k must be None or an int > 0")
+        self.halflife = halflife
+        self.domain = list(dict.fromkeys(domain)) if domain else None
+        self.top_k = top_k
+        self.samplesize = samplesize
+        self.weights = DecayedWeights(decay=decay_factor(halflife)) if weights is None else weights
+        self.counts = {} if counts is None else dict(counts)
+        self.other = other
+        self.scale = scale
+
+    def category_weights(self):
+        """The decayed weight of every category, and the weight of the categories that are not kept."""
+        return {key: count * self.scale for key, count in self.counts.items()}, self.other * self.scale
+
+    def _rescale(self):
+        self.counts = {key: count * self.scale for key, count in self.counts.items() if count * self.scale > 0}
+        self.other *= self.scale
+        self.scale = 1.0
+
+    def _prune(self):
+        keys = sorted(self.counts, key=self.counts.get, reverse=True)
+        for key in keys[self.top_k :]:
+            self.other += self.counts.pop(key)
+
+    def update(self, data, null=None):
+        data = np.asarray(data, dtype=object)
+        valid = ~np.asarray(pd.isna(data) if null is None else null, dtype=bool)
+        if self.domain:
+            valid &= pd.Series(data, dtype=object).isin(self.domain).to_numpy()
+        self.samplesize += len(data)
+        weights, shrink = self.weights.update(valid)
+        self.scale *= shrink
+        if self.scale < self._min_scale:
+            self._rescale()
+        # A dict update per value: unlike grouping the chunk, this stays cheap for chunks of a single observation.
+        counts = self.counts
+        for key, count in zip(data[valid].tolist(), (weights[valid] / self.scale).tolist()):
+            counts[key] = counts.get(key, 0.0) + count
+        if self.top_k is not None and len(self.counts) > 2 * self.top_k:
+            self._prune()
+        return self
+
+    def to_jcr(self):
+        return {
+            "class": self.class2str(),
+            "state": {
+                "halflife": self.halflife,
+                "domain": self.domain,
+                "top_k": self.top_k,
+                "samplesize": self.samplesize,
+                "weights": self.weights.to_jcr()["state"],
+                "counts": self.counts,
+                "other": self.other,
+                "scale": self.scale,
+            },
+        }
+
+    @classmethod
+    def from_jcr(cls, jcr):
+        jcr = dict(jcr)
+        weights = DecayedWeights.from_jcr(jcr.pop("weights"))
+        return cls(weights=weights, **jcr)
@@ -5,20 +5,32 @@ from abc import ABC, abstractmethod
 from scipy.interpolate import interp1d
 from pydoc import locate
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 
 from raymon.globals import (
     Buildable,
     Serializable,
     DataException,
+    NoValidDataException,
 )
 
+from raymon.profiling.sketches import (
+    Moments,
+    QuantileSketch,
+    NumericSketch,
+    CategoricSketch,
+    DecayedNumericSketch,
+    DecayedCategoricSketch,
+    decay_factor,
+    OTHER_KEY,
+)
 from raymon.tags import Tag, CTYPE_TAGTYPES
 
 
 class Stats(Serializable, Buildable, ABC):
     @abstractmethod
-    def sample(self, n):
+    def sample(self, n, seed=None):
         raise NotImplementedError
 
     @abstractmethod
@@ -36,21 +48,88 @@ class Stats(Serializable, Buildable, ABC):
         }
         return invalids_report
 
+    def component2tag(self, name, value, tagtype):
+        tag_value = self.tag_value(value)
+        if tag_value is None:
+            return None
+        return Tag(name=name, value=tag_value, type=tagtype)
+
+    def check_invalid(self, name, value, tagtype):
+        error = self.error_value(value)
+        if error is None:
+            return None
+        return Tag(name=f"{name}-error", value=error, type=tagtype)
+
+    @abstractmethod
+    def tag_value(self, value):
+        """Return the value of the tag for the given component value, or None if no tag should be made."""
+        pass
+
+    @abstractmethod
+    def error_value(self, value):
+        """Return the value of the error tag for the given component value, or None if the value is valid."""
+        pass
+
+    @abstractmethod
+    def component2tag_multiple(self, values):
+        pass
+
     @abstractmethod
-    def component2tag(self, component, tagtype):
+    def check_invalid_multiple(self, values):
         pass
 
+    """Sample size"""
+
+    @property
+    def effective_samplesize(self):
+        """The number of instances the distribution was estimated from. Smaller than `samplesize` when the stats were built on a sample of the data, see `set_population_size`."""
+        if self._effective_samplesize is None:
+            return self.samplesize
+        return self._effective_samplesize
+
+    def set_population_size(self, samplesize):
+        """Mark the stats as built on a uniform sample of a dataset of `samplesize` instances. `samplesize` is set to the size of the dataset, while the confidence bounds keep reflecting the size of the sample."""
+        if self._effective_samplesize is None:
+            self._effective_samplesize = self.samplesize
+        self.samplesize = samplesize
+        self.update_bounds()
+
+    """Confidence bounds"""
+
+    def update_bounds(self):
+        """Invalidate the confidence bounds of the distribution. They are recomputed when they are accessed next."""
+        self._bounds = None
+
+    @property
+    def bounds(self):
+        """The cached (lower, upper) confidence bounds of the distribution, or (None, None) if the stats are not built."""
+        if getattr(self, "_bounds", None) is None:
+            self._bounds = self.conf_bounds_approx() if self.has_bounds() else (None, None)
+        return self._bounds
+
     @abstractmethod
-    def check_invalid(self, component, tagtype):
+    def has_bounds(self):
+        """Whether the stats are built far enough to compute confidence bounds."""
         pass
 
+    def is_built(self):
+        # The bounds are not checked directly, since that would compute them.
+        attrs_built = all(getattr(self, attr) is not None for attr in self._attrs if attr not in self._bound_attrs)
+        return attrs_built and self.has_bounds()
+
     def to_jcr(self):
         state = {}
         for attr in self._attrs:
             state[attr] = getattr(self, attr)
+        if self._effective_samplesize is not None:
+            state["effective_samplesize"] = self._effective_samplesize
         data = {"class": self.class2str(), "state": state}
         return data
 
+    def empty(self):
+        """Return new, unbuilt stats of the same type and with the same options."""
+        return self.__class__()
+
     @classmethod
     def from_jcr(cls, jcr):
         classpath = jcr["class"]
@@ -75,10 +154,25 @@ class NumericStats(Stats):
         "percentiles_ub",
         "is_singleton",
     ]
+    _bound_attrs = ["percentiles_lb", "percentiles_ub"]
 
     def __init__(
-        self, min=None, max=None, mean=None, std=None, invalids=None, percentiles=None, samplesize=None, **kwargs
+        self,
+        min=None,
+        max=None,
+        mean=None,
+        std=None,
+        invalids=None,
+        percentiles=None,
+        samplesize=None,
+        effective_samplesize=None,
+        grid=None,
+        percentile_grid=None,
+        **kwargs,
     ):
+        self._effective_samplesize = effective_samplesize
+        self.grid = grid
+        self.percentile_grid = percentile_grid
         self.samplesize = samplesize
         self.min = min
         self.max = max
@@ -86,6 +180,7 @@ class NumericStats(Stats):
         self.std = std
         self.invalids = invalids
         self.percentiles = percentiles
+        self._sketch = None
 
     """MIN"""
 
@@ -149,36 +244,84 @@ class NumericStats(Stats):
 
     """Percentiles"""
 
+    @property
+    def grid(self):
+        """How the percentiles to estimate are chosen when building: None or 'uniform' for the 101 percentiles 0, 1, ..., 100, 'tails' to add percentiles close to 0 and 100, 'adaptive' to only keep the percentiles where the value changes, or a list of percentiles (0 - 100) including 0 and 100."""
+        return self._grid
+
+    @grid.setter
+    def grid(self, value):
+        if isinstance(value, str) and value not in GRIDS:
+            raise DataException(f"stats.grid must be None, one of {GRIDS} or a list of percentiles, not {value}")
+        elif value is not None and not isinstance(value, str):
+            value = check_grid(value).tolist()
+        self._grid = value
+
+    @property
+    def percentile_grid(self):
+        """The percentiles (0 - 100) the values in `percentiles` are at."""
+        if self._percentile_grid is None:
+            return UNIFORM_GRID
+        return self._percentile_grid
+
+    @percentile_grid.setter
+    def percentile_grid(self, value):
+        if value is not None:
+            value = check_grid(value)
+            if np.array_equal(value, UNIFORM_GRID):
+                value = None
+        self._percentile_grid = value
+        self.update_bounds()
+
     @property
     def percentiles(self):
         return self._percentiles
 
     @percentiles.setter
     def percentiles(self, value):
+        n_percentiles = len(self.percentile_grid)
         if value is None:
             self._percentiles = None
 
-        elif len(value) == 101:
+        elif len(value) == n_percentiles:
             self._percentiles = list(value)
 
         else:
-            raise DataException("stats.percentiles must be None or a list of length 101.")
-
-        if self.samplesize and self.percentiles:
-            lower, upper = self.conf_bounds_approx()
-            self._percentiles_lb = lower
-            self._percentiles_ub = upper
-        else:
-            self._percentiles_lb = None
-            self._percentiles_ub = None
+            raise DataException(f"stats.percentiles must be None or a list of length {n_percentiles}.")
+        self.update_bounds()
+
+    def _set_percentiles(self, percentiles):
+        """Set the percentiles, estimated at the grid points of `resolve_grid(self.grid)`."""
+        grid = resolve_grid(self.grid)
+        if self.grid == "adaptive":
+            grid, percentiles = deduplicate_grid(grid, percentiles)
+        # Drop the percentiles first, so they never mismatch the grid.
+        self.percentiles = None
+        self.percentile_grid = grid
+        self.percentiles = np.asarray(percentiles).tolist()
+
+    def has_bounds(self):
+        return bool(self.samplesize and self.percentiles)
 
     @property
     def percentiles_lb(self):
-        return self._percentiles_lb
+        return self.bounds[0]
 
     @property
     def percentiles_ub(self):
-        return self._percentiles_ub
+        return self.bounds[1]
+
+    def empty(self):
+        return self.__class__(grid=self.grid)
+
+    def to_jcr(self):
+        data = super().to_jcr()
+        # Only stored when they are not the default, uniform grid
+        if self.grid is not None:
+            data["state"]["grid"] = self.grid
+        if self._percentile_grid is not None:
+            data["state"]["percentile_grid"] = self._percentile_grid.tolist()
+        return data
 
     """Domain Cardinality"""
 
@@ -202,6 +345,7 @@ class NumericStats(Stats):
         if value is not None and math.isnan(value):
             raise DataException("stats.samplesize cannot be NaN")
         self._samplesize = value
+        self.update_bounds()
 
     @property
     def range(self):
@@ -209,7 +353,7 @@ class NumericStats(Stats):
 
     """Buildable Interface"""
 
-    def build(self, data, domain=None):
+    def build(self, data, domain=None, inplace=False, null=None, mergeable=False):
         """
 
         Parameters
@@ -218,38 +362,132 @@ class NumericStats(Stats):
             [description]
         domain : [type], optional
                     For numericstats, the domain is the range of values: (min, max). One or both can also be None. by default None
+        inplace : bool, optional
+            Whether data may be sorted and overwritten. Avoids copying data when it is a float64 numpy array. By default False.
+        null : np.ndarray, optional
+            A boolean mask of the values in data that are None or NaN, when it is already known. See `raymon.profiling.utils.null_mask`.
+        mergeable : bool, optional
+            Whether to keep a summary of the data, so these stats can be merged with others or updated with more data, see `merge`. By default False.
         """
-        data = np.array(data)
         self.samplesize = len(data)
-        nan = np.isnan(data)
-        n_nans = len(data[nan])
-        data = data[~nan]
+        if null is not None and null.any():
+            # Masking copies the data, so the copy may be overwritten.
+            data = np.asarray(data)[~null]
+            inplace = True
+        # Work on a single sorted float buffer: NaNs are sorted to the end and the values within the domain form a contiguous slice.
+        data = np.array(data, dtype=np.float64, copy=not inplace)
+        data.sort()
+        n_values = int(np.searchsorted(data, np.nan, side="left"))
+        n_nans = self.samplesize - n_values
+        data = data[:n_values]
+        if n_values == 0:
+            raise NoValidDataException("Cannot build NumericStats: data contains no numeric values.")
 
         if domain and domain[0] is not None:
             self.min = domain[0]
         else:
-            self.min = float(np.min(data))
+            self.min = float(data[0])
 
         if domain and domain[1] is not None:
             self.max = domain[1]
         else:
-            self.max = float(np.max(data))
-        valid = (self.min <= data) & (self.max >= data)
-        n_invalids = len(data[~valid])
-        data = data[valid]
-
-        self.mean = float(data.mean())
-        self.std = float(data.std())
-
-        # Build cdf estimate based on percentiles
-        q = np.arange(start=0, stop=101, step=1)
-        self.percentiles = [float(a) for a in np.percentile(a=data, q=q, interpolation="higher")]
+            self.max = float(data[-1])
+        lower = int(np.searchsorted(data, self.min, side="left"))
+        upper = int(np.searchsorted(data, self.max, side="right"))
+        n_invalids = n_values - max(upper - lower, 0)
+        data = data[lower:upper]
+        if len(data) == 0:
+            raise NoValidDataException("Cannot build NumericStats: data contains no values within the domain.")
+
+        # Build cdf estimate based on percentiles, equal to np.percentile(data, q, interpolation="higher")
+        q = resolve_grid(self.grid)
+        self._set_percentiles(data[higher_percentile_indices(len(data), q)])
+        # Keep a summary of the data, so these stats can be merged with others.
+        quantiles = QuantileSketch.from_sorted(data) if mergeable else None
+        data_min, data_max = float(data[0]), float(data[-1])
+
+        # The buffer is no longer needed sorted: center it in place for the std.
+        mean = data.mean()
+        data -= mean
+        m2 = float(np.dot(data, data))
+        self.mean = float(mean)
+        self.std = float(np.sqrt(m2 / len(data)))
 
         # Check the invalid
         self.invalids = (n_invalids + n_nans) / self.samplesize
+        self._sketch = None
+        if mergeable:
+            self._sketch = NumericSketch(
+                domain=domain,
+                samplesize=self.samplesize,
+                n_nans=n_nans,
+                n_invalids=n_invalids,
+                moments=Moments(count=len(data), mean=self.mean, m2=m2, min=data_min, max=data_max),
+                quantiles=quantiles,
+            )
+
+    """Streaming Interface"""
 
-    def is_built(self):
-        return all(getattr(self, attr) is not None for attr in self._attrs)
+    @property
+    def sketch(self):
+        return self._sketch
+
+    def update(self, data, domain=None, k=1024, seed=None, null=None):
+        """Add a chunk of data to the streaming state of the stats. Call `finalize` after the last chunk to set the stats. Unlike `build`, the full data never needs to be in memory.
+
+        Parameters
+        ----------
+        data : array-like
+            A chunk of data.
+        domain : tuple, optional
+            (min, max) of the valid values, see `build`. Only used for the first chunk.
+        k : int, optional
+            The size of the quantile sketch, by default 1024. Only used for the first chunk.
+        seed : int, optional
+            Seed of the quantile sketch. Only used for the first chunk.
+        null : np.ndarray, optional
+            A boolean mask of the values in data that are None or NaN, see `build`.
+        """
+        if self._sketch is None:
+            self._sketch = NumericSketch(domain=domain, k=k, seed=seed)
+        self._sketch.update(data, null=null)
+        return self
+
+    def merge(self, other):
+        """Merge the streaming state of other stats, for example built by another worker, into these stats. Call `finalize` afterwards. Stats that were built need to be built with `mergeable=True`."""
+        if other.sketch is None:
+            raise DataException("Cannot merge stats without streaming state. Use update() or build(mergeable=True).")
+        if self._sketch is None and self.is_built():
+            raise DataException(
+                "Cannot merge into stats without streaming state. Use update() or build(mergeable=True)."
+            )
+        if self._sketch is None:
+            self._sketch = NumericSketch.from_jcr(other.sketch.to_jcr()["state"])
+        else:
+            self._sketch.merge(other.sketch)
+        return self
+
+    def finalize(self):
+        """Set the stats from the streaming state. Percentiles are estimated by the quantile sketch and are exact for up to k values."""
+        sketch = self._sketch
+        if sketch is None or sketch.samplesize == 0:
+            raise DataException("Cannot finalize stats without data. Use update() to add data.")
+        moments = sketch.moments
+        if moments.count == 0:
+            raise NoValidDataException("Cannot build NumericStats: data contains no valid values.")
+        domain = sketch.domain or (None, None)
+        self.min = domain[0] if domain[0] is not None else moments.min
+        self.max = domain[1] if domain[1] is not None else moments.max
+        self.mean = moments.mean
+        self.std = moments.std
+        self.samplesize = sketch.samplesize
+        self.invalids = (sketch.n_invalids + sketch.n_nans) / sketch.samplesize
+        percentiles = sketch.quantiles.percentiles(resolve_grid(self.grid))
+        # The extremes are known exactly
+        percentiles[0] = moments.min
+        percentiles[-1] = moments.max
+        self._set_percentiles(percentiles)
+        return self
 
     """Testing and sampling functions"""
 
@@ -281,70 +519,49 @@ class NumericStats(Stats):
             epsilon, as in the DKW
         """
         #
-        ys = list(range(101))
+        ys = self.percentile_grid
         alpha = 0.05
-        epsilon = np.sqrt(np.log(2.0 / alpha) / (2 * self.samplesize)) * 100
+        epsilon = dkw_epsilon(self.effective_samplesize, alpha=alpha) * 100
         lower = np.clip(ys - epsilon, 0, 100)
         upper = np.clip(ys + epsilon, 0, 100)
-        # now, get the x values that match the upper and lower y values so at the percentile points range(101)
-        interpolator_lower = interp1d(
-            x=lower, y=self.percentiles, fill_value=(self.percentiles[0], self.percentiles[-1]), bounds_error=False
-        )
-        perc_lb = interpolator_lower(list(range(101)))
-        interpolator_upper = interp1d(
-            x=upper, y=self.percentiles, fill_value=(self.percentiles[0], self.percentiles[-1]), bounds_error=False
-        )
-        perc_ub = interpolator_upper(list(range(101)))
+        # now, get the x values that match the upper and lower y values so at the percentile points of the grid
+        # np.interp clamps to the first and last percentile outside of the shifted range.
+        perc_lb = np.interp(ys, lower, self.percentiles)
+        perc_ub = np.interp(ys, upper, self.percentiles)
         return perc_lb.tolist(), perc_ub.tolist()
 
-    def conf_bounds_bootstrap(self, n=100):
-        run_diffs = []
-        q = np.arange(start=0, stop=101, step=1)
-        original_perc = np.array(self.percentiles)
-        for _ in range(100):
-            px = self.sample(n=self.samplesize)
-            percentiles = [float(a) for a in np.percentile(a=px, q=q, interpolation="higher")]
-            perc_change = percentiles - original_perc
-            run_diffs.append(perc_change)
-
-        run_diffs = np.array(run_diffs)
+    def conf_bounds_bootstrap(self, n=100, seed=None, workers=1):
+        """Estimate the 90% confidence interval of the percentiles by bootstrapping: resample the distribution n times and take the 5th and 95th percentile of the change of every percentile. See `bootstrap`.
+
+        Parameters
+        ----------
+        n : int, optional
+            The number of resamples, by default 100.
+        seed : int or np.random.Generator, optional
+            Seed of the resamples.
+        workers : int, optional
+            The number of threads to resample with, by default 1.
+        """
+        original_perc = np.array(self.percentiles, dtype=np.float64)
+        size = self.effective_samplesize
+        indices = higher_percentile_indices(size, self.percentile_grid)
+
+        def resample(rng, rows):
+            px = self._sample_percentiles(rng.random((rows, size)) * 100)
+            px.sort(axis=1)
+            return px[:, indices]
+
+        run_diffs = bootstrap(resample, n=n, size=size, seed=seed, workers=workers) - original_perc
         # sort columns
+        run_diffs.sort(axis=0)
         lower_idx = int(n * 0.05)
         upper_idx = int(n * 0.95)
-        runs, ps = run_diffs.shape
-        for p in range(ps):
-            run_diffs[:, p] = np.sort(run_diffs[:, p])
         percentile_lb = original_perc + run_diffs[lower_idx, :]
         percentile_ub = original_perc + run_diffs[upper_idx, :]
         return percentile_lb.tolist(), percentile_ub.tolist()
 
     def report_drift(self, other, threshold):
-        if other.samplesize == 0:
-            return {"drift": -1, "drift_idx": -1, "alert": False, "valid": False}
-
-        merged_domain = np.sort(np.concatenate([self.percentiles, other.percentiles]))
-        # If certain values cause jumps of multiple percentages, that value should be associated with the maximum percentage
-        lb_self_interpolated = interpolate(self.percentiles_lb, merged_domain)
-        lb_other_interpolated = interpolate(other.percentiles_lb, merged_domain)
-        ub_self_interpolated = interpolate(self.percentiles_ub, merged_domain)
-        ub_other_interpolated = interpolate(other.percentiles_ub, merged_domain)
-
-        # Check one above other, and the reverse
-        dists1 = np.array(lb_self_interpolated) - np.array(ub_other_interpolated)
-        dists2 = np.array(lb_other_interpolated) - np.array(ub_self_interpolated)
-        # Keep the maximum distance per x value, and only keep positive ones
-        maxes = np.maximum(np.maximum(dists1, dists2), 0)
-        drift = min(np.max(maxes), 100) / 100
-        drift_xvalue = merged_domain[int(np.argmax(maxes))]
-        # drift_xvalue = merged_domain[drift_idx]
-
-        drift_report = {
-            "drift": float(drift),
-            "drift_xvalue": drift_xvalue,
-            "alert": bool(drift > threshold),
-            "valid": True,
-        }
-        return drift_report
+        return report_numeric_drift_multiple([self], [other], thresholds=[threshold])[0]
 
     def report_singleton_change(self, other):
         if other.samplesize == 0:
@@ -358,70 +575,101 @@ class NumericStats(Stats):
         else:
             return {"is_singleton": False, "singleton_value": -1, "alert": False, "valid": True}
 
-    def sample(self, n, dtype="float"):
-        # Sample floats in range 0 - len(percentiles)
-        samples = np.random.random(n) * 100
-
-        # We will lineraly interpolate the sample between the percentiles, so get their integer floor and ceil percentile, and the relative diztance from the floor (between 0 and 1)
-        floor_percentiles = np.floor(samples).astype("uint8")
-        ceil_percentiles = np.ceil(samples).astype("uint8")
-        percentiles_alpha = samples - np.floor(samples)
+    def sample(self, n, dtype="float", seed=None):
+        """Draw n values from the distribution described by the percentiles.
 
-        percentiles = np.array(self.percentiles)
-        px = percentiles[floor_percentiles] * (1 - percentiles_alpha) + percentiles[ceil_percentiles] * (
-            percentiles_alpha
-        )
+        Parameters
+        ----------
+        n : int
+        dtype : str, optional
+            'float' or 'int', by default 'float'.
+        seed : int or np.random.Generator, optional
+            Seed of the sample.
+        """
+        rng = np.random.default_rng(seed)
+        # Sample floats in range 0 - 100
+        samples = rng.random(n) * 100
+        px = self._sample_percentiles(samples)
 
         if dtype == "int":
-            return px.astype(np.int)
+            return px.astype(np.int64)
         else:
             return px
 
+    def _sample_percentiles(self, samples):
+        """Map an array of any shape with floats in range 0 - 100 to values of the distribution."""
+        # We will lineraly interpolate the sample between the percentiles that surround it
+        if self._percentile_grid is not None:
+            return np.interp(samples, self.percentile_grid, self.percentiles)
+        # On the uniform grid, get their integer floor and ceil percentile, and the relative distance from the floor (between 0 and 1)
+        floor_percentiles = np.floor(samples)
+        percentiles_alpha = samples - floor_percentiles
+        floor_percentiles = floor_percentiles.astype(np.intp)
+        ceil_percentiles = np.minimum(floor_percentiles + 1, 100)
+        percentiles = np.asarray(self.percentiles, dtype=np.float64)
+        return (
+            percentiles[floor_percentiles] * (1 - percentiles_alpha) + percentiles[ceil_percentiles] * percentiles_alpha
+        )
 
-class IntStats(NumericStats):
-    def component2tag(self, name, value, tagtype):
-        if not math.isnan(value):
-            return Tag(name=name, value=int(value), type=tagtype)
-        else:
-            return None
-
-    def check_invalid(self, name, value, tagtype):
-        tagname = f"{name}-error"
+    def error_value(self, value):
         if value is None:
-            return Tag(name=tagname, value="Value None", type=tagtype)
+            return "Value None"
         elif math.isnan(value):
-            return Tag(name=tagname, value="Value NaN", type=tagtype)
+            return "Value NaN"
         elif value > self.max:
-            return Tag(name=tagname, value="UpperBoundError", type=tagtype)
+            return "UpperBoundError"
         elif value < self.min:
-            return Tag(name=tagname, value="LowerBoundError", type=tagtype)
+            return "LowerBoundError"
         else:
             return None
 
+    def check_invalid_multiple(self, values):
+        """Vectorized version of `check_invalid`.
+
+        Parameters
+        ----------
+        values : array-like
+            The extracted component values for multiple data instances.
+
+        Returns
+        -------
+        np.ndarray
+            An object array with the error tag value for every instance, or None if the value is valid.
+        """
+        is_none, values = as_float_array(values)
+        with np.errstate(invalid="ignore"):
+            conditions = [is_none, np.isnan(values), values > self.max, values < self.min]
+        choices = ["Value None", "Value NaN", "UpperBoundError", "LowerBoundError"]
+        return np.select(conditions, choices, default=None)
+
+
+class IntStats(NumericStats):
+    def tag_value(self, value):
+        if not math.isnan(value):
+            return int(value)
+        else:
+            return None
+
+    def component2tag_multiple(self, values):
+        _, values = as_float_array(values)
+        # Truncate like int() does, NaNs become <NA>
+        return pd.array(np.trunc(values), dtype="Int64")
+
     @classmethod
     def from_jcr(cls, data):
         return cls(**data)
 
 
 class FloatStats(NumericStats):
-    def component2tag(self, name, value, tagtype):
+    def tag_value(self, value):
         if not math.isnan(value):
-            return Tag(name=name, value=float(value), type=tagtype)
+            return float(value)
         else:
             return None
 
-    def check_invalid(self, name, value, tagtype):
-        tagname = f"{name}-error"
-        if value is None:
-            return Tag(name=tagname, value="Value None", type=tagtype)
-        elif math.isnan(value):
-            return Tag(name=tagname, value="Value NaN", type=tagtype)
-        elif value > self.max:
-            return Tag(name=tagname, value="UpperBoundError", type=tagtype)
-        elif value < self.min:
-            return Tag(name=tagname, value="LowerBoundError", type=tagtype)
-        else:
-            return None
+    def component2tag_multiple(self, values):
+        _, values = as_float_array(values)
+        return values
 
     @classmethod
     def from_jcr(cls, data):
@@ -431,12 +679,15 @@ class FloatStats(NumericStats):
 class CategoricStats(Stats):
 
     _attrs = ["frequencies", "invalids", "samplesize", "frequencies_lb", "frequencies_ub", "is_singleton"]
+    _bound_attrs = ["frequencies_lb", "frequencies_ub"]
 
-    def __init__(self, frequencies=None, invalids=None, samplesize=None, **kwargs):
+    def __init__(self, frequencies=None, invalids=None, samplesize=None, effective_samplesize=None, **kwargs):
 
+        self._effective_samplesize = effective_samplesize
         self.samplesize = samplesize
         self.frequencies = frequencies
         self.invalids = invalids
+        self._sketch = None
 
     """frequencies"""
 
@@ -456,22 +707,19 @@ class CategoricStats(Stats):
             self._frequencies = value
         else:
             raise DataException(f"stats.frequencies should be a dict, not {type(value)}")
+        self._sampler = None
+        self.update_bounds()
 
-        if self.samplesize and self.frequencies:
-            lower, upper = self.conf_bounds_approx()
-            self._frequencies_lb = lower
-            self._frequencies_ub = upper
-        else:
-            self._frequencies_lb = None
-            self._frequencies_ub = None
+    def has_bounds(self):
+        return bool(self.samplesize and self.frequencies)
 
     @property
     def frequencies_lb(self):
-        return self._frequencies_lb
+        return self.bounds[0]
 
     @property
     def frequencies_ub(self):
-        return self._frequencies_ub
+        return self.bounds[1]
 
     """PINV"""
 
@@ -503,6 +751,7 @@ class CategoricStats(Stats):
         if value is not None and math.isnan(value):
             raise DataException("stats.samplesize cannot be NaN")
         self._samplesize = value
+        self.update_bounds()
 
     @property
     def range(self):
@@ -526,7 +775,7 @@ class CategoricStats(Stats):
         else:
             return 0
 
-    def build(self, data, domain=None):
+    def build(self, data, domain=None, top_k=None, null=None, mergeable=False):
         """[summary]
 
         Parameters
@@ -535,25 +784,66 @@ class CategoricStats(Stats):
             [description]
         domain : [type], optional
             The domain of the featrue. A list or set, by default None
+        top_k : int, optional
+            Only keep the frequencies of the top_k most frequent categories, see `update`. By default None.
+        null : np.ndarray, optional
+            A boolean mask of the values in data that are None or NaN, when it is already known. See `raymon.profiling.utils.null_mask`.
+        mergeable : bool, optional
+            Unused: categoric stats always keep their counts, which are no larger than their frequencies, and can always be merged.
         """
-        data = pd.Series(data)
-        self.samplesize = len(data)
-        nan = pd.isna(data)
-        n_nans = len(data[nan])
-        data = data[~nan]
-
-        if domain:
-            domain = set(domain)
-            valid = data.isin(domain)
-            n_invalids = len(data[~valid])
-            data = data[valid]
-        else:
-            n_invalids = 0
-        self.frequencies = data.value_counts(normalize=True).to_dict()
-        self.invalids = (n_nans + n_invalids) / self.samplesize
+        self._sketch = None
+        self.update(data, domain=domain, top_k=top_k, null=null)
+        self.finalize()
 
-    def is_built(self):
-        return all(getattr(self, attr) is not None for attr in self._attrs)
+    """Streaming Interface"""
+
+    @property
+    def sketch(self):
+        return self._sketch
+
+    def update(self, data, domain=None, top_k=None, null=None):
+        """Add a chunk of data to the streaming state of the stats, which keeps the raw counts of the categories. Call `finalize` after the last chunk to set the stats.
+
+        Parameters
+        ----------
+        data : array-like
+            A chunk of data.
+        domain : list or set, optional
+            The valid categories, see `build`. Only used for the first chunk.
+        top_k : int, optional
+            Only count the top_k most frequent categories, for columns with a very high cardinality. All other categories are grouped in the frequency of the `OTHER_KEY` category, and are not reported as domain errors when validating. Only used for the first chunk. By default None, which counts all categories.
+        null : np.ndarray, optional
+            A boolean mask of the values in data that are None or NaN, see `build`.
+        """
+        if self._sketch is None:
+            self._sketch = CategoricSketch(domain=domain, top_k=top_k)
+        self._sketch.update(data, null=null)
+        return self
+
+    def merge(self, other):
+        """Merge the streaming state of other stats, for example built by another worker, into these stats. Call `finalize` afterwards."""
+        if other.sketch is None:
+            raise DataException("Cannot merge stats without streaming state. Use update() or build() first.")
+        if self._sketch is None:
+            self._sketch = CategoricSketch.from_jcr(other.sketch.to_jcr()["state"])
+        else:
+            self._sketch.merge(other.sketch)
+        return self
+
+    def finalize(self):
+        """Set the frequencies and invalids from the streaming state."""
+        sketch = self._sketch
+        if sketch is None or sketch.samplesize == 0:
+            raise DataException("Cannot finalize stats without data. Use update() to add data.")
+        counts = sketch.guaranteed_counts()
+        n_valid = sketch.samplesize - sketch.n_nans - sketch.n_invalids
+        frequencies = {key: int(count) / n_valid for key, count in counts.items() if count > 0}
+        if not sketch.is_exact:
+            frequencies[OTHER_KEY] = (n_valid - int(counts.sum())) / n_valid
+        self.samplesize = sketch.samplesize
+        self.frequencies = frequencies
+        self.invalids = (sketch.n_nans + sketch.n_invalids) / sketch.samplesize
+        return self
 
     """Testing and sampling functions"""
 
@@ -571,56 +861,44 @@ class CategoricStats(Stats):
         nobs : [type]
             [description]
         """
-        lower = {}
-        upper = {}
         z = 1.96  # z score of 1.96 leads to 95% interval (gaussian)
-        for key, prob in self.frequencies.items():
-            std_dev = math.sqrt(prob * (1 - prob) / self.samplesize)
-            error = z * std_dev
-            upper[key] = min(prob + error, 1)
-            lower[key] = max(prob - error, 0)
+        keys = list(self.frequencies.keys())
+        probs = np.fromiter(self.frequencies.values(), dtype=np.float64, count=len(keys))
+        error = z * np.sqrt(probs * (1 - probs) / self.effective_samplesize)
+        lower = dict(zip(keys, np.maximum(probs - error, 0).tolist()))
+        upper = dict(zip(keys, np.minimum(probs + error, 1).tolist()))
         return lower, upper
 
-    def conf_bounds_bootstrap(self, n=100):
+    def conf_bounds_bootstrap(self, n=100, seed=None, workers=1):
+        """Estimate the confidence interval of the frequencies by bootstrapping: the category counts of n resamples are drawn from a multinomial distribution. See `bootstrap`.
 
-        run_diffs = defaultdict(list)
-        lower_idx = int(n * 0.95)
-        upper_idx = int(n * 0.05)
-
-        for _ in range(n):
-            s = self.sample(n=self.samplesize)
-            frequencies_sampled = pd.Series(s).value_counts(normalize=True).to_dict()
-            for key in self.frequencies.keys():
-                run_diffs[key].append(frequencies_sampled.get(key, 0) - self.frequencies[key])
+        Parameters
+        ----------
+        n : int, optional
+            The number of resamples, by default 100.
+        seed : int or np.random.Generator, optional
+            Seed of the resamples.
+        workers : int, optional
+            The number of threads to resample with, by default 1.
+        """
+        keys = list(self.frequencies.keys())
+        frequencies = np.array(list(self.frequencies.values()), dtype=np.float64)
+        p = frequencies / frequencies.sum()
+        size = self.effective_samplesize
+        lower_idx = int(n * 0.05)
+        upper_idx = int(n * 0.95)
 
-        freq_lb = {}
-        freq_ub = {}
-        for key in run_diffs:
-            errors_sorted = np.sort(run_diffs[key])
-            freq_lb[key] = max(0, self.frequencies[key] - errors_sorted[upper_idx])
-            freq_ub[key] = min(1, self.frequencies[key] - errors_sorted[lower_idx])
+        def resample(rng, rows):
+            return rng.multinomial(size, p, size=rows) / size
 
-        return freq_lb, freq_ub
+        errors_sorted = bootstrap(resample, n=n, size=len(keys), seed=seed, workers=workers) - frequencies
+        errors_sorted.sort(axis=0)
+        freq_lb = np.maximum(0, frequencies + errors_sorted[lower_idx, :])
+        freq_ub = np.minimum(1, frequencies + errors_sorted[upper_idx, :])
+        return dict(zip(keys, freq_lb.tolist())), dict(zip(keys, freq_ub.tolist()))
 
     def report_drift(self, other, threshold):
-        if other.samplesize == 0:
-            return {"drift": -1, "drift_idx": -1, "alert": False, "valid": False}
-        _, _, full_domain = equalize_domains(self.frequencies, other.frequencies)
-
-        # The following boils down to the Chebyshev distance between the confidence intervals
-        max_diff = -1
-        max_diff_idx = 0
-        for k in full_domain:
-            diff = max([self.f_lb(k) - other.f_ub(k), other.f_lb(k) - self.f_ub(k), 0])
-            if diff > max_diff:
-                max_diff = diff
-                max_diff_idx = k
-
-        drift = min(max_diff, 1)
-        drift_idx = max_diff_idx
-        drift_report = {"drift": float(drift), "drift_idx": drift_idx, "alert": bool(drift > threshold), "valid": True}
-
-        return drift_report
+        return report_categoric_drift_multiple([self], [other], thresholds=[threshold])[0]
 
     def report_singleton_change(self, other):
         if other.samplesize == 0:
@@ -640,11 +918,22 @@ class CategoricStats(Stats):
         else:
             return {"is_singleton": False, "singleton_value": -1, "alert": False, "valid": True}
 
-    def sample(self, n):
-        domain = sorted(list(self.frequencies.keys()))
-        # Let's be absolutely sure the domain is always in the same order
-        p = [self.frequencies[k] for k in domain]
-        return np.random.choice(a=domain, size=n, p=p)
+    def sample(self, n, seed=None):
+        """Draw n categories according to the frequencies.
+
+        Parameters
+        ----------
+        n : int
+        seed : int or np.random.Generator, optional
+            Seed of the sample.
+        """
+        if self._sampler is None:
+            domain = sorted(list(self.frequencies.keys()))
+            # Let's be absolutely sure the domain is always in the same order
+            p = np.array([self.frequencies[k] for k in domain], dtype=np.float64)
+            self._sampler = (np.array(domain, dtype=object), p / p.sum())
+        domain, p = self._sampler
+        return np.random.default_rng(seed).choice(a=domain, size=n, p=p)
 
     def sample_counts(self, domain_freq, keys, n):
         domain = sorted(list(keys))
@@ -654,29 +943,343 @@ class CategoricStats(Stats):
         counts += 1  # make sure there are no zeros
         return counts
 
-    def component2tag(self, name, value, tagtype):
+    def tag_value(self, value):
         if isinstance(value, str):
-            return Tag(name=name, value=str(value), type=tagtype)
+            return str(value)
         else:
             return None
 
-    def check_invalid(self, name, value, tagtype):
-        tagname = f"{name}-error"
+    def error_value(self, value):
         if value is None:
-            return Tag(name=tagname, value="Value None", type=tagtype)
+            return "Value None"
         elif pd.isnull(value):
-            return Tag(name=tagname, value="Value NaN", type=tagtype)
-        elif value not in self.frequencies:
-            return Tag(name=tagname, value="Domain Error", type=tagtype)
+            return "Value NaN"
+        elif value not in self.frequencies and OTHER_KEY not in self.frequencies:
+            return "Domain Error"
         else:
             return None
 
+    def component2tag_multiple(self, values):
+        values = pd.Series(np.asarray(values, dtype=object), dtype=object)
+        is_str = values.map(type) == str
+        return values.where(is_str, None).to_numpy()
+
+    def check_invalid_multiple(self, values):
+        """Vectorized version of `check_invalid`.
+
+        Parameters
+        ----------
+        values : array-like
+            The extracted component values for multiple data instances.
+
+        Returns
+        -------
+        np.ndarray
+            An object array with the error tag value for every instance, or None if the value is valid.
+        """
+        values = np.asarray(values, dtype=object)
+        is_none = np.equal(values, None)
+        is_nan = pd.isna(values)
+        if OTHER_KEY in self.frequencies:
+            in_domain = np.ones(len(values), dtype=bool)
+        else:
+            in_domain = pd.Series(values, dtype=object).isin(list(self.frequencies)).to_numpy()
+        conditions = [is_none, is_nan, ~in_domain]
+        choices = ["Value None", "Value NaN", "Domain Error"]
+        return np.select(conditions, choices, default=None)
+
     @classmethod
     def from_jcr(cls, data):
         return cls(**data)
 
 
+class DecayedNumericStats(FloatStats):
+    """
+    Exponentially decayed numeric stats, for continuous monitoring: every observation has weight 1 when it comes in, and its weight halves every `halflife` observations. The mean and std are exponentially weighted, the percentiles are estimated from a reservoir sample in which values survive with the same decay (see `raymon.profiling.sketches.DecayedReservoir`) and invalids is the decayed fraction of invalid observations. Updating takes constant time per observation and the state takes O(reservoir_size) memory.
+
+    Use `update` to add observations and `finalize` to set the stats, which can then be contrasted with a static reference with `report_drift` and `report_invalid_diff`. The confidence bounds use the effective sample size of the decayed weights, capped at the number of values in the reservoir. Decayed stats cannot be merged.
+
+    Parameters
+    ----------
+    halflife : float, optional
+        The number of observations after which the weight of an observation has halved, by default 1000.
+    reservoir_size : int, optional
+        The number of values the percentiles are estimated from, by default 256.
+    seed : int, optional
+        Seed of the reservoir.
+    """
+
+    def __init__(self, halflife=1000, reservoir_size=256, seed=None, sketch=None, **kwargs):
+        super().__init__(**kwargs)
+        decay_factor(halflife)
+        self.halflife = halflife
+        self.reservoir_size = reservoir_size
+        self.seed = seed
+        if sketch is not None:
+            self._sketch = DecayedNumericSketch.from_jcr(sketch)
+
+    def empty(self):
+        return self.__class__(
+            halflife=self.halflife, reservoir_size=self.reservoir_size, seed=self.seed, grid=self.grid
+        )
+
+    def to_jcr(self):
+        data = super().to_jcr()
+        data["state"]["halflife"] = self.halflife
+        data["state"]["reservoir_size"] = self.reservoir_size
+        data["state"]["seed"] = self.seed
+        if self._sketch is not None:
+            data["state"]["sketch"] = self._sketch.to_jcr()["state"]
+        return data
+
+    """Buildable Interface"""
+
+    def build(self, data, domain=None, inplace=False, null=None, mergeable=False):
+        """Build the stats from data, in which the last value is the most recent observation. See `update`. The decayed state is always kept, so the stats can be updated further, but they cannot be merged."""
+        self._sketch = None
+        self.update(data, domain=domain, null=null)
+        self.finalize()
+
+    """Streaming Interface"""
+
+    def update(self, data, domain=None, null=None):
+        """Add a chunk of observations, ordered from old to new. Call `finalize` to set the stats.
+
+        Parameters
+        ----------
+        data : array-like
+            A chunk of data.
+        domain : tuple, optional
+            (min, max) of the valid values, see `NumericStats.build`. Only used for the first chunk.
+        null : np.ndarray, optional
+            A boolean mask of the values in data that are None or NaN, see `NumericStats.build`.
+        """
+        if self._sketch is None:
+            self._sketch = DecayedNumericSketch(
+                halflife=self.halflife, domain=domain, reservoir_size=self.reservoir_size, seed=self.seed
+            )
+        self._sketch.update(data, null=null)
+        return self
+
+    def merge(self, other):
+        raise DataException("Decayed stats cannot be merged.")
+
+    def finalize(self):
+        """Set the stats from the decayed state."""
+        sketch = self._sketch
+        if sketch is None or sketch.samplesize == 0:
+            raise DataException("Cannot finalize stats without data. Use update() to add data.")
+        values = np.sort(sketch.reservoir.values)
+        if len(values) == 0:
+            raise NoValidDataException("Cannot build DecayedNumericStats: data contains no valid values.")
+        domain = sketch.domain or (None, None)
+        self.min = domain[0] if domain[0] is not None else float(values[0])
+        self.max = domain[1] if domain[1] is not None else float(values[-1])
+        self.mean = sketch.moments.mean
+        self.std = sketch.moments.std
+        self._effective_samplesize = max(1, min(int(round(sketch.weights.effective_count)), len(values)))
+        self.samplesize = sketch.samplesize
+        self.invalids = 1 - sketch.weights.valid_weight / sketch.weights.weight
+        self._set_percentiles(values[higher_percentile_indices(len(values), resolve_grid(self.grid))])
+        return self
+
+
+class DecayedCategoricStats(CategoricStats):
+    """
+    Exponentially decayed categoric stats, for continuous monitoring: every observation has weight 1 when it comes in, and its weight halves every `halflife` observations. The frequencies are the decayed counts of the categories, normalized, and invalids is the decayed fraction of invalid observations. Updating takes constant time per observation, see `raymon.profiling.sketches.DecayedCategoricSketch`.
+
+    Use `update` to add observations and `finalize` to set the stats, which can then be contrasted with a static reference with `report_drift` and `report_invalid_diff`. The confidence bounds use the effective sample size of the decayed weights. Decayed stats cannot be merged.
+
+    Parameters
+    ----------
+    halflife : float, optional
+        The number of observations after which the weight of an observation has halved, by default 1000.
+    top_k : int, optional
+        Only keep the top_k categories with the highest weight, grouping the others in the `OTHER_KEY` category, to bound the state of columns with a very high cardinality. By default None, which keeps all categories.
+    """
+
+    def __init__(self, halflife=1000, top_k=None, sketch=None, **kwargs):
+        super().__init__(**kwargs)
+        decay_factor(halflife)
+        self.halflife = halflife
+        self.top_k = top_k
+        if sketch is not None:
+            self._sketch = DecayedCategoricSketch.from_jcr(sketch)
+
+    def empty(self):
+        return self.__class__(halflife=self.halflife, top_k=self.top_k)
+
+    def to_jcr(self):
+        data = super().to_jcr()
+        data["state"]["halflife"] = self.halflife
+        data["state"]["top_k"] = self.top_k
+        if self._sketch is not None:
+            data["state"]["sketch"] = self._sketch.to_jcr()["state"]
+        return data
+
+    """Buildable Interface"""
+
+    def build(self, data, domain=None, null=None, mergeable=False):
+        """Build the stats from data, in which the last value is the most recent observation. See `update`. The decayed state is always kept, so the stats can be updated further, but they cannot be merged."""
+        self._sketch = None
+        self.update(data, domain=domain, null=null)
+        self.finalize()
+
+    """Streaming Interface"""
+
+    def update(self, data, domain=None, null=None):
+        """Add a chunk of observations, ordered from old to new. Call `finalize` to set the stats.
+
+        Parameters
+        ----------
+        data : array-like
+            A chunk of data.
+        domain : list or set, optional
+            The valid categories, see `CategoricStats.build`. Only used for the first chunk.
+        null : np.ndarray, optional
+            A boolean mask of the values in data that are None or NaN, see `CategoricStats.build`.
+        """
+        if self._sketch is None:
+            self._sketch = DecayedCategoricSketch(halflife=self.halflife, domain=domain, top_k=self.top_k)
+        self._sketch.update(data, null=null)
+        return self
+
+    def merge(self, other):
+        raise DataException("Decayed stats cannot be merged.")
+
+    def finalize(self):
+        """Set the frequencies and invalids from the decayed state."""
+        sketch = self._sketch
+        if sketch is None or sketch.samplesize == 0:
+            raise DataException("Cannot finalize stats without data. Use update() to add data.")
+        weights, other = sketch.category_weights()
+        total = sum(weights.values()) + other
+        if total == 0:
+            raise NoValidDataException("Cannot finalize stats without valid data.")
+        frequencies = {key: weight / total for key, weight in weights.items()}
+        if other > 0:
+            frequencies[OTHER_KEY] = other / total
+        self._effective_samplesize = max(1, int(round(sketch.weights.effective_count)))
+        self.samplesize = sketch.samplesize
+        self.frequencies = frequencies
+        self.invalids = 1 - sketch.weights.valid_weight / sketch.weights.weight
+        return self
+
+
+def dkw_epsilon(n, alpha=0.05):
+    """The maximal distance between the empirical and the true CDF of a sample of size n, with confidence 1 - alpha, according to the DKW inequality."""
+    return np.sqrt(np.log(2.0 / alpha) / (2 * n))
+
+
+def dkw_sample_size(epsilon, alpha=0.05):
+    """The sample size for which the empirical CDF is within epsilon of the true CDF with confidence 1 - alpha, according to the DKW inequality."""
+    return int(math.ceil(np.log(2.0 / alpha) / (2 * epsilon**2)))
+
+
+def as_float_array(values):
+    """Convert component values to a float array. Returns a mask of the values that were None, and the float array in which those are NaN."""
+    values = np.asarray(values)
+    if values.dtype == object:
+        is_none = np.equal(values, None)
+        values = np.where(is_none, np.nan, values).astype(np.float64)
+    else:
+        is_none = np.zeros(len(values), dtype=bool)
+        values = values.astype(np.float64, copy=False)
+    return is_none, values
+
+
+def spawn_generators(seed, n):
+    """Return n independent random generators derived from seed, an int, a np.random.Generator or None."""
+    if isinstance(seed, np.random.Generator):
+        seed = int(seed.integers(2**63))
+    return [np.random.default_rng(child) for child in np.random.SeedSequence(seed).spawn(n)]
+
+
+def bootstrap(resample, n, size, seed=None, workers=1, block_elements=2**22):
+    """Draw n bootstrap resamples in memory-bounded blocks, and stack their statistics.
+
+    Every block gets its own random generator, spawned from the seed, so the result only depends on the seed and not on the number of workers.
+
+    Parameters
+    ----------
+    resample : callable
+        Called as `resample(rng, rows)` with a `np.random.Generator`, it should draw `rows` resamples at once and return their statistics as a (rows, k) array.
+    n : int
+        The number of resamples.
+    size : int
+        The number of values drawn per resample, used to bound the size of the blocks.
+    seed : int or np.random.Generator, optional
+        Seed of the resamples.
+    workers : int, optional
+        The number of threads to draw the blocks with, by default 1. numpy releases the GIL while sampling and sorting.
+    block_elements : int, optional
+        The maximum number of values drawn per block, by default 2**22.
+
+    Returns
+    -------
+    np.ndarray
+        A (n, k) array with the statistics of every resample.
+    """
+    rows_per_block = max(1, block_elements // max(size, 1))
+    blocks = [min(rows_per_block, n - start) for start in range(0, n, rows_per_block)]
+    rngs = spawn_generators(seed, len(blocks))
+    if workers > 1 and len(blocks) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(resample, rngs, blocks))
+    else:
+        results = [resample(rng, rows) for rng, rows in zip(rngs, blocks)]
+    return np.concatenate(results, axis=0)
+
+
+UNIFORM_GRID = np.arange(start=0, stop=101, step=1, dtype=np.float64)
+TAILS_GRID = np.unique(
+    np.concatenate([UNIFORM_GRID, [0.01, 0.02, 0.05, 0.1, 0.2, 0.5], [99.5, 99.8, 99.9, 99.95, 99.98, 99.99]])
+)
+GRIDS = ["uniform", "tails", "adaptive"]
+# The cdf value of the last percentile, see `cdf_grid`
+CDF_END = 101
+
+
+def check_grid(grid):
+    """Return a percentile grid as a float array, after checking that it is strictly increasing from 0 to 100."""
+    grid = np.asarray(grid, dtype=np.float64)
+    if grid.ndim != 1 or len(grid) < 2 or grid[0] != 0 or grid[-1] != 100 or np.any(np.diff(grid) <= 0):
+        raise DataException("A percentile grid must be strictly increasing, start at 0 and end at 100.")
+    return grid
+
+
+def resolve_grid(grid):
+    """Return the percentiles (0 - 100) to estimate for the grid option of `NumericStats`."""
+    if grid is None or grid == "uniform" or grid == "adaptive":
+        return UNIFORM_GRID
+    elif grid == "tails":
+        return TAILS_GRID
+    return check_grid(grid)
+
+
+def deduplicate_grid(grid, percentiles):
+    """Drop the percentiles that equal both their neighbours, and their grid points. The first and last percentile of every run of equal values are kept, so interpolating the percentiles gives the same result."""
+    grid = np.asarray(grid)
+    percentiles = np.asarray(percentiles)
+    keep = np.ones(len(percentiles), dtype=bool)
+    keep[1:-1] = (percentiles[1:-1] != percentiles[:-2]) | (percentiles[1:-1] != percentiles[2:])
+    return grid[keep], percentiles[keep]
+
+
+def cdf_grid(grid=None):
+    """The cdf values that percentiles are mapped to when interpolating their cdf: a value is associated with the grid point following its last occurrence, and the last percentile with `CDF_END`."""
+    grid = UNIFORM_GRID if grid is None else grid
+    return np.append(grid, CDF_END)
+
+
+def higher_percentile_indices(n, q):
+    """The indices of the q-th percentiles (0 - 100) in a sorted array of length n, using the 'higher' method of np.percentile."""
+    return np.ceil(np.asarray(q, dtype=np.float64) / 100 * (n - 1)).astype(np.int64)
+
+
 def add_missing(frequencies, full_domain):
+    """Return a copy of frequencies with a zero frequency for every key of full_domain it misses."""
+    frequencies = dict(frequencies)
     for key in full_domain:
         if key not in frequencies:
             frequencies[key] = 0
@@ -690,9 +1293,201 @@ def equalize_domains(a, b):
     return a, b, full_domain
 
 
-def interpolate(percentiles, merged_domain):
+def count_less_equal(sorted_values, points):
+    """For every row, count the sorted_values (C, N) that are <= each of the sorted points (C, M) in the same row. A row-wise `np.searchsorted(..., side="right")`."""
+    n_values = sorted_values.shape[1]
+    n_points = points.shape[1]
+    # Stably sort both together: values sort before equal points, so a points position minus its own rank counts the values <= it.
+    order = np.argsort(np.concatenate([sorted_values, points], axis=1), axis=1, kind="stable")
+    positions = np.empty_like(order)
+    np.put_along_axis(positions, order, np.arange(order.shape[1])[None, :], axis=1)
+    return positions[:, n_values:] - np.arange(n_points)[None, :]
+
+
+def interpolate_multiple(percentiles, merged_domains, grids=None):
+    """Batched version of `interpolate`. Every row of percentiles (C, P) is interpolated at the sorted points in the same row of merged_domains (C, M). grids holds the percentile grid (C, P) of every row, by default the uniform grid.
+
+    Returns the same values as `interpolate`, which uses `np.interp` and clamps to 0 and 100 outside of the percentiles.
+    """
+    percentiles = np.sort(np.asarray(percentiles, dtype=np.float64), axis=1, kind="stable")
+    merged_domains = np.asarray(merged_domains, dtype=np.float64)
+    n_percentiles = percentiles.shape[1]
+    if grids is None:
+        grids = np.broadcast_to(UNIFORM_GRID, percentiles.shape)
+    cdf_grids = np.concatenate([grids, np.full((len(grids), 1), CDF_END)], axis=1)
+    cdf = np.take_along_axis(cdf_grids, count_less_equal(percentiles, percentiles), axis=1).astype(np.float64)
+    counts = count_less_equal(percentiles, merged_domains)
+    # Index of the last percentile <= the point, like np.interp
+    lo = np.clip(counts - 1, 0, n_percentiles - 1)
+    hi = np.minimum(lo + 1, n_percentiles - 1)
+    x_lo = np.take_along_axis(percentiles, lo, axis=1)
+    x_hi = np.take_along_axis(percentiles, hi, axis=1)
+    y_lo = np.take_along_axis(cdf, lo, axis=1)
+    y_hi = np.take_along_axis(cdf, hi, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = (y_hi - y_lo) / (x_hi - x_lo)
+        result = slope * (merged_domains - x_lo) + y_lo
+        # If we get nan in one direction, try the other
+        result = np.where(np.isnan(result), slope * (merged_domains - x_hi) + y_hi, result)
+    result = np.where(np.isnan(result) & (y_lo == y_hi), y_lo, result)
+    result = np.where((lo == n_percentiles - 1) | (merged_domains == x_lo), y_lo, result)
+    result = np.where(counts == 0, 0.0, result)
+    result = np.where(merged_domains > percentiles[:, -1:], 100.0, result)
+    return result
+
+
+def report_numeric_drift_multiple(stats, others, thresholds):
+    """Batched version of `NumericStats.report_drift`: contrast every stats with the other stats at the same position.
+
+    The percentile bounds of all pairs are stacked into (C, P) arrays, so the drift of all pairs is computed with a few vectorized operations.
+
+    Parameters
+    ----------
+    stats : list of NumericStats
+    others : list of NumericStats
+    thresholds : list of float
+        The drift threshold of every pair.
+
+    Returns
+    -------
+    list of dict
+        The drift report of every pair, equal to `stats[i].report_drift(others[i], thresholds[i])`.
+    """
+    reports = [None] * len(stats)
+    # Pairs can only be stacked when their percentiles are on the same grids
+    groups = defaultdict(list)
+    for i, other in enumerate(others):
+        # Without bounds, for example when there are no valid values, the drift is unknown
+        if other.samplesize == 0 or not (stats[i].has_bounds() and other.has_bounds()):
+            reports[i] = {"drift": -1, "drift_idx": -1, "alert": False, "valid": False}
+        else:
+            groups[(tuple(stats[i].percentile_grid), tuple(other.percentile_grid))].append(i)
+
+    for (grid, other_grid), indices in groups.items():
+        grids = np.broadcast_to(np.asarray(grid, dtype=np.float64), (len(indices), len(grid)))
+        other_grids = np.broadcast_to(np.asarray(other_grid, dtype=np.float64), (len(indices), len(other_grid)))
+        merged_domains = np.sort(
+            np.concatenate(
+                [np.array([stats[i].percentiles for i in indices]), np.array([others[i].percentiles for i in indices])],
+                axis=1,
+            ),
+            axis=1,
+        )
+        # If certain values cause jumps of multiple percentages, that value should be associated with the maximum percentage
+        lb_self = interpolate_multiple([stats[i].percentiles_lb for i in indices], merged_domains, grids)
+        lb_other = interpolate_multiple([others[i].percentiles_lb for i in indices], merged_domains, other_grids)
+        ub_self = interpolate_multiple([stats[i].percentiles_ub for i in indices], merged_domains, grids)
+        ub_other = interpolate_multiple([others[i].percentiles_ub for i in indices], merged_domains, other_grids)
+
+        # Check one above other, and the reverse. Keep the maximum distance per x value, and only keep positive ones
+        maxes = np.maximum(np.maximum(lb_self - ub_other, lb_other - ub_self), 0)
+        drift_idx = np.argmax(maxes, axis=1)
+        rows = np.arange(len(indices))
+        drifts = np.minimum(maxes[rows, drift_idx], 100) / 100
+        drift_xvalues = merged_domains[rows, drift_idx]
+        for row, i in enumerate(indices):
+            drift = float(drifts[row])
+            reports[i] = {
+                "drift": drift,
+                "drift_xvalue": drift_xvalues[row],
+                "alert": bool(drift > thresholds[i]),
+                "valid": True,
+            }
+    return reports
+
+
+class CategoricEncoding:
+    """
+    Dictionary-encodes the categories of a set of CategoricStats: every category gets an index in the sorted domain of all stats, and the frequencies and their bounds become arrays over that domain. Stats are encoded once, so a reference can be contrasted with many windows without aligning their frequencies again.
+
+    Parameters
+    ----------
+    stats : list of CategoricStats
+    """
+
+    def __init__(self, stats):
+        self.domain = pd.Index(sorted(set().union(*(s.frequencies or {} for s in stats))), dtype=object)
+        # A dict lookup per category is much cheaper than a pd.Index lookup for the few categories of a stats.
+        self._codes = {category: code for code, category in enumerate(self.domain)}
+        self._encoded = {}
+
+    def codes(self, categories):
+        return np.fromiter((self._codes[category] for category in categories), dtype=np.int64, count=len(categories))
+
+    def encode(self, stats):
+        """Return the (present, lower, upper) arrays of the stats over the domain: whether every category has a frequency, and its lower and upper bound (0 when missing, or when the stats have no bounds)."""
+        key = id(stats)
+        if key not in self._encoded:
+            present = np.zeros(len(self.domain), dtype=bool)
+            lower = np.zeros(len(self.domain), dtype=np.float64)
+            upper = np.zeros(len(self.domain), dtype=np.float64)
+            if stats.frequencies:
+                present[self.codes(stats.frequencies)] = True
+            if stats.has_bounds():
+                lower[self.codes(stats.frequencies_lb)] = list(stats.frequencies_lb.values())
+                upper[self.codes(stats.frequencies_ub)] = list(stats.frequencies_ub.values())
+            self._encoded[key] = (present, lower, upper)
+        return self._encoded[key]
+
+
+def report_categoric_drift_multiple(stats, others, thresholds, block_elements=2**22):
+    """Batched version of `CategoricStats.report_drift`: contrast every stats with the other stats at the same position.
+
+    The categories of all stats are dictionary-encoded once with a `CategoricEncoding`, so stats that occur in multiple pairs are encoded once. The encoded pairs are stacked into (pairs, categories) arrays, and the drift of all pairs is computed with a few vectorized operations.
+
+    Parameters
+    ----------
+    stats : list of CategoricStats
+    others : list of CategoricStats
+    thresholds : list of float
+        The drift threshold of every pair.
+    block_elements : int, optional
+        The maximal number of elements of the stacked arrays. Pairs are processed in blocks of rows that fit, so memory stays bounded when the domain is large.
+
+    Returns
+    -------
+    list of dict
+        The drift report of every pair, equal to `stats[i].report_drift(others[i], thresholds[i])`.
+    """
+    reports = [{"drift": -1, "drift_idx": -1, "alert": False, "valid": False} for _ in others]
+    # Without bounds, for example when all values are None, the drift is unknown
+    valid = [
+        i for i, other in enumerate(others) if other.samplesize != 0 and stats[i].has_bounds() and other.has_bounds()
+    ]
+    encoding = CategoricEncoding([stats[i] for i in valid] + [others[i] for i in valid])
+    n_categories = len(encoding.domain)
+    block_rows = max(1, block_elements // max(n_categories, 1))
+    for start in range(0, len(valid), block_rows):
+        block = valid[start : start + block_rows]
+        present_self, lb_self, ub_self = map(np.array, zip(*(encoding.encode(stats[i]) for i in block)))
+        present_other, lb_other, ub_other = map(np.array, zip(*(encoding.encode(others[i]) for i in block)))
+        # The following boils down to the Chebyshev distance between the confidence intervals
+        diffs = np.maximum(np.maximum(lb_self - ub_other, lb_other - ub_self), 0)
+        # Only the categories of either stats are candidates
+        diffs[~(present_self | present_other)] = -1
+        if n_categories > 0:
+            max_idx = np.argmax(diffs, axis=1)
+            max_diffs = diffs[np.arange(len(block)), max_idx]
+        else:
+            max_idx = np.zeros(len(block), dtype=np.int64)
+            max_diffs = np.full(len(block), -1.0)
+        for row, i in enumerate(block):
+            max_diff, max_diff_idx = -1, 0
+            if max_diffs[row] >= 0:
+                max_diff, max_diff_idx = float(max_diffs[row]), encoding.domain[max_idx[row]]
+            drift = min(max_diff, 1)
+            reports[i] = {
+                "drift": float(drift),
+                "drift_idx": max_diff_idx,
+                "alert": bool(drift > thresholds[i]),
+                "valid": True,
+            }
+    return reports
+
+
+def interpolate(percentiles, merged_domain, grid=None):
     # If certain values cause jumps of multiple percentages, that value should be associated with the maximum percentage
-    cdf = np.searchsorted(percentiles, percentiles, side="right")
+    cdf = cdf_grid(grid)[np.searchsorted(percentiles, percentiles, side="right")]
     # cdf contains the y points
     interpolator = interp1d(x=percentiles, y=cdf, fill_value=(0, 100), bounds_error=False)
     cdf_interpolated = interpolator(merged_domain)
@@ -1,6 +1,194 @@
+from pathlib import Path
+
 import numpy as np
 import pandas as pd
 
+from raymon.globals import DataException
+
+
+def as_array(values):
+    """Convert extracted component values to a typed numpy array. Numeric values give a numeric array, anything else an object array. Arrays are not copied."""
+    if isinstance(values, np.ndarray):
+        return values
+    if isinstance(values, (pd.Series, pd.Index)):
+        return values.to_numpy()
+    array = np.asarray(values)
+    if array.ndim == 1 and array.dtype.kind in "biuf":
+        return array
+    # Avoid numpy turning mixed values into strings, or sequences into extra dimensions
+    array = np.empty(len(values), dtype=object)
+    array[:] = list(values)
+    return array
+
+
+def null_mask(values):
+    """Return a boolean mask of the values that are None or NaN, for an array returned by `as_array`."""
+    if values.dtype.kind in "fc":
+        return np.isnan(values)
+    elif values.dtype.kind in "biu":
+        return np.zeros(len(values), dtype=bool)
+    return pd.isna(values)
+
 
 def filter_nan(values):
-    return [v for v in values if isinstance(v, str) or not np.isnan(v)]
+    values = as_array(values)
+    return values[~null_mask(values)]
+
+
+def project(data, columns):
+    """Return only the given columns of a DataFrame, without copying them. Returns data unchanged when columns is None, when data is not a DataFrame or when not all columns are (uniquely) present.
+
+    Parameters
+    ----------
+    data : any
+    columns : list or None
+        The column labels to keep.
+    """
+    if columns is None or not isinstance(data, pd.DataFrame):
+        return data
+    if len(columns) == len(data.columns):
+        return data
+    if not all(column in data.columns for column in columns) or not data.columns.is_unique:
+        return data
+    return pd.DataFrame({column: data[column] for column in columns}, copy=False)
+
+
+def read_file_chunks(path, chunksize=None):
+    """Read a parquet or CSV file as DataFrames of at most chunksize rows, or as a single DataFrame if chunksize is None."""
+    path = Path(path)
+    if path.suffix == ".parquet":
+        if chunksize is None:
+            yield pd.read_parquet(path)
+            return
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    elif path.suffix == ".csv":
+        if chunksize is None:
+            yield pd.read_csv(path)
+            return
+        with pd.read_csv(path, chunksize=chunksize) as reader:
+            for chunk in reader:
+                yield chunk
+    else:
+        raise DataException(f"Cannot read {path}: only .parquet and .csv files are supported.")
+
+
+def iter_chunks(source, chunksize=None):
+    """
+    Iterate over chunks of data, as (input, output, actual) tuples.
+
+    Parameters
+    ----------
+    source : str, Path, list of str or Path, or iterable
+        One or more parquet or CSV files, read as input data, or an iterable of chunks. Every chunk can be a (input, output, actual) tuple, a dict with one or more of these keys, or the input data.
+    chunksize : int, optional
+        The number of rows per chunk when reading files. By default, every file is a chunk.
+    """
+    if isinstance(source, (str, Path)):
+        source = [source]
+    for chunk in source:
+        if isinstance(chunk, (str, Path)):
+            for df in read_file_chunks(chunk, chunksize=chunksize):
+                yield df, None, None
+        elif isinstance(chunk, tuple):
+            if len(chunk) != 3:
+                raise DataException("Chunk tuples should be (input, output, actual)")
+            yield chunk
+        elif isinstance(chunk, dict):
+            yield chunk.get("input"), chunk.get("output"), chunk.get("actual")
+        else:
+            yield chunk, None, None
+
+
+def chunk_length(chunk):
+    for data in chunk:
+        if data is not None:
+            return len(data)
+    return 0
+
+
+def concat_chunks(parts):
+    """Concatenate a list of DataFrames, Series, arrays or lists into one of the same type. Returns None if all parts are None."""
+    parts = [part for part in parts if part is not None]
+    if len(parts) == 0:
+        return None
+    elif isinstance(parts[0], (pd.DataFrame, pd.Series)):
+        return pd.concat(parts, ignore_index=True)
+    elif isinstance(parts[0], np.ndarray):
+        return np.concatenate(parts)
+    else:
+        return [el for part in parts for el in part]
+
+
+def head(data, n):
+    """Return the first n instances of a DataFrame, Series, array or list."""
+    if data is None:
+        return None
+    elif isinstance(data, (pd.DataFrame, pd.Series)):
+        return data.iloc[:n]
+    return data[:n]
+
+
+def drain(items):
+    """Iterate over a list while removing its items, so they can be garbage collected once processed."""
+    items.reverse()
+    while items:
+        yield items.pop()
+
+
+def take(data, idx):
+    """Return the instances at the given positions of a DataFrame, Series, array or list."""
+    if data is None:
+        return None
+    elif isinstance(data, (pd.DataFrame, pd.Series)):
+        return data.iloc[idx].reset_index(drop=True)
+    elif isinstance(data, np.ndarray):
+        return data[idx]
+    return [data[i] for i in idx]
+
+
+class RowReservoir:
+    """
+    Keeps a uniform random sample of at most `size` instances of a stream of (input, output, actual) chunks, using reservoir sampling (Vitter's Algorithm R). Every chunk is processed at once, and only the sample and the current chunk are held in memory.
+
+    Parameters
+    ----------
+    size : int
+        The size of the sample.
+    seed : int, optional
+        Seed of the random generator.
+    """
+
+    def __init__(self, size, seed=None):
+        if not (isinstance(size, int) and size > 0):
+            raise ValueError(f"size must be an int > 0, not {size}")
+        self.size = size
+        self.seen = 0
+        self.sample = None
+        self._rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return 0 if self.sample is None else chunk_length(self.sample)
+
+    def update(self, chunk):
+        n = chunk_length(chunk)
+        n_kept = len(self)
+        # The first instances fill up the reservoir.
+        n_fill = min(self.size - n_kept, n)
+        keep = np.arange(n_kept + n_fill)
+        # After that, instance j of the stream replaces a random slot with probability size / (j + 1).
+        stream_idx = self.seen + np.arange(n_fill, n)
+        slots = self._rng.integers(0, stream_idx + 1)
+        accepted = np.flatnonzero(slots < self.size)
+        if len(accepted):
+            # When a slot is replaced more than once within a chunk, the last replacement wins.
+            replaced, last = np.unique(slots[accepted][::-1], return_index=True)
+            keep[replaced] = n_kept + n_fill + accepted[::-1][last]
+        self.seen += n
+        if self.sample is None:
+            self.sample = tuple(take(data, keep) for data in chunk)
+        else:
+            self.sample = tuple(take(concat_chunks([old, new]), keep) for old, new in zip(self.sample, chunk))
+        return self
@@ -1,4 +1,7 @@
+import re
+import sys
 import string
+import functools
 from raymon.globals import Serializable
 
 PROFILE_INPUT = "profile-input"
@@ -25,23 +28,51 @@ CTYPE_TAGTYPES = {
 ERROR_TYPES = [PROFILE_INPUT_ERROR, PROFILE_OUTPUT_ERROR, PROFILE_ACTUAL_ERROR, PROFILE_SCORE_ERROR]
 
 
+DISALLOWED_CHARS = re.compile("[^" + re.escape(string.ascii_lowercase + string.digits + "_-@./") + "]")
+
+
+@functools.lru_cache(maxsize=4096)
 def normalize(tag_name):
     tag_nospaces = tag_name.replace(" ", "_").lower()
-    allowed_chars = string.ascii_lowercase + string.digits + "_-@./"
-    filtered = [c for c in tag_nospaces if c in allowed_chars]
-    return "".join(filtered).rstrip("_")
+    filtered = DISALLOWED_CHARS.sub("", tag_nospaces)
+    return filtered.rstrip("_")
 
 
 def convert_tags(tags, format="tag"):
+    """Convert a list of :class:`Tag` or a :class:`TagBatch` to the given format.
+
+    Parameters
+    ----------
+    tags : list of Tag or TagBatch
+    format : str, optional
+        One of 'tag' (a list of Tag objects), 'jcr' (a list of dicts), 'simple' (a dict mapping tag names to values), 'array' (a dict of parallel lists) or 'batch' (a TagBatch). By default 'tag'.
+    """
+    if isinstance(tags, TagBatch):
+        if format == "tag":
+            return tags.to_tags()
+        elif format == "jcr":
+            return tags.to_jcr()
+        elif format == "simple":
+            return tags.to_simple()
+        elif format == "array":
+            return tags.to_array()
+        elif format == "batch":
+            return tags
     if format == "tag":
         return tags
     elif format == "jcr":
         return [t.to_jcr() for t in tags]
     elif format == "simple":
         return {t.name: t.value for t in tags}
+    elif format == "array":
+        return TagBatch.from_tags(tags).to_array()
+    elif format == "batch":
+        return TagBatch.from_tags(tags)
 
 
 def filter_errors(tags, format="tag"):
+    if isinstance(tags, TagBatch):
+        tags = tags.to_tags()
     returnval = []
     for t in tags:
         if isinstance(t, Tag) and t.type in ERROR_TYPES:
@@ -72,6 +103,8 @@ class Tag(Serializable):
         y setting the group, you can indicate that this tag belongs to a certai nset of tagt. For example, all tags that belong to a certai ndata profile will have the same group.
     """
 
+    __slots__ = ("_name", "value", "type", "group")
+
     def __init__(self, name, value, type, group=None):
 
         self.name = name
@@ -108,3 +141,91 @@ class Tag(Serializable):
 
     def __repr__(self):
         return f"Tag(name='{self.name}, value={self.value}, type={self.type}, group={self.group}"
+
+
+class TagBatch(Serializable):
+    """
+    A compact, columnar collection of tags. Names, values, types and groups are kept in parallel lists, so no object is created per tag.
+
+    Names are not normalized when they are added to the batch: use names that were normalized beforehand, for example with `TagBatch.intern_name`.
+
+    Parameters
+    ----------
+    names : list of str, optional
+    values : list, optional
+    types : list of str, optional
+    groups : list of str, optional
+    """
+
+    __slots__ = ("names", "values", "types", "groups")
+
+    def __init__(self, names=None, values=None, types=None, groups=None):
+        self.names = [] if names is None else list(names)
+        self.values = [] if values is None else list(values)
+        self.types = [] if types is None else list(types)
+        self.groups = [None] * len(self.names) if groups is None else list(groups)
+        if not len(self.names) == len(self.values) == len(self.types) == len(self.groups):
+            raise ValueError(f"names, values, types and groups must have the same length")
+
+    @staticmethod
+    def intern_name(tag_name):
+        """Normalize a tag name and intern the result, so all tags with that name share a single string."""
+        return sys.intern(normalize(tag_name))
+
+    def append(self, name, value, type, group=None):
+        self.names.append(name)
+        self.values.append(value)
+        self.types.append(type)
+        self.groups.append(group)
+
+    def extend(self, other):
+        self.names.extend(other.names)
+        self.values.extend(other.values)
+        self.types.extend(other.types)
+        self.groups.extend(other.groups)
+
+    def set_group(self, group):
+        self.groups = [group] * len(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.to_tags())
+
+    """Conversions"""
+
+    def to_tags(self):
+        return [
+            Tag(name=name, value=value, type=type, group=group)
+            for name, value, type, group in zip(self.names, self.values, self.types, self.groups)
+        ]
+
+    def to_jcr(self):
+        return [
+            {"type": type, "name": name, "value": value, "group": group}
+            for name, value, type, group in zip(self.names, self.values, self.types, self.groups)
+        ]
+
+    def to_simple(self):
+        return dict(zip(self.names, self.values))
+
+    def to_array(self):
+        return {"name": self.names, "value": self.values, "type": self.types, "group": self.groups}
+
+    @classmethod
+    def from_tags(cls, tags):
+        batch = cls()
+        for tag in tags:
+            batch.append(name=tag.name, value=tag.value, type=tag.type, group=tag.group)
+        return batch
+
+    @classmethod
+    def from_jcr(cls, jcr):
+        batch = cls()
+        for tag in jcr:
+            batch.append(name=normalize(tag["name"]), value=tag["value"], type=tag["type"], group=tag.get("group"))
+        return batch
+
+    def __repr__(self):
+        return f"TagBatch(n={len(self)})"
@@ -1,10 +1,13 @@
 from raymon.profiling.components import DataType
 import pytest
 import json
+import numpy as np
 from raymon import ModelProfile
 from raymon import InputComponent
 from raymon import IntStats, FloatStats, CategoricStats
 from raymon.profiling.extractors.vision.similarity import FixedSubpatchSimilarity
+from raymon.profiling.utils import as_array, null_mask, filter_nan
+from raymon.globals import DataException
 
 
 def test_stats_none():
@@ -46,6 +49,33 @@ def test_num_stats_build():
     assert stats.is_built()
 
 
+def test_num_stats_build_data():
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=1001)
+    data[::10] = np.nan
+    valid = data[~np.isnan(data)]
+    valid = valid[valid >= -1]
+    stats = FloatStats()
+    stats.build(list(data), domain=(-1, None))
+    assert stats.min == -1
+    assert stats.max == valid.max()
+    assert stats.mean == pytest.approx(valid.mean())
+    assert stats.std == pytest.approx(valid.std())
+    assert stats.percentiles == np.percentile(valid, q=np.arange(101), method="higher").tolist()
+    assert stats.invalids == (len(data) - len(valid)) / len(data)
+    assert stats.samplesize == len(data)
+
+    owned = data.copy()
+    inplace_stats = FloatStats()
+    inplace_stats.build(owned, domain=(-1, None), inplace=True)
+    assert inplace_stats.percentiles == stats.percentiles
+    assert not np.array_equal(owned, data, equal_nan=True)
+    with pytest.raises(DataException):
+        FloatStats().build([np.nan] * 10)
+    with pytest.raises(DataException):
+        FloatStats().build([1.0, 2.0], domain=(5, None))
+
+
 def test_cat_stats_build():
     stats = CategoricStats()
     assert not stats.is_built()
@@ -110,3 +140,118 @@ def test_schema_buildable():
     schema = ModelProfile(name="Testing", version="1.0.0", components=[component, component])
 
     assert schema.is_built()
+
+
+def test_num_stats_build_null_mask():
+    values = as_array([1.0, None, 3.0, np.nan, 2.0])
+    null = null_mask(values)
+    assert null.tolist() == [False, True, False, True, False]
+    stats = FloatStats()
+    stats.build(values, null=null)
+    reference = FloatStats()
+    reference.build([1.0, np.nan, 3.0, np.nan, 2.0])
+    assert stats.to_jcr() == reference.to_jcr()
+    assert stats.invalids == 0.4
+
+
+def test_filter_nan_types():
+    assert filter_nan([1, 2, 3]).dtype.kind == "i"
+    assert filter_nan([1.0, np.nan, 2.0]).tolist() == [1.0, 2.0]
+    assert filter_nan(["a", None, 1, np.nan]).tolist() == ["a", 1]
+
+
+def test_stats_bounds_lazy():
+    stats = FloatStats()
+    stats.build(np.random.default_rng(0).normal(size=100))
+    loaded = FloatStats.from_jcr(json.loads(json.dumps(stats.to_jcr()))["state"])
+    assert loaded._bounds is None
+    assert loaded.is_built()
+    assert loaded._bounds is None
+    assert loaded.percentiles_lb == stats.percentiles_lb
+    lb = loaded.percentiles_lb
+    loaded.samplesize = 10000
+    assert loaded._bounds is None
+    assert np.mean(np.abs(np.subtract(loaded.percentiles_ub, loaded.percentiles_lb))) < np.mean(
+        np.abs(np.subtract(stats.percentiles_ub, lb))
+    )
+
+    cat = CategoricStats()
+    cat.build(["a", "a", "b", None])
+    assert cat.frequencies_lb["a"] == pytest.approx(max(2 / 3 - 1.96 * np.sqrt(2 / 9 / 4), 0))
+    cat.frequencies = {"a": 0.5, "b": 0.5}
+    assert cat.frequencies_ub["a"] == pytest.approx(0.5 + 1.96 * np.sqrt(0.25 / 4))
+
+
+def test_cat_stats_drift_no_mutation():
+    from raymon.profiling.stats import report_categoric_drift_multiple
+
+    reference = CategoricStats()
+    reference.build(["a"] * 50 + ["b"] * 50)
+    windows = [CategoricStats(), CategoricStats()]
+    windows[0].build(["a"] * 50 + ["b"] * 50)
+    windows[1].build(["a"] * 10 + ["c"] * 90)
+    reports = report_categoric_drift_multiple([reference, reference], windows, thresholds=[0.05, 0.05])
+    assert reports[0]["drift"] == 0 and reports[0]["drift_idx"] == "a"
+    # b drops from 50% to 0% and c rises from 0% to 90%: c has the largest distance between the bounds
+    assert reports[1]["drift_idx"] == "c"
+    assert reports[1]["drift"] == pytest.approx(windows[1].frequencies_lb["c"])
+    assert reports[1] == reference.report_drift(windows[1], threshold=0.05)
+    assert set(reference.frequencies) == {"a", "b"}
+    assert set(windows[1].frequencies) == {"a", "c"}
+
+
+def test_stats_bootstrap_seeded():
+    stats = FloatStats()
+    stats.build(np.random.default_rng(0).normal(size=1000))
+    lb, ub = stats.conf_bounds_bootstrap(n=50, seed=1)
+    assert len(lb) == len(ub) == 101
+    assert all(lower <= upper for lower, upper in zip(lb, ub))
+    # Blocks are seeded independently, so the number of threads does not change the result
+    assert stats.conf_bounds_bootstrap(n=50, seed=1, workers=4) == (lb, ub)
+    assert stats.conf_bounds_bootstrap(n=50, seed=np.random.default_rng(2)) != (lb, ub)
+
+    cat = CategoricStats()
+    cat.build(["a"] * 30 + ["b"] * 60 + ["c"] * 10)
+    lower, upper = cat.conf_bounds_bootstrap(n=200, seed=0)
+    for key, freq in cat.frequencies.items():
+        assert lower[key] <= freq <= upper[key]
+        assert lower[key] == pytest.approx(cat.frequencies_lb[key], abs=0.05)
+
+
+def test_num_stats_percentile_grids():
+    data = np.random.default_rng(0).standard_t(2, size=10000)
+    uniform = FloatStats()
+    uniform.build(data)
+    tails = FloatStats(grid="tails")
+    tails.build(data)
+    assert len(tails.percentiles) > 101
+    assert tails.percentiles[tails.percentile_grid.tolist().index(99.0)] == uniform.percentiles[99]
+    assert tails.percentiles[-2] == np.percentile(data, q=99.99, method="higher")
+    custom = FloatStats(grid=[0, 25, 50, 75, 100])
+    custom.build(data)
+    assert custom.percentiles == np.percentile(data, q=[0, 25, 50, 75, 100], method="higher").tolist()
+    assert len(custom.percentiles_lb) == 5
+    assert uniform.report_drift(tails, threshold=0.05)["drift"] == 0
+    with pytest.raises(DataException):
+        FloatStats(grid=[10, 50, 100])
+    with pytest.raises(DataException):
+        custom.percentiles = list(range(101))
+
+    # Adaptive grids only keep the percentiles where the value changes
+    integers = np.random.default_rng(0).integers(0, 5, size=1000).astype(float)
+    adaptive = FloatStats(grid="adaptive")
+    adaptive.build(integers)
+    assert len(adaptive.percentiles) == 10
+    reference = FloatStats()
+    reference.build(integers)
+    assert (
+        np.interp([5.5, 37.5, 99], adaptive.percentile_grid, adaptive.percentiles).tolist()
+        == np.interp([5.5, 37.5, 99], np.arange(101), reference.percentiles).tolist()
+    )
+
+    loaded = FloatStats.from_jcr(json.loads(json.dumps(adaptive.to_jcr()))["state"])
+    assert loaded.grid == "adaptive"
+    assert loaded.percentile_grid.tolist() == adaptive.percentile_grid.tolist()
+    assert loaded.report_drift(adaptive, threshold=0.05)["drift"] == 0
+    assert "percentile_grid" not in reference.to_jcr()["state"]
+    assert adaptive.empty().grid == "adaptive"
@@ -1,6 +1,9 @@
-from raymon.profiling.extractors.structured import ElementExtractor
+from raymon.profiling.extractors.structured import ElementExtractor, MaxScoreElementExtractor
 import pandas as pd
 import numpy as np
+import pytest
+from raymon import InputComponent
+from raymon.profiling.extractors import NoneExtractor
 
 
 def test_element():
@@ -44,3 +47,38 @@ def test_is_built():
 
 def test_str():
     assert str(ElementExtractor(3)) == "ElementExtractor(element=3)"
+
+
+def test_extract_batch():
+    df = pd.DataFrame(data={"num1": list(range(10)), "cat1": ["a"] * 5 + ["b"] * 5, "num2": [0.2] * 10})
+    extractor = ElementExtractor("num1")
+    extracted = extractor.extract_multiple(df)
+    assert isinstance(extracted, np.ndarray)
+    assert np.shares_memory(extracted, df["num1"].to_numpy())
+    assert extracted.tolist() == list(range(10))
+    assert (
+        ElementExtractor("cat1").extract_multiple(df).tolist()
+        == df.apply(ElementExtractor("cat1").extract, axis="columns").tolist()
+    )
+    arr = np.arange(12).reshape(4, 3)
+    assert ElementExtractor(1).extract_multiple(arr).tolist() == [1, 4, 7, 10]
+
+
+def test_max_score_extract_batch():
+    scores = np.array([[0.1, 0.7, 0.2], [0.8, 0.1, 0.1], [0.2, 0.3, 0.5]])
+    extractor = MaxScoreElementExtractor(categories=["a", "b", "c"])
+    assert extractor.extract_multiple(scores).tolist() == [extractor.extract(row) for row in scores]
+    assert MaxScoreElementExtractor().extract_multiple(pd.DataFrame(scores)).tolist() == [1, 0, 2]
+
+
+def test_columns_projection():
+    df = pd.DataFrame(data={"num1": list(range(10)), "cat1": ["a"] * 5 + ["b"] * 5, "num2": [0.2] * 10})
+    component = InputComponent(name="num2", extractor=ElementExtractor("num2"))
+    projected = component.project(df)
+    assert list(projected.columns) == ["num2"]
+    assert np.shares_memory(projected["num2"].to_numpy(), df["num2"].to_numpy())
+    # Opaque extractors and unknown columns get the full data
+    assert InputComponent(name="num3", extractor=ElementExtractor(0)).project(df) is df
+    assert InputComponent(name="none", extractor=NoneExtractor()).project(df) is df
+    component.build(df)
+    assert component.stats.mean == pytest.approx(0.2)
@@ -0,0 +1,132 @@
+import asyncio
+import threading
+
+import pytest
+import pandas as pd
+
+from raymon import ModelProfile, InputComponent
+from raymon.trace import Trace
+from raymon.globals import ValidationOverflowException
+from raymon.profiling.executor import AsyncValidator
+from raymon.profiling.extractors.structured import generate_components, ElementExtractor
+
+
+class BlockingExtractor(ElementExtractor):
+    release = threading.Event()
+
+    def extract(self, data):
+        BlockingExtractor.release.wait(timeout=5)
+        return super().extract(data)
+
+
+class MockLogger:
+    def __init__(self):
+        self.tags = []
+
+    def tag(self, trace_id, tags):
+        self.tags.append((trace_id, tags))
+
+
+def get_profile():
+    df = pd.DataFrame(data={"num1": list(range(10)), "cat1": ["a"] * 5 + ["b"] * 5})
+    profile = ModelProfile(components=generate_components(dtypes=df.dtypes, complass=InputComponent))
+    profile.build(input=df)
+    return profile
+
+
+def test_async_validate_thread():
+    profile = get_profile()
+    record = pd.Series([20, "b"], index=["num1", "cat1"])
+    logger = MockLogger()
+    trace = Trace(logger=logger, trace_id="trace-1", set_global=False)
+    with AsyncValidator(profile, workers=2) as validator:
+        future = validator.validate_input(record, trace=trace)
+        assert future.result(timeout=5) == profile.validate_input(record)
+    assert logger.tags == [("trace-1", profile.validate_input(record))]
+
+
+def test_async_validate_process():
+    profile = get_profile()
+    record = pd.Series([1, "c"], index=["num1", "cat1"])
+    with AsyncValidator(profile, executor="process", workers=1) as validator:
+        future = validator.validate_input(record)
+        assert future.result(timeout=30) == profile.validate_input(record)
+
+
+def test_async_validate_awaitable():
+    profile = get_profile()
+    record = pd.Series([1, "b"], index=["num1", "cat1"])
+
+    async def validate(validator):
+        return await validator.submit_async("validate_input", input=record)
+
+    with AsyncValidator(profile) as validator:
+        tags = asyncio.run(validate(validator))
+    assert tags == profile.validate_input(record)
+
+
+@pytest.mark.parametrize("overflow", ["drop", "raise"])
+def test_async_validate_overflow(overflow):
+    profile = ModelProfile(components=[InputComponent(name="num1", extractor=BlockingExtractor(element="num1"))])
+    BlockingExtractor.release.set()
+    profile.build(input=pd.DataFrame(data={"num1": [0.0, 1.0]}))
+    BlockingExtractor.release.clear()
+    record = pd.Series([0.5], index=["num1"])
+    with AsyncValidator(profile, max_pending=1, overflow=overflow) as validator:
+        first = validator.validate_input(record)
+        if overflow == "drop":
+            assert validator.validate_input(record) is None
+        else:
+            with pytest.raises(ValidationOverflowException):
+                validator.validate_input(record)
+        BlockingExtractor.release.set()
+        assert len(first.result(timeout=5)) == 1
+
+
+@pytest.mark.parametrize("tag_format", ["tag", "jcr", "simple", "array"])
+def test_async_validate_trace_tag_format(tag_format):
+    profile = get_profile()
+    record = pd.Series([20, "b"], index=["num1", "cat1"])
+    logger = MockLogger()
+    trace = Trace(logger=logger, trace_id="trace-1", set_global=False)
+    done = []
+    with AsyncValidator(profile, tag_format=tag_format, on_done=done.append) as validator:
+        tags = validator.validate_input(record, trace=trace).result(timeout=5)
+    expected = profile.validate_input(record, tag_format=tag_format)
+    if tag_format == "tag":
+        assert [tag.to_jcr() for tag in tags] == [tag.to_jcr() for tag in expected]
+    else:
+        assert tags == expected
+    assert done == [tags]
+    # The trace always gets a list of tags, whatever the format for the caller
+    assert logger.tags == [("trace-1", profile.validate_input(record, tag_format="jcr"))]
+
+
+class FailingLogger(MockLogger):
+    def tag(self, trace_id, tags):
+        raise ConnectionError("Cannot reach the backend")
+
+
+def test_async_validate_trace_tag_raises():
+    profile = get_profile()
+    record = pd.Series([20, "b"], index=["num1", "cat1"])
+    trace = Trace(logger=FailingLogger(), trace_id="trace-1", set_global=False)
+    done = []
+    with AsyncValidator(profile, on_done=done.append) as validator:
+        future = validator.validate_input(record, trace=trace)
+        assert future.result(timeout=5) == profile.validate_input(record)
+    assert done == [profile.validate_input(record)]
+
+
+def test_async_validate_convert_raises(monkeypatch):
+    profile = get_profile()
+    record = pd.Series([20, "b"], index=["num1", "cat1"])
+
+    def convert_tags(tags, format="tag"):
+        raise ValueError(f"Cannot convert to {format}")
+
+    monkeypatch.setattr("raymon.profiling.executor.convert_tags", convert_tags)
+    with AsyncValidator(profile) as validator:
+        future = validator.validate_input(record)
+        with pytest.raises(ValueError):
+            future.result(timeout=5)
@@ -0,0 +1,56 @@
+import json
+
+import pandas as pd
+
+from raymon import ModelProfile, InputComponent
+from raymon.profiling import instrumentation
+from raymon.profiling.extractors.structured import generate_components
+
+
+def get_profile_data():
+    df = pd.DataFrame(data={"num1": list(range(10)), "cat1": ["a"] * 5 + ["b"] * 5})
+    profile = ModelProfile(components=generate_components(dtypes=df.dtypes, complass=InputComponent))
+    return profile, df
+
+
+def test_instrumentation_disabled():
+    profile, df = get_profile_data()
+    assert instrumentation.get_sink() is None
+    assert instrumentation.timer("stats.build", "num1") is instrumentation.NULL_TIMER
+    profile.build(input=df)
+    profile.validate_input(df.iloc[0, :])
+    assert instrumentation.get_sink() is None
+
+
+def test_instrumentation_build_validate(tmp_path):
+    profile, df = get_profile_data()
+    with instrumentation.instrumented() as sink:
+        profile.build(input=df)
+        for i in range(len(df)):
+            profile.validate_input(df.iloc[i, :])
+            profile.components["num1"].validate(df.iloc[i, :])
+    assert instrumentation.get_sink() is None
+
+    summary = sink.summary()
+    assert summary["stats.build"]["num1"]["count"] == 1
+    assert summary["extractor.extract_multiple"]["cat1"]["count"] == 1
+    assert summary["extractor.build"]["cat1"]["count"] == 1
+    assert summary["component.build"]["cat1"]["count"] == 1
+    assert summary["component.validate"]["num1"]["count"] == 20
+    assert summary["component.validate"]["cat1"]["count"] == 10
+    assert summary["extractor.extract"]["cat1"]["count"] == 10
+    record = summary["component.validate"]["num1"]
+    assert record["min"] <= record["p50"] <= record["p99"] <= record["max"]
+
+    fpath = tmp_path / "latencies.json"
+    sink.dump(fpath)
+    with open(fpath) as f:
+        assert json.load(f) == json.loads(json.dumps(summary))
+
+
+def test_histogram_sink_percentiles():
+    sink = instrumentation.HistogramSink()
+    for i in range(1, 101):
+        sink.record("extractor.extract", "a", i * 1e-3)
+    assert sink.percentile("extractor.extract", "a", 100) == 0.1
+    assert 0.045 <= sink.percentile("extractor.extract", "a", 50) <= 0.07
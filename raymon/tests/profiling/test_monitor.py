@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from raymon import ModelProfile, InputComponent
+from raymon.profiling.monitor import DriftMonitor
+from raymon.profiling.extractors.structured import generate_components
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def houses(cheap_houses_csv):
+    cheap_data = pd.read_csv(cheap_houses_csv).drop("Id", axis="columns")
+    return cheap_data[["LotArea", "LotShape", "1stFlrSF", "GrLivArea", "BldgType"]]
+
+
+def build_profile(inputs):
+    profile = ModelProfile(components=generate_components(inputs.dtypes, complass=InputComponent))
+    profile.build(input=inputs)
+    return profile
+
+
+def test_monitor_matches_contrast(houses):
+    reference = build_profile(houses)
+    clock = FakeClock()
+    monitor = DriftMonitor(reference, window=600, subwindow=60, flush_size=50, clock=clock)
+    window = houses[houses["LotArea"] > houses["LotArea"].median()].iloc[:300]
+    for i, (_, row) in enumerate(window.iterrows()):
+        clock.now = i
+        monitor.update(input=row)
+
+    report = monitor.report()
+    contrast = reference.contrast(build_profile(window))
+    for name, component_report in report["component_reports"].items():
+        assert component_report["drift"] == contrast["component_reports"][name]["drift"]
+        assert component_report["invalids"] == contrast["component_reports"][name]["invalids"]
+        assert component_report["singleton"] == contrast["component_reports"][name]["singleton"]
+    assert ("lotarea", "drift") in report["alerts"]
+    assert monitor.window_stats()["lotarea"].samplesize == 300
+    assert report["window"] == (0, 299)
+
+
+def test_monitor_sliding_window(houses):
+    reference = build_profile(houses)
+    clock = FakeClock()
+    reports = []
+    monitor = DriftMonitor(reference, window=120, subwindow=60, report_every=30, on_report=reports.append, clock=clock)
+    for i, (_, row) in enumerate(houses.iloc[:200].iterrows()):
+        clock.now = i
+        monitor.update(input=row)
+    # Records 0 - 119 left the window
+    assert monitor.window_stats()["lotarea"].samplesize == 80
+    assert len(reports) == 6
+    assert reports[-1]["component_reports"]["lotarea"]["drift"]["valid"]
+
+    clock.now = 1000
+    report = monitor.report()
+    assert monitor.window_stats()["lotarea"].samplesize == 0
+    assert not report["component_reports"]["lotarea"]["drift"]["valid"]
+    assert report["alerts"] == []
+
+
+def test_monitor_window_without_valid_values(houses):
+    reference = build_profile(houses)
+    clock = FakeClock()
+    reports = []
+    monitor = DriftMonitor(reference, window=120, subwindow=60, report_every=30, on_report=reports.append, clock=clock)
+    invalid = houses.iloc[:100].copy()
+    invalid["LotArea"] = np.nan
+    invalid["BldgType"] = None
+    for i, (_, row) in enumerate(invalid.iterrows()):
+        clock.now = i
+        monitor.update(input=row)
+    assert len(reports) == 3
+
+    report = monitor.report()
+    for name in ["lotarea", "bldgtype"]:
+        assert not report["component_reports"][name]["drift"]["valid"]
+        assert report["component_reports"][name]["invalids"]["invalids"] == pytest.approx(
+            1 - reference.components[name].stats.invalids
+        )
+        assert (name, "invalids") in report["alerts"]
+        assert (name, "drift") not in report["alerts"]
+    assert monitor.window_stats()["lotarea"].samplesize == 100
+    assert report["component_reports"]["grlivarea"]["drift"]["valid"]
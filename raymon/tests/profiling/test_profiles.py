@@ -4,11 +4,14 @@ import pytest
 import json
 import copy
 import pandas as pd
+import numpy as np
 from raymon import InputComponent, OutputComponent, ActualComponent, EvalComponent
 from raymon import ModelProfile
+from raymon.globals import ProfileStateException
 from raymon.profiling.extractors.structured import generate_components, ElementExtractor
 from raymon.profiling.extractors.structured.scoring import AbsoluteRegressionError
 from raymon.profiling import MeanScore
+from raymon.profiling.stats import NumericStats, interpolate
 from raymon.tests.profiling.houseprices_utils import prep_df, train, load_data
 from raymon.profiling.extractors.structured import KMeansOutlierScorer
 from raymon.profiling.extractors import SequenceSimpleExtractor
@@ -244,3 +247,229 @@ def test_schema_build_big_houseprices(cheap_houses_csv, exp_houses_csv):
     profile_exp.build(input=X_exp_test[feature_selector], output=y_exp_pred[:, None], actual=y_exp_test[:, None])
 
     profile.contrast(profile_exp, thresholds={})
+
+
+@pytest.fixture
+def cheap_houses(cheap_houses_csv):
+    """The inputs, predictions and actuals of the cheap houses."""
+    cheap_data = pd.read_csv(cheap_houses_csv).drop("Id", axis="columns")
+    actuals = cheap_data["SalePrice"].to_numpy()
+    preds = actuals - actuals * 0.1
+    inputs = cheap_data[["LotArea", "LotShape", "1stFlrSF", "GrLivArea", "BldgType"]]
+    return inputs, preds, actuals
+
+
+def get_eval_profile(inputs):
+    return ModelProfile(
+        name="cheap-houses",
+        version="0.0.1",
+        components=generate_components(inputs.dtypes, complass=InputComponent)
+        + [
+            OutputComponent(name="prediction", extractor=ElementExtractor(element=0)),
+            ActualComponent(name="actual", extractor=ElementExtractor(element=0)),
+            EvalComponent(name="abs_error", extractor=AbsoluteRegressionError()),
+        ],
+        scores=[MeanScore(name="MAE", inputs=["abs_error"], preference="low", result=None)],
+    )
+
+
+def get_input_profile(inputs):
+    return ModelProfile(components=generate_components(inputs.dtypes, complass=InputComponent))
+
+
+def build_input_profile(inputs, **kwargs):
+    profile = get_input_profile(inputs)
+    profile.build(input=inputs, **kwargs)
+    return profile
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_build_parallel(cheap_houses, executor):
+    inputs, preds, actuals = cheap_houses
+
+    serial = get_eval_profile(inputs)
+    serial.build(input=inputs, output=preds[:, None], actual=actuals[:, None])
+    parallel = get_eval_profile(inputs)
+    parallel.build(input=inputs, output=preds[:, None], actual=actuals[:, None], workers=3, executor=executor)
+    assert parallel.is_built()
+    assert list(parallel.components) == list(serial.components)
+    assert json.dumps(parallel.to_jcr()) == json.dumps(serial.to_jcr())
+
+
+def test_build_stream(cheap_houses, tmp_path):
+    inputs, preds, actuals = cheap_houses
+
+    built = get_eval_profile(inputs)
+    built.build(input=inputs, output=preds[:, None], actual=actuals[:, None])
+    chunks = [
+        (inputs.iloc[i : i + 100], preds[i : i + 100, None], actuals[i : i + 100, None])
+        for i in range(0, len(inputs), 100)
+    ]
+    streamed = get_eval_profile(inputs)
+    streamed.build_stream(iter(chunks), sample_size=150)
+    assert streamed.is_built()
+    for name, component in built.components.items():
+        stats = streamed.components[name].stats
+        assert stats.invalids == component.stats.invalids
+        assert stats.samplesize == component.stats.samplesize
+        if component.dtype == "CAT":
+            assert stats.frequencies == pytest.approx(component.stats.frequencies)
+        else:
+            assert stats.percentiles == component.stats.percentiles
+            assert stats.mean == pytest.approx(component.stats.mean)
+            assert stats.std == pytest.approx(component.stats.std)
+    assert streamed.scores["mae"].result == pytest.approx(built.scores["mae"].result)
+
+    fpath = tmp_path / "inputs.csv"
+    inputs.to_csv(fpath, index=False)
+    from_file = get_input_profile(inputs)
+    from_file.build_stream(fpath, chunksize=64)
+    assert from_file.components["lotarea"].stats.percentiles == built.components["lotarea"].stats.percentiles
+    assert from_file.components["bldgtype"].stats.frequencies == built.components["bldgtype"].stats.frequencies
+
+
+def test_merge_profiles(cheap_houses):
+    inputs, preds, actuals = cheap_houses
+
+    built = get_eval_profile(inputs)
+    built.build(input=inputs, output=preds[:, None], actual=actuals[:, None], mergeable=True)
+    shards = []
+    for idx in [slice(0, 300), slice(300, 700), slice(700, None)]:
+        shard = get_eval_profile(inputs)
+        shard.build(input=inputs.iloc[idx], output=preds[idx, None], actual=actuals[idx, None], mergeable=True)
+        shards.append(shard)
+    merged = ModelProfile.merge(shards)
+    assert merged.is_built()
+    for name, component in built.components.items():
+        stats = merged.components[name].stats
+        assert stats.invalids == component.stats.invalids
+        assert stats.samplesize == component.stats.samplesize
+        if component.dtype == "CAT":
+            assert stats.frequencies == pytest.approx(component.stats.frequencies)
+        else:
+            assert stats.percentiles == component.stats.percentiles
+            assert stats.mean == pytest.approx(component.stats.mean)
+            assert stats.std == pytest.approx(component.stats.std)
+    assert merged.scores["mae"].result == pytest.approx(built.scores["mae"].result)
+    # The shards are left untouched
+    assert shards[0].components["lotarea"].stats.samplesize == 300
+
+    with pytest.raises(ProfileStateException):
+        ModelProfile.merge([built, ModelProfile.from_jcr(built.to_jcr())])
+    # Without mergeable=True, numeric stats do not keep a summary of the data
+    plain = get_eval_profile(inputs)
+    plain.build(input=inputs, output=preds[:, None], actual=actuals[:, None])
+    assert plain.components["lotarea"].stats.sketch is None
+    with pytest.raises(ProfileStateException):
+        ModelProfile.merge([built, plain])
+    other = get_eval_profile(inputs)
+    other.components["lotarea"].extractor = ElementExtractor(element="GrLivArea")
+    other.build(input=inputs, output=preds[:, None], actual=actuals[:, None])
+    with pytest.raises(ProfileStateException):
+        ModelProfile.merge([built, other])
+
+
+def test_build_sample_budget(cheap_houses):
+    inputs, _, _ = cheap_houses
+    full = build_input_profile(inputs)
+    sampled = build_input_profile(inputs, sample_budget=300, seed=0)
+
+    stats = sampled.components["lotarea"].stats
+    assert stats.samplesize == len(inputs)
+    assert stats.effective_samplesize == 300
+    full_stats = full.components["lotarea"].stats
+    # Bounds reflect the size of the sample, so they are wider than those of the full build
+    assert np.mean(np.abs(np.subtract(stats.percentiles_ub, stats.percentiles_lb))) > np.mean(
+        np.abs(np.subtract(full_stats.percentiles_ub, full_stats.percentiles_lb))
+    )
+    assert full_stats.report_drift(stats, threshold=0.05)["alert"] is False
+    loaded = ModelProfile.from_jcr(json.loads(json.dumps(sampled.to_jcr())))
+    assert loaded.components["lotarea"].stats.effective_samplesize == 300
+    assert loaded.components["lotarea"].stats.percentiles_lb == stats.percentiles_lb
+
+    chunks = [inputs.iloc[i : i + 100] for i in range(0, len(inputs), 100)]
+    streamed = get_input_profile(inputs)
+    streamed.build_stream(chunks, epsilon=0.1, seed=0)
+    stats = streamed.components["bldgtype"].stats
+    assert stats.samplesize == len(inputs)
+    assert stats.effective_samplesize == 185
+    with pytest.raises(ValueError):
+        streamed.build(input=inputs, sample_budget=10, epsilon=0.1)
+
+
+def test_contrast_batched_drift(cheap_houses):
+    inputs, _, _ = cheap_houses
+    reference = build_input_profile(inputs)
+    window = build_input_profile(inputs[inputs["LotArea"] > inputs["LotArea"].median()])
+
+    reports = reference.contrast(window)["component_reports"]
+    for name, component in reference.components.items():
+        if not isinstance(component.stats, NumericStats):
+            continue
+        this, other = component.stats, window.components[name].stats
+        # The drift as computed one component at a time, with scipy interpolation
+        merged_domain = np.sort(np.concatenate([this.percentiles, other.percentiles]))
+        dists1 = interpolate(this.percentiles_lb, merged_domain) - interpolate(other.percentiles_ub, merged_domain)
+        dists2 = interpolate(other.percentiles_lb, merged_domain) - interpolate(this.percentiles_ub, merged_domain)
+        maxes = np.maximum(np.maximum(dists1, dists2), 0)
+        assert reports[name]["drift"]["drift"] == min(np.max(maxes), 100) / 100
+        assert reports[name]["drift"]["drift_xvalue"] == merged_domain[int(np.argmax(maxes))]
+        assert reports[name]["drift"] == this.report_drift(other, threshold=0.05)
+    assert reports["lotarea"]["drift"]["alert"]
+
+
+def test_profile_sample(cheap_houses):
+    inputs = cheap_houses[0].copy()
+    inputs.loc[inputs.index[:50], "LotShape"] = None
+    profile = build_input_profile(inputs)
+
+    records = profile.sample(5000, seed=0)
+    assert list(records.columns) == list(inputs.columns)
+    assert len(records) == 5000
+    assert records.equals(profile.sample(5000, seed=0))
+    assert not records.equals(profile.sample(5000, seed=1))
+    assert records["LotArea"].dtype == np.int64
+    lotarea = profile.components["lotarea"].stats
+    assert lotarea.min <= records["LotArea"].min() and records["LotArea"].max() <= lotarea.max
+    assert set(records["BldgType"]) <= set(profile.components["bldgtype"].stats.frequencies)
+    assert records["LotShape"].isna().mean() == pytest.approx(profile.components["lotshape"].stats.invalids, abs=0.02)
+
+    chunks = list(profile.sample_chunks(5000, chunksize=1200, seed=0))
+    assert [len(chunk) for chunk in chunks] == [1200, 1200, 1200, 1200, 200]
+    assert pd.concat(chunks, ignore_index=True).equals(records)
+
+    # Sampled records can be validated against the profile they were generated from
+    tags = profile.validate_input_batch(profile.sample(100, seed=0, invalids=False))
+    assert len(tags) == 100
+    assert list(profile.sample(10, components=["lotarea", "bldgtype"]).columns) == ["LotArea", "BldgType"]
+
+
+def test_contrast_many(cheap_houses):
+    inputs, _, _ = cheap_houses
+    reference = build_input_profile(inputs)
+    windows = {
+        "all": build_input_profile(inputs),
+        "large": build_input_profile(
+            inputs[inputs["LotArea"] > inputs["LotArea"].median()].drop("LotShape", axis="columns")
+        ),
+        "1fam": build_input_profile(inputs[inputs["BldgType"] == "1Fam"]),
+    }
+
+    result = reference.contrast_many(windows, full_reports=True)
+    assert list(result["drift"].index) == ["all", "large", "1fam"]
+    assert list(result["drift"].columns) == list(reference.components)
+    assert np.isnan(result["drift"].loc["large", "lotshape"])
+    for row, (label, window) in enumerate(windows.items()):
+        contrast = reference.contrast(window)
+        assert result["reports"][row] == {
+            "component_reports": contrast["component_reports"],
+            "global_reports": contrast["global_reports"],
+        }
+        for name, component_report in contrast["component_reports"].items():
+            assert result["drift"].loc[label, name] == component_report["drift"]["drift"]
+            assert result["alerts"].loc[label, name] == any(report["alert"] for report in component_report.values())
+        assert result["multivariate_drift"][label] == pytest.approx(
+            contrast["global_reports"]["multivariate_drift"]["drift"]
+        )
+    assert result["alerts"].loc["1fam", "bldgtype"]
+    assert "reports" not in reference.contrast_many(list(windows.values()))
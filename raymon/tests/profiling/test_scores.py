@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from raymon.globals import DataException
+from raymon.profiling.scores import (
+    Score,
+    MeanScore,
+    PrecisionScore,
+    RecallScore,
+    ClassPrecisionScore,
+    ClassRecallScore,
+)
+
+
+@pytest.mark.parametrize(
+    "score_type, values",
+    [
+        (MeanScore, np.random.default_rng(0).normal(size=1000)),
+        (PrecisionScore, np.random.default_rng(0).choice(["TP", "FP", "TN", "FN"], size=1000)),
+        (RecallScore, np.random.default_rng(0).choice(["TP", "FP", "TN", "FN"], size=1000)),
+        (ClassPrecisionScore, np.random.default_rng(0).choice(["TP", "FP", "TN", "FN"], size=1000)),
+        (ClassRecallScore, np.random.default_rng(0).choice(["TP", "FP", "TN", "FN"], size=1000)),
+    ],
+)
+def test_score_stream_and_merge(score_type, values):
+    built = score_type(name="score", inputs=["input"], preference="high")
+    built.build({"input": values})
+    assert built.is_built()
+
+    streamed = score_type(name="score", inputs=["input"], preference="high")
+    for chunk in np.array_split(values, 7):
+        streamed.update({"input": chunk})
+    streamed.finalize()
+    assert streamed.result == pytest.approx(built.result)
+
+    shards = []
+    for chunk in np.array_split(values, 3):
+        shard = score_type(name="score", inputs=["input"], preference="high")
+        shard.build({"input": chunk})
+        shards.append(shard)
+    merged = score_type(name="score", inputs=["input"], preference="high")
+    for shard in shards:
+        merged.merge(shard)
+    merged.finalize()
+    assert merged.result == pytest.approx(built.result)
+
+    loaded = Score.from_jcr(built.to_jcr())
+    assert type(loaded) is score_type
+    assert loaded.result == built.result
+    with pytest.raises(DataException):
+        merged.merge(loaded)
+
+
+def test_error_type_score_formulas():
+    counts = {"input": ["TP"] * 6 + ["FP"] * 2 + ["FN"] * 4 + ["TN"] * 8}
+    precision = PrecisionScore(name="precision", inputs=["input"])
+    precision.build(counts)
+    assert precision.result == 6 / 8
+    recall = RecallScore(name="recall", inputs=["input"])
+    recall.build(counts)
+    assert recall.result == 6 / 10
+    # No positive predictions
+    precision.build({"input": ["TN", "FN"]})
+    assert precision.result == -1
+
+
+def test_error_type_score_helpers():
+    counts = {"TP": 6, "FP": 2, "FN": 4}
+    with pytest.deprecated_call():
+        assert PrecisionScore(name="precision", inputs=["input"]).get_precision(counts) == 6 / 8
+    with pytest.deprecated_call():
+        assert ClassRecallScore(name="recall", inputs=["input"]).get_recall(counts) == 6 / 10
+    with pytest.deprecated_call():
+        assert RecallScore(name="recall", inputs=["input"]).get_recall({"FP": 3}) == -1
+
+
+def test_mean_score_empty():
+    empty = MeanScore(name="mean", inputs=["input"], preference="low")
+    empty.build({"input": np.array([])})
+    assert np.isnan(empty.result)
+    # An empty shard adds nothing to a merge
+    merged = MeanScore(name="mean", inputs=["input"], preference="low")
+    full = MeanScore(name="mean", inputs=["input"], preference="low")
+    full.build({"input": np.array([1.0, 3.0])})
+    merged.merge(full)
+    merged.merge(empty)
+    merged.finalize()
+    assert merged.result == 2.0
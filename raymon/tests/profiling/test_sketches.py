@@ -0,0 +1,220 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from raymon import FloatStats, CategoricStats
+from raymon.profiling.sketches import Moments, QuantileSketch, NumericSketch, CategoricSketch, DecayedMoments, OTHER_KEY
+from raymon.profiling.stats import Stats, DecayedNumericStats, DecayedCategoricStats
+from raymon.globals import DataException
+
+
+def test_moments_merge():
+    rng = np.random.default_rng(0)
+    data = rng.normal(loc=5, scale=2, size=1000)
+    left = Moments().update(data[:300])
+    right = Moments().update(data[300:])
+    merged = left.merge(right)
+    assert merged.count == 1000
+    assert merged.mean == pytest.approx(data.mean())
+    assert merged.std == pytest.approx(data.std())
+    assert merged.min == data.min()
+    assert merged.max == data.max()
+
+
+def test_quantile_sketch_exact_when_small():
+    data = np.random.default_rng(0).normal(size=500)
+    sketch = QuantileSketch(k=1024).update(data)
+    q = np.arange(101)
+    assert sketch.percentiles(q).tolist() == np.percentile(data, q, method="higher").tolist()
+
+
+def test_quantile_sketch_merge_accuracy():
+    data = np.random.default_rng(0).lognormal(size=200000)
+    sketches = [QuantileSketch(k=256, seed=i).update(chunk) for i, chunk in enumerate(np.array_split(data, 10))]
+    merged = sketches[0]
+    for sketch in sketches[1:]:
+        merged.merge(sketch)
+    assert merged.count == len(data)
+    assert merged.size() < 1000
+    q = np.arange(101)
+    ranks = np.searchsorted(np.sort(data), merged.percentiles(q)) / len(data)
+    assert np.max(np.abs(ranks - q / 100)) < 0.02
+    with pytest.raises(DataException):
+        merged.merge(QuantileSketch(k=128))
+
+
+def test_numeric_stats_stream():
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=5000)
+    data[::50] = np.nan
+    built = FloatStats()
+    built.build(data, domain=(-2, None))
+
+    workers = [FloatStats().update(chunk, domain=(-2, None), seed=i) for i, chunk in enumerate(np.split(data, 5))]
+    streamed = FloatStats()
+    for worker in workers:
+        streamed.merge(worker)
+    streamed.finalize()
+    assert streamed.is_built()
+    assert streamed.samplesize == built.samplesize
+    assert streamed.invalids == built.invalids
+    assert streamed.min == built.min
+    assert streamed.max == built.max
+    assert streamed.mean == pytest.approx(built.mean)
+    assert streamed.std == pytest.approx(built.std)
+    assert streamed.percentiles[0] == built.percentiles[0]
+    assert streamed.percentiles[-1] == built.percentiles[-1]
+    assert built.report_drift(streamed, threshold=0.05)["drift"] < 0.02
+
+    loaded = FloatStats.from_jcr(json.loads(json.dumps(streamed.to_jcr()))["state"])
+    assert loaded.percentiles == streamed.percentiles
+    sketch = NumericSketch.from_jcr(json.loads(json.dumps(streamed.sketch.to_jcr()))["state"])
+    assert sketch.quantiles.percentiles([50]) == streamed.sketch.quantiles.percentiles([50])
+
+    with pytest.raises(DataException):
+        FloatStats().finalize()
+
+
+def test_numeric_stats_build_mergeable():
+    data = np.random.default_rng(0).normal(size=2000)
+    plain = FloatStats()
+    plain.build(data)
+    assert plain.sketch is None
+    mergeable = FloatStats()
+    mergeable.build(data[:1000], mergeable=True)
+    other = FloatStats()
+    other.build(data[1000:], mergeable=True)
+    mergeable.merge(other).finalize()
+    assert mergeable.samplesize == plain.samplesize
+    assert mergeable.mean == pytest.approx(plain.mean)
+    assert mergeable.percentiles[0] == plain.percentiles[0]
+    with pytest.raises(DataException):
+        FloatStats().merge(plain)
+    # Merging into built stats without a summary would drop their data
+    with pytest.raises(DataException):
+        plain.merge(other)
+
+
+def test_categoric_stats_merge_exact():
+    data = pd.Series(["a"] * 50 + ["b"] * 30 + [None] * 10 + ["c"] * 10)
+    built = CategoricStats()
+    built.build(data, domain=["a", "b"])
+
+    merged = CategoricStats()
+    for chunk in np.array_split(data.sample(frac=1, random_state=0), 3):
+        merged.merge(CategoricStats().update(chunk, domain=["a", "b"]))
+    merged.finalize()
+    assert merged.frequencies == built.frequencies == {"a": 50 / 80, "b": 30 / 80}
+    assert merged.invalids == built.invalids == 0.2
+    assert merged.sketch.counts.to_dict() == {"a": 50, "b": 30}
+
+
+def test_categoric_stats_top_k():
+    data = np.random.default_rng(0).zipf(1.5, size=100000).astype(str)
+    stats = CategoricStats()
+    for chunk in np.array_split(data, 10):
+        stats.update(chunk, top_k=50)
+    stats.finalize()
+    true_frequencies = pd.Series(data).value_counts(normalize=True)
+    assert len(stats.frequencies) == 51
+    assert sum(stats.frequencies.values()) == pytest.approx(1)
+    assert list(stats.frequencies)[:5] == true_frequencies.index[:5].tolist()
+    for key, frequency in stats.frequencies.items():
+        if key != OTHER_KEY:
+            assert frequency <= true_frequencies[key]
+            assert true_frequencies[key] - frequency <= 1 / 50
+    # Categories in the other bucket are not domain errors
+    assert stats.error_value("not-a-heavy-hitter") is None
+    assert stats.check_invalid_multiple(["1", "not-a-heavy-hitter", None]).tolist() == [None, None, "Value None"]
+
+    sketch = CategoricSketch.from_jcr(json.loads(json.dumps(stats.sketch.to_jcr()))["state"])
+    assert sketch.counts.equals(stats.sketch.counts)
+    assert sketch.min_count == stats.sketch.min_count
+
+
+def test_decayed_moments_exact():
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=50)
+    weights = 0.9 ** np.arange(49, -1, -1)
+    moments = DecayedMoments()
+    moments.update(data[:20], weights[:20] / 0.9**30, shrink=1)
+    moments.update(data[20:], weights[20:], shrink=0.9**30)
+    mean = np.dot(weights, data) / weights.sum()
+    assert moments.mean == pytest.approx(mean)
+    assert moments.std == pytest.approx(np.sqrt(np.dot(weights, (data - mean) ** 2) / weights.sum()))
+
+
+def test_decayed_numeric_stats():
+    rng = np.random.default_rng(0)
+    reference = FloatStats()
+    reference.build(rng.normal(size=10000))
+    stats = DecayedNumericStats(halflife=200, seed=0)
+    for chunk in np.array_split(rng.normal(size=5000), 50):
+        stats.update(chunk)
+    stats.finalize()
+    assert stats.effective_samplesize <= 256
+    assert not reference.report_drift(stats, threshold=0.1)["alert"]
+    # Recent data dominates after a few half-lives
+    stats.update(rng.normal(loc=3, size=1000))
+    stats.update(np.full(200, np.nan))
+    stats.finalize()
+    assert stats.mean == pytest.approx(3, abs=0.2)
+    assert stats.invalids == pytest.approx(1 - 0.5**1, abs=0.01)
+    assert reference.report_drift(stats, threshold=0.1)["alert"]
+    assert reference.report_invalid_diff(stats, threshold=0.1)["alert"]
+
+    loaded = Stats.from_jcr(json.loads(json.dumps(stats.to_jcr())))
+    assert isinstance(loaded, DecayedNumericStats)
+    assert loaded.percentiles == stats.percentiles
+    assert loaded.effective_samplesize == stats.effective_samplesize
+    np.testing.assert_array_equal(loaded.sketch.reservoir.values, stats.sketch.reservoir.values)
+    loaded.update([1.0]).finalize()
+    assert loaded.samplesize == stats.samplesize + 1
+    with pytest.raises(DataException):
+        stats.merge(loaded)
+
+
+def test_decayed_numeric_stats_roundtrip():
+    rng = np.random.default_rng(0)
+    stats = DecayedNumericStats(halflife=200, reservoir_size=64, seed=3)
+    stats.update(rng.normal(size=1000))
+    loaded = Stats.from_jcr(json.loads(json.dumps(stats.to_jcr())))
+    assert loaded.seed == 3
+    # The loaded stats continue the same sample stream
+    for chunk in np.array_split(rng.normal(loc=1, size=1000), 10):
+        stats.update(chunk)
+        loaded.update(chunk)
+    stats.finalize()
+    loaded.finalize()
+    np.testing.assert_array_equal(loaded.sketch.reservoir.values, stats.sketch.reservoir.values)
+    assert loaded.to_jcr() == stats.to_jcr()
+    assert loaded.empty().seed == 3
+
+
+def test_decayed_categoric_stats():
+    rng = np.random.default_rng(0)
+    reference = CategoricStats()
+    reference.build(rng.choice(["a", "b", "c"], size=5000))
+    stats = DecayedCategoricStats(halflife=100)
+    stats.update(rng.choice(["a", "b", "c"], size=2000))
+    stats.finalize()
+    assert not reference.report_drift(stats, threshold=0.1)["alert"]
+    # One observation at a time
+    for value in ["d"] * 300:
+        stats.update([value])
+    stats.finalize()
+    assert stats.frequencies["d"] == pytest.approx(1 - 0.5**3, abs=1e-6)
+    assert sum(stats.frequencies.values()) == pytest.approx(1)
+    assert reference.report_drift(stats, threshold=0.1)["alert"]
+
+    loaded = Stats.from_jcr(json.loads(json.dumps(stats.to_jcr())))
+    assert loaded.frequencies == stats.frequencies
+    assert loaded.sketch.counts == stats.sketch.counts
+
+    bounded = DecayedCategoricStats(halflife=100, top_k=5)
+    bounded.update(rng.integers(0, 1000, size=5000).astype(str))
+    bounded.finalize()
+    assert len(bounded.sketch.counts) <= 10
+    assert OTHER_KEY in bounded.frequencies
@@ -1,11 +1,16 @@
 from raymon.profiling.components import DataType
+import copy
+import pytest
 import pandas as pd
 import numpy as np
 from raymon import InputComponent, OutputComponent, ActualComponent, EvalComponent
 
-from raymon.profiling.extractors.structured import generate_components
+from raymon.profiling.extractors.structured import generate_components, ElementExtractor, MaxScoreElementExtractor
+from raymon.profiling.extractors import SequenceEvalExtractor
 from raymon import ModelProfile
-from raymon.profiling.extractors.structured.scoring import AbsoluteRegressionError
+from raymon.globals import ProfileStateException
+from raymon.tags import Tag, TagBatch
+from raymon.profiling.extractors.structured.scoring import AbsoluteRegressionError, ClassificationErrorType
 
 
 def test_compile_nan():
@@ -132,3 +137,238 @@ def test_score():
     tags = profile.validate_eval(output=outputs[0][0], actual=actuals[0][0])
     assert len(tags) == 1
     assert tags[0]["type"] == "profile-score"
+
+
+def test_validate_input_batch():
+    cols = {
+        "num1": list(range(10)),
+        "cat1": ["a"] * 5 + ["b"] * 5,
+    }
+    df = pd.DataFrame(data=cols)
+    components = generate_components(dtypes=df.dtypes, complass=InputComponent)
+    schema = ModelProfile(components=components)
+    schema.build(input=df)
+
+    batch = pd.DataFrame(data={"num1": [1, 20, np.nan, -1], "cat1": ["b", "c", np.nan, None]})
+    tags = schema.validate_input_batch(input=batch)
+    assert len(tags) == 4
+    assert list(tags.columns) == ["num1", "num1-error", "cat1", "cat1-error"]
+    assert tags["num1"].tolist()[:2] == [1, 20]
+    assert pd.isna(tags["num1"][2])
+    assert tags["num1-error"].tolist() == [None, "UpperBoundError", "Value NaN", "LowerBoundError"]
+    assert tags["cat1"].tolist() == ["b", "c", None, None]
+    assert tags["cat1-error"].tolist() == [None, "Domain Error", "Value NaN", "Value None"]
+
+    # Every record gives the same tags as validating it on its own
+    for i in range(len(batch)):
+        single = {t["name"]: t["value"] for t in schema.validate_input(input=batch.iloc[i, :])}
+        batched = {k: v for k, v in tags.iloc[i, :].items() if not pd.isna(v)}
+        assert single == batched
+
+
+def test_validate_all_batch():
+    outputs = np.array([2, 1, 2, 0, 1])[:, None]
+    actuals = np.array([0, 1, 2, 1, 2])[:, None]
+    inputs = pd.DataFrame(data={"num1": list(range(5))})
+    components = generate_components(dtypes=inputs.dtypes, complass=InputComponent) + [
+        OutputComponent(name="prediction", extractor=ElementExtractor(element=0), dtype=DataType.INT),
+        ActualComponent(name="actual", extractor=ElementExtractor(element=0), dtype=DataType.INT),
+        EvalComponent(name="model_abs_error", extractor=AbsoluteRegressionError(), dtype=DataType.FLOAT),
+    ]
+    profile = ModelProfile(components=components)
+    profile.build(input=inputs, output=outputs, actual=actuals)
+
+    tags = profile.validate_all_batch(input=inputs, output=outputs, actual=actuals)
+    assert len(tags) == 5
+    assert tags["prediction"].tolist() == [2, 1, 2, 0, 1]
+    assert tags["model_abs_error"].tolist() == [2.0, 0.0, 0.0, 1.0, 1.0]
+    assert tags["model_abs_error-error"].isna().all()
+
+
+def test_validation_plan():
+    cols = {
+        "num1": list(range(10)),
+        "cat1": ["a"] * 5 + ["b"] * 5,
+    }
+    df = pd.DataFrame(data=cols)
+    inputcomps = generate_components(dtypes=df.dtypes, complass=InputComponent, name_prefix="input_")
+    outcomps = generate_components(dtypes=df.dtypes, complass=OutputComponent, name_prefix="output_")
+    schema = ModelProfile(components=inputcomps + outcomps)
+    with pytest.raises(ProfileStateException):
+        schema.compile()
+    schema.build(input=df, output=df)
+
+    plan = schema.compile()
+    assert len(plan) == 4
+    assert len(plan.input) == 2 and len(plan.output) == 2 and len(plan.actual) == 0
+    with pytest.raises(AttributeError):
+        plan.group = "other"
+
+    record = pd.Series([1, "c"], index=["num1", "cat1"])
+    assert plan.validate_input(input=record) == schema.validate_input(input=record)
+    tags = plan.validate_output(output=record)
+    assert [t["name"] for t in tags] == ["output_num1", "output_cat1", "output_cat1-error"]
+    assert all(t["group"] == "default@0.0.0" for t in tags)
+
+
+def test_validation_plan_cached():
+    df = pd.DataFrame(data={"num1": list(range(10)), "cat1": ["a"] * 5 + ["b"] * 5})
+    schema = ModelProfile(components=generate_components(dtypes=df.dtypes, complass=InputComponent))
+    with pytest.raises(ProfileStateException):
+        schema.validate_input_batch(df)
+    schema.build(input=df)
+    record = pd.Series([20, "c"], index=["num1", "cat1"])
+    tags = schema.validate_input(input=record)
+    plan = schema._compiled()
+    schema.validate_input_batch(df)
+    assert schema._compiled() is plan
+
+    # Replacing the stats of a component, rebuilding or renaming the profile compiles a new plan
+    other = ModelProfile(components=generate_components(dtypes=df.dtypes, complass=InputComponent))
+    other.build(input=pd.DataFrame(data={"num1": list(range(30)), "cat1": ["c"] * 30}))
+    schema.components["num1"].stats = other.components["num1"].stats
+    assert schema._compiled() is not plan
+    assert schema.validate_input(input=record) != tags
+    plan = schema._compiled()
+    schema.build(input=df)
+    assert schema._compiled() is not plan
+    schema.version = "1.0.0"
+    assert all(tag["group"] == "default@1.0.0" for tag in schema.validate_input(input=record))
+    # The plan is not pickled
+    assert copy.deepcopy(schema)._plan is None
+
+
+class RoundingComponent(InputComponent):
+    """Tags the rounded value and never reports errors."""
+
+    def check(self, component):
+        return [Tag(name=self.name, value=round(component), type=self.tagtypes["tagtype"])]
+
+
+class ConstantComponent(InputComponent):
+    def validate(self, data):
+        return [Tag(name=self.name, value="constant", type=self.tagtypes["tagtype"])]
+
+
+def test_validate_overridden_component():
+    df = pd.DataFrame(data={"num1": [0.0, 1.0, 2.0], "num2": [0.0, 1.0, 2.0], "num3": [0.0, 1.0, 2.0]})
+    schema = ModelProfile(
+        components=[
+            RoundingComponent(name="num1", extractor=ElementExtractor(element="num1")),
+            ConstantComponent(name="num2", extractor=ElementExtractor(element="num2")),
+            InputComponent(name="num3", extractor=ElementExtractor(element="num3")),
+        ]
+    )
+    with pytest.raises(ProfileStateException, match="Cannot check data on an unbuilt profile"):
+        schema.validate_input(input=df.iloc[0])
+    schema.build(input=df)
+
+    record = pd.Series([5.4, 5.4, 5.4], index=["num1", "num2", "num3"])
+    assert schema.validate_input(input=record, tag_format="simple") == {
+        "num1": 5,
+        "num2": "constant",
+        "num3": 5.4,
+        "num3-error": "UpperBoundError",
+    }
+    assert all(tag["group"] == "default@0.0.0" for tag in schema.validate_input(input=record))
+
+
+class CountingMaxScoreExtractor(MaxScoreElementExtractor):
+    calls = 0
+
+    def extract(self, data):
+        CountingMaxScoreExtractor.calls += 1
+        return super().extract(data)
+
+
+def test_validate_all_shares_extractions():
+    target_names = ["a", "b"]
+    outputs = np.array([[0.2, 0.8], [0.9, 0.1], [0.6, 0.4]])
+    actuals = np.array(["b", "a", "b"])[:, None]
+    components = [
+        OutputComponent(
+            name="prediction", extractor=CountingMaxScoreExtractor(categories=target_names), dtype=DataType.CAT
+        ),
+        OutputComponent(
+            name="prediction2", extractor=CountingMaxScoreExtractor(categories=target_names), dtype=DataType.CAT
+        ),
+        ActualComponent(name="actual", extractor=ElementExtractor(0), dtype=DataType.CAT),
+    ]
+    for output_class in target_names:
+        components.append(
+            EvalComponent(
+                name=f"{output_class}_errortype",
+                extractor=SequenceEvalExtractor(
+                    prep_output=[CountingMaxScoreExtractor(categories=target_names)],
+                    prep_actual=[ElementExtractor(0)],
+                    eval_extractor=ClassificationErrorType(positive=output_class),
+                ),
+                dtype=DataType.CAT,
+            )
+        )
+    profile = ModelProfile(components=components)
+    profile.build(output=outputs, actual=actuals)
+
+    CountingMaxScoreExtractor.calls = 0
+    tags = profile.validate_all(input=None, output=outputs[2, :], actual=actuals[2, :])
+    assert CountingMaxScoreExtractor.calls == 1
+    tags = {t["name"]: t["value"] for t in tags}
+    assert tags == {"prediction": "a", "prediction2": "a", "actual": "b", "a_errortype": "FP", "b_errortype": "FN"}
+
+
+class PredictionComponent(OutputComponent):
+    def check(self, component):
+        return [Tag(name=self.name, value=f"predicted {component}", type=self.tagtypes["tagtype"])]
+
+
+def test_validate_all_overridden_check():
+    target_names = ["a", "b"]
+    inputs = pd.DataFrame(data={"num1": [0.0, 1.0, 2.0]})
+    outputs = np.array([[0.2, 0.8], [0.9, 0.1], [0.6, 0.4]])
+    components = [
+        RoundingComponent(name="num1", extractor=ElementExtractor(element="num1")),
+        PredictionComponent(
+            name="prediction", extractor=CountingMaxScoreExtractor(categories=target_names), dtype=DataType.CAT
+        ),
+        OutputComponent(
+            name="prediction2", extractor=CountingMaxScoreExtractor(categories=target_names), dtype=DataType.CAT
+        ),
+    ]
+    profile = ModelProfile(components=components)
+    profile.build(input=inputs, output=outputs)
+
+    record = pd.Series([1.6], index=["num1"])
+    # The tags of validating every component on its own, as validate_all did before it shared extractions
+    expected = []
+    for component, data in zip(components, [record, outputs[0, :], outputs[0, :]]):
+        expected.extend(component.validate(data))
+    profile.set_group(expected)
+    expected = [tag.to_jcr() for tag in expected]
+
+    CountingMaxScoreExtractor.calls = 0
+    tags = profile.validate_all(input=record, output=outputs[0, :], actual=None)
+    assert CountingMaxScoreExtractor.calls == 1
+    assert tags == expected
+    assert {t["name"]: t["value"] for t in tags} == {"num1": 2, "prediction": "predicted b", "prediction2": "b"}
+
+
+def test_validation_plan_tag_formats():
+    df = pd.DataFrame(data={"num1": list(range(10))})
+    schema = ModelProfile(components=generate_components(dtypes=df.dtypes, complass=InputComponent))
+    schema.build(input=df)
+    plan = schema.compile()
+
+    record = pd.Series([20], index=["num1"])
+    batch = plan.validate_input(input=record, tag_format="batch")
+    assert isinstance(batch, TagBatch)
+    assert batch.names == ["num1", "num1-error"]
+    assert plan.validate_input(input=record, tag_format="simple") == {"num1": 20, "num1-error": "UpperBoundError"}
+    assert [t.group for t in plan.validate_input(input=record, tag_format="tag")] == ["default@0.0.0"] * 2
+
+
+def test_eval_extract_batch():
+    output = pd.Series([1, 0, 1, 0, 2.5])
+    actual = pd.Series([1, 1, 0, 0, 1.0])
+    for extractor in [AbsoluteRegressionError(), ClassificationErrorType(positive=1)]:
+        batch = extractor.extract_multiple(output=output, actual=actual)
+        assert list(batch) == [extractor.extract(o, a) for o, a in zip(output, actual)]
@@ -0,0 +1,26 @@
+import sys
+import threading
+
+from raymon.out import NoOutput
+
+
+def test_no_output_nested_threads():
+    original = sys.stdout
+    entered = threading.Barrier(4)
+    release = threading.Event()
+
+    def suppress():
+        with NoOutput():
+            entered.wait()
+            print("suppressed")
+            release.wait()
+
+    threads = [threading.Thread(target=suppress) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    entered.wait()
+    assert sys.stdout is not original
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert sys.stdout is original
@@ -0,0 +1,39 @@
+import pytest
+
+from raymon.tags import Tag, TagBatch, convert_tags, filter_errors, normalize, PROFILE_INPUT, PROFILE_INPUT_ERROR
+
+
+def test_normalize():
+    assert normalize("Sepal Length (cm)") == "sepal_length_cm"
+    assert normalize("a-b@c.d/e__") == "a-b@c.d/e"
+
+
+def test_tag_slots():
+    tag = Tag(name="Some Tag", value=1, type=PROFILE_INPUT)
+    assert tag.name == "some_tag"
+    with pytest.raises(AttributeError):
+        tag.other = 1
+
+
+def test_tagbatch_formats():
+    batch = TagBatch()
+    batch.append(TagBatch.intern_name("Num 1"), 1.0, PROFILE_INPUT, "default@0.0.0")
+    batch.append(TagBatch.intern_name("Num 1-error"), "UpperBoundError", PROFILE_INPUT_ERROR, "default@0.0.0")
+    tags = [
+        Tag(name="Num 1", value=1.0, type=PROFILE_INPUT, group="default@0.0.0"),
+        Tag(name="Num 1-error", value="UpperBoundError", type=PROFILE_INPUT_ERROR, group="default@0.0.0"),
+    ]
+    assert len(batch) == 2
+    assert convert_tags(batch, format="jcr") == convert_tags(tags, format="jcr")
+    assert convert_tags(batch, format="simple") == {"num_1": 1.0, "num_1-error": "UpperBoundError"}
+    assert convert_tags(batch, format="array") == convert_tags(tags, format="array")
+    assert convert_tags(batch, format="array")["type"] == [PROFILE_INPUT, PROFILE_INPUT_ERROR]
+    assert convert_tags(batch, format="batch") is batch
+    assert [t.name for t in convert_tags(batch, format="tag")] == ["num_1", "num_1-error"]
+    assert [t.name for t in filter_errors(batch)] == ["num_1-error"]
+    assert TagBatch.from_jcr(batch.to_jcr()).to_jcr() == batch.to_jcr()
+
+
+def test_tagbatch_lengths():
+    with pytest.raises(ValueError):
+        TagBatch(names=["a"], values=[], types=[])